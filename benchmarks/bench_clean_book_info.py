@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of `clean_book_info` and `clean_book_infos`, compared with the previous `while True` date normalisation.
+`normalise_published_date` is cached, so the records are cleaned both with a few repeated dates, as in a typical library, and with distinct dates, which mostly miss the cache.
+The cache is cleared before every run, and its hit rate for each set of records is reported.
+
+Run from the repository root with:
+    python -m benchmarks.bench_clean_book_info
+"""
+
+import re
+import timeit
+
+from src.tome_tracker.api_utils import (
+    clean_book_info,
+    clean_book_infos,
+    normalise_published_date,
+)
+
+RECORD_COUNT = 10_000
+DATE_SETS = {
+    "repeated dates": [
+        "2004",
+        "2004-06",
+        "2004-1-5",
+        "2004-10-5",
+        "2004-1-15",
+        "2004-06-21",
+        None,
+    ],
+    "distinct dates": [
+        f"{1000 + i % 9000}-{i % 12 + 1}-{i % 28 + 1}" for i in range(RECORD_COUNT)
+    ],
+}
+
+
+def legacy_clean_book_info(book_info: dict) -> dict:
+    """The implementation of `clean_book_info` before date normalisation became single-pass."""
+    while True:
+        date = book_info["publishedDate"]
+        if date is None:
+            break
+        elif re.match(r"^\d{4}$", date):
+            updated_date = "".join([date, "-01-01"])
+            book_info["publishedDate"] = updated_date
+            break
+        elif re.match(r"^\d{4}-\d{2}$", date):
+            updated_date = "".join([date, "-01"])
+            book_info["publishedDate"] = updated_date
+            break
+        elif re.match(r"^\d{4}-\d-*\d*\d*$", date):
+            updated_date = "".join([date[:4], "-0", date[5:]])
+            book_info["publishedDate"] = updated_date
+        elif re.match(r"^\d{4}-\d{2}-\d$", date):
+            updated_date = "".join([date[:7], "-0", date[-1]])
+            book_info["publishedDate"] = updated_date
+        elif re.match(r"^\d{4}-\d{2}-\d{2}$", date):
+            break
+
+    book_info["authors"] = [a.title() for a in book_info["authors"]]
+
+    return book_info
+
+
+def make_records(dates: list[str | None]) -> list[dict]:
+    return [
+        {"publishedDate": dates[i % len(dates)], "authors": ["joe haldeman"]}
+        for i in range(RECORD_COUNT)
+    ]
+
+
+def time_per_record(clean, dates: list[str | None]) -> float:
+    # Clearing the cache in the setup means every run starts cold
+    runs = timeit.repeat(
+        "clean(records)",
+        setup="normalise_published_date.cache_clear(); records = make_records(dates)",
+        globals={
+            "clean": clean,
+            "dates": dates,
+            "make_records": make_records,
+            "normalise_published_date": normalise_published_date,
+        },
+        repeat=5,
+        number=1,
+    )
+    return min(runs) / RECORD_COUNT * 1e6
+
+
+def cache_hit_rate(dates: list[str | None]) -> float:
+    normalise_published_date.cache_clear()
+    clean_book_infos(make_records(dates))
+    info = normalise_published_date.cache_info()
+    return info.hits / max(info.hits + info.misses, 1)
+
+
+def main():
+    for record in make_records(DATE_SETS["repeated dates"])[:7]:
+        assert legacy_clean_book_info(dict(record)) == clean_book_info(dict(record))
+
+    for name, dates in DATE_SETS.items():
+        results = {
+            "legacy clean_book_info": time_per_record(
+                lambda records: [legacy_clean_book_info(r) for r in records], dates
+            ),
+            "clean_book_info": time_per_record(
+                lambda records: [clean_book_info(r) for r in records], dates
+            ),
+            "clean_book_infos": time_per_record(clean_book_infos, dates),
+        }
+        print(f"{name}, {cache_hit_rate(dates):.1%} date cache hits:")
+        for cleaner, microseconds in results.items():
+            print(f"  {cleaner:<24} {microseconds:6.2f} µs/record")
+
+
+if __name__ == "__main__":
+    main()
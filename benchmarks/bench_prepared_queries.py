@@ -0,0 +1,64 @@
+"""
+Benchmark of the per-book `BookRepository` statements, run as prepared statements and as plain statements.
+
+Needs the test database from `db/init_test_db.sql`. Run from the repository root with:
+    python -m benchmarks.bench_prepared_queries
+"""
+
+import time
+
+from src.tome_tracker.db_utils import BookRepository
+
+DBNAME = "test_tome_tracker"
+OPERATION_COUNT = 10_000
+
+BOOK_INFO = {
+    "etag": "WmUhbbR1UHg",
+    "selfLink": None,
+    "authors": ["Marcus Aurelius"],
+    "publisher": "Phoenix",
+    "publishedDate": "2004-01-01",
+    "description": "A new translation of one of the most important texts of Western philosophy.",
+    "pageCount": 200,
+    "categories": None,
+    "language": "en",
+    "thumbnail": None,
+}
+
+
+def make_book(number: int) -> dict:
+    return {
+        **BOOK_INFO,
+        "id": f"bench{number:07}",
+        "title": f"Benchmark {number:07}",
+        "isbn_10": f"{number:010}",
+        "isbn_13": f"979{number:010}",
+    }
+
+
+def time_per_operation(prepare: bool) -> float:
+    """Adds, checks, toggles and deletes books through a single pooled connection, returning the mean µs per call."""
+    books = [make_book(i) for i in range(OPERATION_COUNT // 4)]
+    with BookRepository(DBNAME, max_size=1, prepare=prepare) as repository:
+        repository.create_books_table()
+        start = time.perf_counter()
+        for book_info in books:
+            repository.add_book(book_info, False)
+            repository.has_book(isbn=book_info["isbn_13"])
+            repository.update_book(book_info["title"], True)
+            repository.delete_book(isbn=book_info["isbn_13"])
+        elapsed = time.perf_counter() - start
+    return elapsed / (len(books) * 4) * 1e6
+
+
+def main():
+    results = {
+        "plain statements": min(time_per_operation(False) for _ in range(3)),
+        "prepared statements": min(time_per_operation(True) for _ in range(3)),
+    }
+    for name, microseconds in results.items():
+        print(f"{name:<20} {microseconds:7.1f} µs/operation")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,881 @@
+import asyncio
+import email.utils
+import functools
+import gzip
+import json
+import os
+import random
 import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Hashable, Iterable, Iterator, NamedTuple
 
+import httpx
 import requests
-from requests.exceptions import HTTPError
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, HTTPError, RequestException, Timeout
+
+try:
+    from .isbn_index import IsbnIndex, normalise_isbn, write_isbn_index
+except ImportError:
+    from isbn_index import IsbnIndex, normalise_isbn, write_isbn_index
+
+load_dotenv()
 
 
 class NoMatchingISBN(Exception):
     pass
 
 
+class IsbnLookup(NamedTuple):
+    """
+    The outcome of looking up a single ISBN as part of a batch.
+    Exactly one of `book_info` and `error` will be set.
+    """
+
+    isbn: str
+    book_info: dict | None
+    error: Exception | None
+
+
+BASE_URL = "https://www.googleapis.com/books/v1"
+
+# Stored fields which may be missing from a search response but present on the full volume
+SEARCH_PROJECTION_FIELDS = ["industryIdentifiers", "imageLinks"]
+
+# Open Library records languages as MARC codes, whereas the books table stores ISO 639-1 codes
+MARC_LANGUAGE_CODES = {
+    "chi": "zh",
+    "dut": "nl",
+    "eng": "en",
+    "fre": "fr",
+    "ger": "de",
+    "gre": "el",
+    "ita": "it",
+    "jpn": "ja",
+    "lat": "la",
+    "pol": "pl",
+    "por": "pt",
+    "rus": "ru",
+    "spa": "es",
+    "swe": "sv",
+}
+
+PUBLISHED_DATE_PATTERN = re.compile(r"(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?")
+
+
+class LookupCache:
+    """
+    A persistent on-disk cache of Google Books lookups, stored in a SQLite database.
+    Caches ISBN to volume id lookups, including ISBNs with no match, and volume id to raw volume JSON.
+    Entries go stale after their TTL, and the least recently used entries are evicted once `max_entries` is exceeded.
+    Stale entries are kept so that they can still be served while the API is unreachable.
+    Hits don't write to the database. Their access times are buffered and written together before the next insert or eviction, once `touch_batch_size` hits are buffered, or on `close`.
+
+    ### Args:
+     - `path`: the file path of the cache database.
+     - `ttl`: the number of seconds before a cached response goes stale.
+     - `negative_ttl`: the number of seconds before a cached "no matching ISBN" result goes stale.
+     - `max_entries`: the maximum number of ISBNs and volumes kept in the cache.
+     - `touch_batch_size`: the number of hit entries whose access times are buffered before being written.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 30 * 24 * 60 * 60,
+        negative_ttl: float = 24 * 60 * 60,
+        max_entries: int = 10_000,
+        touch_batch_size: int = 100,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.touch_batch_size = touch_batch_size
+        # The latest access time of each entry hit since the last write
+        self.touched: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS lookups (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                expires_at REAL,
+                accessed_at REAL
+            )
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS lookups_accessed_at_idx
+            ON lookups (accessed_at)
+        """)
+        self.conn.commit()
+        # Counted as entries are added, so inserts don't need to count the table
+        # Other processes sharing the file aren't seen, so the table is recounted before evicting
+        (self.entries,) = self.conn.execute("SELECT count(*) FROM lookups").fetchone()
+
+    def close(self):
+        """Writes any buffered access times, then closes the connection to the cache database."""
+        with self.lock:
+            self._write_touched()
+            self.conn.commit()
+        self.conn.close()
+
+    def get_volume_id(
+        self, isbn: str, allow_stale: bool = False
+    ) -> tuple[bool, str | None]:
+        """
+        Looks up a cached ISBN search.
+
+        ### Returns:
+        A `(hit, volume_id)` tuple. On a hit, `volume_id` is `None` if the ISBN is cached as having no match.
+        """
+        return self._get(f"isbn:{isbn}", allow_stale)
+
+    def set_volume_id(self, isbn: str, volume_id: str | None):
+        """Caches the result of an ISBN search. A `volume_id` of `None` records that the ISBN has no match."""
+        ttl = self.ttl if volume_id is not None else self.negative_ttl
+        self._set(f"isbn:{isbn}", volume_id, ttl)
+
+    def get_volume(self, volume_id: str, allow_stale: bool = False) -> dict | None:
+        """Returns the cached raw volume JSON for the passed volume id, or `None` on a miss."""
+        return self._get(f"volume:{volume_id}", allow_stale)[1]
+
+    def set_volume(self, volume_id: str, response_body: dict):
+        """Caches the raw volume JSON for the passed volume id."""
+        self._set(f"volume:{volume_id}", response_body, self.ttl)
+
+    def stats(self) -> dict:
+        """Returns the hit and miss counters, along with the current number of entries."""
+        with self.lock:
+            (entries,) = self.conn.execute("SELECT count(*) FROM lookups").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def _get(self, key: str, allow_stale: bool) -> tuple[bool, object]:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM lookups WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] < now and not allow_stale):
+                self.misses += 1
+                return False, None
+            self.touched[key] = now
+            if len(self.touched) >= self.touch_batch_size:
+                self._write_touched()
+                self.conn.commit()
+            self.hits += 1
+        return True, json.loads(row[0])
+
+    def _set(self, key: str, value: object, ttl: float):
+        now = time.time()
+        row = (json.dumps(value), now + ttl, now, key)
+        with self.lock:
+            # Written in the same transaction, so that eviction sees every hit
+            self._write_touched()
+            updated = self.conn.execute(
+                """
+                UPDATE lookups SET value = ?, expires_at = ?, accessed_at = ?
+                WHERE key = ?
+                """,
+                row,
+            ).rowcount
+            if not updated:
+                self.conn.execute(
+                    """
+                    INSERT INTO lookups (value, expires_at, accessed_at, key)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    row,
+                )
+                self.entries += 1
+            if self.entries > self.max_entries:
+                (self.entries,) = self.conn.execute(
+                    "SELECT count(*) FROM lookups"
+                ).fetchone()
+                if self.entries > self.max_entries:
+                    self.entries -= self.conn.execute(
+                        """
+                        DELETE FROM lookups
+                        WHERE key IN (
+                            SELECT key FROM lookups ORDER BY accessed_at LIMIT ?
+                        )
+                        """,
+                        (self.entries - self.max_entries,),
+                    ).rowcount
+            self.conn.commit()
+
+    def _write_touched(self):
+        """Writes the buffered access times, without committing. Must be called with the lock held."""
+        if not self.touched:
+            return
+        self.conn.executemany(
+            "UPDATE lookups SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in self.touched.items()],
+        )
+        self.touched.clear()
+
+
+class RateLimiter:
+    """
+    A token bucket limiting the rate of requests to the API, which can be shared between clients and threads.
+    Callers reserve a token before each request and wait until it becomes available, so bursts are smoothed out rather than rejected.
+    When the API responds with a 429, the bucket is paused so that every caller backs off together.
+
+    ### Args:
+     - `rate`: the sustained number of requests allowed per second.
+     - `burst`: the number of requests that can be made back to back before throttling begins.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.throttle_delay = 0.0
+
+    def reserve(self) -> float:
+        """Takes a token from the bucket, returning the number of seconds to wait before using it."""
+        with self.lock:
+            self._refill()
+            self.tokens -= 1
+            delay = max(0.0, -self.tokens / self.rate)
+            self.requests += 1
+            if delay > 0:
+                self.throttled += 1
+                self.throttle_delay += delay
+            return delay
+
+    def acquire(self):
+        """Blocks until a request can be made."""
+        time.sleep(self.reserve())
+
+    async def acquire_async(self):
+        """Waits without blocking the event loop until a request can be made."""
+        await asyncio.sleep(self.reserve())
+
+    def pause(self, seconds: float):
+        """Stops any tokens being handed out for the passed number of seconds."""
+        with self.lock:
+            # Refilling first means time spent idle before the pause can't be credited against it
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def metrics(self) -> dict:
+        """Returns the number of requests made, how many were throttled, and the total seconds spent throttled."""
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "throttle_delay": self.throttle_delay,
+            }
+
+    def _refill(self):
+        # Must be called with the lock held
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed request is retried.
+    Rate limiting (429) and transient server errors are retried with jittered exponential backoff, honouring any `Retry-After` header sent by the API.
+
+    ### Args:
+     - `max_attempts`: the maximum number of attempts per request, including the first.
+     - `base_delay`: the backoff ceiling in seconds for the first retry, doubling on every further retry.
+     - `max_delay`: the longest wait in seconds before a retry. A `Retry-After` longer than this is not waited for.
+     - `retry_statuses`: the HTTP status codes which are worth retrying.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        retry_statuses: Iterable[int] = (429, 500, 502, 503, 504),
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = frozenset(retry_statuses)
+        self.lock = threading.Lock()
+        self.retries = 0
+        self.retry_delay = 0.0
+
+    def get_delay(self, attempt: int, retry_after: str | None = None) -> float | None:
+        """
+        Works out how long to wait before retrying a request.
+
+        ### Args:
+         - `attempt`: the number of attempts made so far.
+         - `retry_after`: the value of the response's `Retry-After` header, if any.
+
+        ### Returns:
+        The number of seconds to wait, or `None` if the request shouldn't be retried.
+        """
+        if attempt >= self.max_attempts:
+            return None
+
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+            delay = random.uniform(0, ceiling)
+        elif delay > self.max_delay:
+            return None
+
+        with self.lock:
+            self.retries += 1
+            self.retry_delay += delay
+        return delay
+
+    def metrics(self) -> dict:
+        """Returns the number of retries made and the total seconds spent waiting to retry."""
+        with self.lock:
+            return {"retries": self.retries, "retry_delay": self.retry_delay}
+
+
+def parse_retry_after(retry_after: str | None) -> float | None:
+    """
+    Parses a `Retry-After` header, given either as a number of seconds or as an HTTP date.
+    Returns the number of seconds to wait, or `None` if the header is missing or invalid.
+    """
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls from different threads which share a key.
+    While a call for a key is in flight, further callers for that key wait for it and share its result or exception instead of repeating the work.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, function: Callable, *args):
+        """Calls `function(*args)`, unless a call with the same key is already in flight, and returns its result."""
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = function(*args)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent calls from different tasks on one event loop which share a key.
+    While a call for a key is in flight, further callers for that key await it and share its result or exception instead of repeating the work.
+    Cancelling one caller doesn't affect the others, but the shared call is cancelled once every caller has been cancelled.
+    """
+
+    def __init__(self):
+        self.calls: dict[Hashable, asyncio.Task] = {}
+        self.waiters: dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, function: Callable[..., Awaitable], *args):
+        """Awaits `function(*args)`, unless a call with the same key is already in flight, and returns its result."""
+        task = self.calls.get(key)
+        if task is None:
+            task = self.calls[key] = asyncio.ensure_future(function(*args))
+            self.waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+
+        self.waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if self.calls.get(key) is task:
+                self.waiters[key] -= 1
+                if self.waiters[key] == 0 and not task.done():
+                    task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+            del self.waiters[key]
+
+
+class BooksApiClient:
+    """
+    A client for the Google Books API.
+    Holds a pooled session so that connections to the API are kept alive and reused between lookups, rather than paying for a fresh TCP and TLS handshake on every request.
+
+    ### Args:
+     - `base_url`: the root URL of the Google Books API.
+     - `pool_size`: the maximum number of connections kept open to the API host.
+     - `timeout`: the timeout in seconds for each request, either as a single value or as a `(connect, read)` tuple.
+     - `cache`: an optional `LookupCache` to check before calling the API.
+     - `rate_limiter`: an optional `RateLimiter` to throttle requests, which may be shared with other clients.
+     - `retry`: an optional `RetryPolicy` for rate limited and transient failures. Without one, failures raise immediately.
+     - `index`: an optional offline `IsbnIndex`, checked by `get_book_by_isbn` before calling the API.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        pool_size: int = 10,
+        timeout: float | tuple[float, float] = 3.05,
+        cache: LookupCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry: RetryPolicy | None = None,
+        index: IsbnIndex | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.cache = cache
+        self.index = index
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.in_flight = SingleFlight()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes all pooled connections held by the client."""
+        self.session.close()
+
+    def _get(self, url: str) -> dict:
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except (ConnectionError, Timeout):
+                delay = get_retry_delay(self.retry, self.rate_limiter, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+
+            delay = get_retry_delay(self.retry, self.rate_limiter, attempt, response)
+            if delay is None:
+                raise HTTPError(f"Non-success status code: {response.status_code}")
+            time.sleep(delay)
+
+    def metrics(self) -> dict:
+        """Returns the throttling and retry metrics for the client's rate limiter and retry policy."""
+        return get_metrics(self.rate_limiter, self.retry)
+
+    def get_volume_id_by_isbn(self, isbn: str) -> str:
+        """
+        Calls the Google Books API with the passed ISBN, unless the result is already cached.
+        If a single match is found, returns the volume id.
+        If either no matches or multiple matches are found, raises a NoMatchingISBN exception.
+        """
+        return self._search_isbn(isbn)["id"]
+
+    def _search_isbn(self, isbn: str) -> dict:
+        # Returns the matching volume resource from the search response, or just its id if cached
+        return self.in_flight.do(("isbn", isbn), self._fetch_search, isbn)
+
+    def _fetch_search(self, isbn: str) -> dict:
+        url = f"{self.base_url}/volumes?q=isbn:{isbn}"
+        if self.cache is None:
+            return volume_from_search(self._get(url))
+
+        hit, volume_id = self.cache.get_volume_id(isbn)
+        if not hit:
+            try:
+                volume = volume_from_search(self._get(url))
+            except NoMatchingISBN:
+                self.cache.set_volume_id(isbn, None)
+                raise
+            except RequestException:
+                hit, volume_id = self.cache.get_volume_id(isbn, allow_stale=True)
+                if not hit:
+                    raise
+            else:
+                self.cache.set_volume_id(isbn, volume["id"])
+                if has_stored_fields(volume):
+                    self.cache.set_volume(volume["id"], volume)
+                return volume
+
+        if volume_id is None:
+            raise NoMatchingISBN()
+        return {"id": volume_id}
+
+    def get_book_by_volume_id(self, volume_id: str) -> dict:
+        """
+        Calls the Google Books API with the passed volume id, unless the volume is already cached.
+        Returns desired info about the book as a dictionary, after cleaning it.
+        Should only be called after a volume id is confirmed to ensure a match is present.
+        """
+        response_body = self.in_flight.do(
+            ("volume", volume_id), self._fetch_volume, volume_id
+        )
+        return extract_book_info(response_body)
+
+    def _fetch_volume(self, volume_id: str) -> dict:
+        url = f"{self.base_url}/volumes/{volume_id}"
+        if self.cache is None:
+            return self._get(url)
+
+        response_body = self.cache.get_volume(volume_id)
+        if response_body is None:
+            try:
+                response_body = self._get(url)
+            except RequestException:
+                response_body = self.cache.get_volume(volume_id, allow_stale=True)
+                if response_body is None:
+                    raise
+            else:
+                self.cache.set_volume(volume_id, response_body)
+        return response_body
+
+    def get_book_by_isbn(self, isbn: str) -> dict:
+        """
+        Returns the cleaned info about the volume matching the passed ISBN.
+        If the client has an offline index containing the ISBN, the API isn't called at all.
+        Otherwise, the info is built straight from the search response where possible, only fetching the volume separately if the search response is missing fields that are stored.
+        Raises a NoMatchingISBN exception if the ISBN doesn't match a single volume.
+        """
+        if self.index is not None:
+            book_info = self.index.get(isbn)
+            if book_info is not None:
+                return book_info
+
+        volume = self._search_isbn(isbn)
+        if has_stored_fields(volume):
+            return extract_book_info(volume)
+        return self.get_book_by_volume_id(volume["id"])
+
+    def get_books_by_isbns(
+        self, isbns: Iterable[str], max_workers: int | None = None
+    ) -> list[IsbnLookup]:
+        """
+        Looks up many ISBNs in parallel on a bounded pool of worker threads.
+        A failed lookup is recorded against its ISBN rather than failing the whole batch.
+
+        ### Args:
+         - `isbns`: the ISBNs to look up.
+         - `max_workers`: the maximum number of concurrent lookups. Defaults to the client's `pool_size`, so that every worker can hold a pooled connection.
+
+        ### Returns:
+        A list of `IsbnLookup` results in the same order as the passed ISBNs.
+        """
+        if max_workers is None:
+            max_workers = self.pool_size
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self._lookup_isbn, isbns))
+
+    def _lookup_isbn(self, isbn: str) -> IsbnLookup:
+        try:
+            return IsbnLookup(isbn, self.get_book_by_isbn(isbn), None)
+        except (NoMatchingISBN, RequestException) as error:
+            return IsbnLookup(isbn, None, error)
+
+
+class AsyncBooksApiClient:
+    """
+    An asyncio equivalent of `BooksApiClient`, for use inside an event loop.
+    Concurrent lookups share a pool of keep-alive connections and are bounded by a semaphore, so many lookups can be in flight without a thread per request.
+    Lookups are cancellable, and produce exactly the same results as the synchronous client.
+
+    ### Args:
+     - `base_url`: the root URL of the Google Books API.
+     - `max_concurrency`: the maximum number of requests in flight at once.
+     - `timeout`: the maximum time in seconds for each request. A request exceeding this raises a `TimeoutError`.
+     - `cache`: an optional `LookupCache` to check before calling the API. Cache reads are local and fast enough to run inline on the event loop.
+     - `rate_limiter`: an optional `RateLimiter` to throttle requests, which may be shared with other clients.
+     - `retry`: an optional `RetryPolicy` for rate limited, timed out and transient failures. Without one, failures raise immediately.
+     - `index`: an optional offline `IsbnIndex`, checked by `get_book_by_isbn` before calling the API.
+     - `transport`: an optional `httpx` transport, mainly for testing.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        max_concurrency: int = 10,
+        timeout: float = 3.05,
+        cache: LookupCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry: RetryPolicy | None = None,
+        index: IsbnIndex | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache = cache
+        self.index = index
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.in_flight = AsyncSingleFlight()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            timeout=timeout,
+            transport=transport,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Closes all pooled connections held by the client."""
+        await self.client.aclose()
+
+    async def _get(self, url: str) -> dict:
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            try:
+                async with self.semaphore:
+                    async with asyncio.timeout(self.timeout):
+                        response = await self.client.get(url)
+            except (httpx.TransportError, TimeoutError):
+                delay = get_retry_delay(self.retry, self.rate_limiter, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+
+            delay = get_retry_delay(self.retry, self.rate_limiter, attempt, response)
+            if delay is None:
+                raise HTTPError(f"Non-success status code: {response.status_code}")
+            await asyncio.sleep(delay)
+
+    def metrics(self) -> dict:
+        """Returns the throttling and retry metrics for the client's rate limiter and retry policy."""
+        return get_metrics(self.rate_limiter, self.retry)
+
+    async def get_volume_id_by_isbn(self, isbn: str) -> str:
+        """
+        Calls the Google Books API with the passed ISBN, unless the result is already cached.
+        If a single match is found, returns the volume id.
+        If either no matches or multiple matches are found, raises a NoMatchingISBN exception.
+        """
+        return (await self._search_isbn(isbn))["id"]
+
+    async def _search_isbn(self, isbn: str) -> dict:
+        return await self.in_flight.do(("isbn", isbn), self._fetch_search, isbn)
+
+    async def _fetch_search(self, isbn: str) -> dict:
+        url = f"{self.base_url}/volumes?q=isbn:{isbn}"
+        if self.cache is None:
+            return volume_from_search(await self._get(url))
+
+        hit, volume_id = self.cache.get_volume_id(isbn)
+        if not hit:
+            try:
+                volume = volume_from_search(await self._get(url))
+            except NoMatchingISBN:
+                self.cache.set_volume_id(isbn, None)
+                raise
+            except (HTTPError, httpx.HTTPError, TimeoutError):
+                hit, volume_id = self.cache.get_volume_id(isbn, allow_stale=True)
+                if not hit:
+                    raise
+            else:
+                self.cache.set_volume_id(isbn, volume["id"])
+                if has_stored_fields(volume):
+                    self.cache.set_volume(volume["id"], volume)
+                return volume
+
+        if volume_id is None:
+            raise NoMatchingISBN()
+        return {"id": volume_id}
+
+    async def get_book_by_volume_id(self, volume_id: str) -> dict:
+        """
+        Calls the Google Books API with the passed volume id, unless the volume is already cached.
+        Returns desired info about the book as a dictionary, after cleaning it.
+        """
+        response_body = await self.in_flight.do(
+            ("volume", volume_id), self._fetch_volume, volume_id
+        )
+        return extract_book_info(response_body)
+
+    async def _fetch_volume(self, volume_id: str) -> dict:
+        url = f"{self.base_url}/volumes/{volume_id}"
+        if self.cache is None:
+            return await self._get(url)
+
+        response_body = self.cache.get_volume(volume_id)
+        if response_body is None:
+            try:
+                response_body = await self._get(url)
+            except (HTTPError, httpx.HTTPError, TimeoutError):
+                response_body = self.cache.get_volume(volume_id, allow_stale=True)
+                if response_body is None:
+                    raise
+            else:
+                self.cache.set_volume(volume_id, response_body)
+
+        return response_body
+
+    async def get_book_by_isbn(self, isbn: str) -> dict:
+        """
+        Returns the cleaned info about the volume matching the passed ISBN.
+        If the client has an offline index containing the ISBN, the API isn't called at all.
+        Otherwise, the info is built straight from the search response where possible, only fetching the volume separately if the search response is missing fields that are stored.
+        Raises a NoMatchingISBN exception if the ISBN doesn't match a single volume.
+        """
+        if self.index is not None:
+            book_info = self.index.get(isbn)
+            if book_info is not None:
+                return book_info
+
+        volume = await self._search_isbn(isbn)
+        if has_stored_fields(volume):
+            return extract_book_info(volume)
+        return await self.get_book_by_volume_id(volume["id"])
+
+    async def get_books_by_isbns(self, isbns: Iterable[str]) -> list[IsbnLookup]:
+        """
+        Looks up many ISBNs concurrently, bounded by the client's `max_concurrency`.
+        A failed or timed out lookup is recorded against its ISBN rather than failing the whole batch.
+        Cancelling the batch cancels every outstanding lookup.
+
+        ### Returns:
+        A list of `IsbnLookup` results in the same order as the passed ISBNs.
+        """
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(self._lookup_isbn(isbn)) for isbn in isbns]
+        return [task.result() for task in tasks]
+
+    async def _lookup_isbn(self, isbn: str) -> IsbnLookup:
+        try:
+            return IsbnLookup(isbn, await self.get_book_by_isbn(isbn), None)
+        except (NoMatchingISBN, HTTPError, httpx.HTTPError, TimeoutError) as error:
+            return IsbnLookup(isbn, None, error)
+
+
+def get_retry_delay(
+    retry: RetryPolicy | None,
+    rate_limiter: RateLimiter | None,
+    attempt: int,
+    response=None,
+) -> float | None:
+    """
+    Works out how long a client should wait before retrying a failed request.
+    Pass the response for a non-success status code, or `None` for a connection failure or timeout.
+    If the API is rate limiting requests, the rate limiter is also paused so that other callers back off.
+    Returns `None` if the request shouldn't be retried.
+    """
+    if retry is None:
+        return None
+    if response is None:
+        return retry.get_delay(attempt)
+    if response.status_code not in retry.retry_statuses:
+        return None
+
+    delay = retry.get_delay(attempt, response.headers.get("Retry-After"))
+    if delay is not None and response.status_code == 429 and rate_limiter:
+        rate_limiter.pause(delay)
+    return delay
+
+
+def get_metrics(rate_limiter: RateLimiter | None, retry: RetryPolicy | None) -> dict:
+    """Combines the metrics of a client's rate limiter and retry policy, for whichever are in use."""
+    metrics = {}
+    if rate_limiter is not None:
+        metrics.update(rate_limiter.metrics())
+    if retry is not None:
+        metrics.update(retry.metrics())
+    return metrics
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> BooksApiClient:
+    """
+    Returns the client shared by the module-level lookup functions, creating it on first use.
+    If the `TOME_TRACKER_CACHE_PATH` environment variable is set, lookups are cached in a `LookupCache` at that path.
+    If the `TOME_TRACKER_API_RATE` environment variable is set, requests are throttled to that many per second, to stay under the API key's quota.
+    If the `TOME_TRACKER_ISBN_INDEX` environment variable is set, ISBNs are first looked up in the offline `IsbnIndex` at that path.
+    Failures are retried with the default `RetryPolicy`.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            cache_path = os.getenv("TOME_TRACKER_CACHE_PATH")
+            cache = LookupCache(cache_path) if cache_path else None
+            index_path = os.getenv("TOME_TRACKER_ISBN_INDEX")
+            index = IsbnIndex(index_path) if index_path else None
+            rate = os.getenv("TOME_TRACKER_API_RATE")
+            rate_limiter = (
+                RateLimiter(float(rate), burst=max(1, int(float(rate))))
+                if rate
+                else None
+            )
+            _default_client = BooksApiClient(
+                cache=cache,
+                rate_limiter=rate_limiter,
+                retry=RetryPolicy(),
+                index=index,
+            )
+        return _default_client
+
+
 def get_volume_id_by_isbn(isbn: str) -> str:
     """
     Calls the Google Books API with the passed ISBN.
     If a single match is found, returns the volume id.
     If either no matches or multiple matches are found, raises a NoMatchingISBN exception.
     """
-    url = f"https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn}"
-    response = requests.get(url, timeout=3.05)
-    if response.status_code == 200:
-        response_body = response.json()
-        if response_body["totalItems"] == 1:
-            return response_body["items"][0]["id"]
-        else:
-            raise NoMatchingISBN()
-
-    raise HTTPError(f"Non-success status code: {response.status_code}")
+    return get_default_client().get_volume_id_by_isbn(isbn)
 
 
 def get_book_by_volume_id(volume_id: str) -> dict:
@@ -32,99 +884,223 @@ def get_book_by_volume_id(volume_id: str) -> dict:
     Returns desired info about the book as a dictionary, after cleaning it.
     Should only be called after a volume id is confirmed to ensure a match is present.
     """
-    url = f"https://www.googleapis.com/books/v1/volumes/{volume_id}"
-    response = requests.get(url, timeout=3.05)
-    if response.status_code == 200:
-        response_body = response.json()
-
-        # Need to handle keys in separate blocks due to different locations in the JSON
-        # KeyErrors will occur if the response body is missing info
-        book_info = {}
-        keys = ["id", "etag", "selfLink"]
-        volume_info_keys = [
-            "title",
-            "authors",
-            "publisher",
-            "publishedDate",
-            "description",
-            "pageCount",
-            "categories",
-            "language",
-        ]
-        list_format_keys = [
-            "authors",
-            "categories",
-        ]
-
-        for key in keys:
-            try:
-                book_info[key] = response_body[key]
-            except KeyError:
-                book_info[key] = None
+    return get_default_client().get_book_by_volume_id(volume_id)
 
-        for key in volume_info_keys:
-            try:
-                book_info[key] = response_body["volumeInfo"][key]
-            except KeyError:
-                if key in list_format_keys:
-                    book_info[key] = []
-                else:
-                    book_info[key] = None
 
+def get_books_by_isbns(
+    isbns: Iterable[str], max_workers: int | None = None
+) -> list[IsbnLookup]:
+    """
+    Looks up many ISBNs in parallel using the default client.
+    Returns a list of `IsbnLookup` results in the same order as the passed ISBNs, each holding either the cleaned book info or the error raised for that ISBN.
+    """
+    return get_default_client().get_books_by_isbns(isbns, max_workers)
+
+
+def get_book_by_isbn(isbn: str) -> dict:
+    """
+    Returns the cleaned info about the volume matching the passed ISBN, using as few API calls as possible.
+    Raises a NoMatchingISBN exception if the ISBN doesn't match a single volume.
+    """
+    return get_default_client().get_book_by_isbn(isbn)
+
+
+def volume_from_search(response_body: dict) -> dict:
+    """
+    Returns the matching volume resource from a Google Books ISBN search response.
+    If either no matches or multiple matches are found, raises a NoMatchingISBN exception.
+    """
+    if response_body["totalItems"] == 1:
+        return response_body["items"][0]
+    else:
+        raise NoMatchingISBN()
+
+
+def has_stored_fields(volume: dict) -> bool:
+    """
+    Checks whether a volume resource includes the fields that are only sometimes left out of search responses.
+    If so, the book info can be extracted without fetching the volume separately.
+    """
+    volume_info = volume.get("volumeInfo", {})
+    return all(field in volume_info for field in SEARCH_PROJECTION_FIELDS)
+
+
+def extract_book_info(response_body: dict) -> dict:
+    """
+    Extracts the desired info about a book from a Google Books volume resource.
+    Returns the info as a dictionary, after cleaning it.
+    """
+    # Need to handle keys in separate blocks due to different locations in the JSON
+    # KeyErrors will occur if the response body is missing info
+    book_info = {}
+    keys = ["id", "etag", "selfLink"]
+    volume_info_keys = [
+        "title",
+        "authors",
+        "publisher",
+        "publishedDate",
+        "description",
+        "pageCount",
+        "categories",
+        "language",
+    ]
+    list_format_keys = [
+        "authors",
+        "categories",
+    ]
+
+    for key in keys:
         try:
-            book_info["isbn_10"] = None
-            book_info["isbn_13"] = None
-
-            for identifier in response_body["volumeInfo"]["industryIdentifiers"]:
-                if identifier["type"] == "ISBN_10":
-                    book_info["isbn_10"] = identifier["identifier"]
-                elif identifier["type"] == "ISBN_13":
-                    book_info["isbn_13"] = identifier["identifier"]
+            book_info[key] = response_body[key]
         except KeyError:
-            pass
+            book_info[key] = None
 
+    for key in volume_info_keys:
         try:
-            book_info["thumbnail"] = response_body["volumeInfo"]["imageLinks"][
-                "thumbnail"
-            ]
+            book_info[key] = response_body["volumeInfo"][key]
         except KeyError:
-            book_info["thumbnail"] = None
+            if key in list_format_keys:
+                book_info[key] = []
+            else:
+                book_info[key] = None
+
+    try:
+        book_info["isbn_10"] = None
+        book_info["isbn_13"] = None
 
-        cleaned_book_info = clean_book_info(book_info)
+        for identifier in response_body["volumeInfo"]["industryIdentifiers"]:
+            if identifier["type"] == "ISBN_10":
+                book_info["isbn_10"] = identifier["identifier"]
+            elif identifier["type"] == "ISBN_13":
+                book_info["isbn_13"] = identifier["identifier"]
+    except KeyError:
+        pass
 
-        return cleaned_book_info
+    try:
+        book_info["thumbnail"] = response_body["volumeInfo"]["imageLinks"]["thumbnail"]
+    except KeyError:
+        book_info["thumbnail"] = None
 
-    raise HTTPError(f"Non-success status code: {response.status_code}")
+    return clean_book_info(book_info)
+
+
+def extract_openlibrary_book_info(record: dict) -> dict:
+    """
+    Extracts the desired info about a book from an Open Library edition record.
+    Returns the info as a dictionary with the same keys as `extract_book_info`, after cleaning it.
+    Edition records only reference authors by key, so `authors` is left empty.
+    """
+    key = record["key"]
+    publishers = record.get("publishers") or [None]
+    languages = record.get("languages") or [{"key": ""}]
+    covers = [cover for cover in record.get("covers", []) if cover > 0]
+    description = record.get("description")
+    if isinstance(description, dict):
+        description = description.get("value")
+
+    book_info = {
+        "id": key.rsplit("/", 1)[-1],
+        "etag": None,
+        "selfLink": f"https://openlibrary.org{key}.json",
+        "title": record.get("title"),
+        "authors": [],
+        "publisher": publishers[0],
+        "publishedDate": record.get("publish_date"),
+        "description": description,
+        "pageCount": record.get("number_of_pages"),
+        "categories": record.get("subjects", []),
+        "language": MARC_LANGUAGE_CODES.get(languages[0]["key"].rsplit("/", 1)[-1]),
+        "isbn_10": first_isbn(record.get("isbn_10", []), 10),
+        "isbn_13": first_isbn(record.get("isbn_13", []), 13),
+        "thumbnail": (
+            f"https://covers.openlibrary.org/b/id/{covers[0]}-M.jpg" if covers else None
+        ),
+    }
+    return clean_book_info(book_info)
+
+
+def first_isbn(isbns: Iterable[str], length: int) -> str | None:
+    """Picks the first of the passed ISBNs with `length` characters once dashes and spaces are removed, or returns `None` if there isn't one."""
+    for isbn in isbns:
+        key = normalise_isbn(isbn)
+        if key is not None and len(isbn := key.decode("ascii").strip()) == length:
+            return isbn
+    return None
+
+
+def read_metadata_dump(dump_path: str, dump_format: str = "google") -> Iterator[dict]:
+    """
+    Streams cleaned book info dictionaries from a bulk metadata dump, one line at a time.
+
+    ### Args:
+     - `dump_path`: the path of the dump, which may be gzipped.
+     - `dump_format`: either `google` for a JSONL file of Google Books volume resources, or `openlibrary` for an Open Library editions dump. Open Library's tab-separated dumps, with the record JSON in the last column, are also accepted.
+    """
+    extractors = {
+        "google": extract_book_info,
+        "openlibrary": extract_openlibrary_book_info,
+    }
+    if dump_format not in extractors:
+        raise ValueError(f"Unknown dump format: {dump_format}")
+    extract = extractors[dump_format]
+
+    opener = gzip.open if dump_path.endswith(".gz") else open
+    with opener(dump_path, "rt", encoding="utf-8") as dump:
+        for line in dump:
+            line = line.strip()
+            if line:
+                yield extract(json.loads(line.rsplit("\t", 1)[-1]))
+
+
+def build_isbn_index(
+    dump_path: str,
+    index_path: str,
+    dump_format: str = "google",
+    chunk_size: int = 100_000,
+) -> int:
+    """
+    Builds an offline `IsbnIndex` from a bulk metadata dump, without loading the dump into memory.
+    See `read_metadata_dump` for the accepted dump formats.
+    Returns the number of ISBNs in the index.
+    """
+    records = read_metadata_dump(dump_path, dump_format)
+    return write_isbn_index(records, index_path, chunk_size)
 
 
 def clean_book_info(book_info: dict) -> dict:
     """
     Cleans the book info dictionary:
      - Standardises all dates as YYYY-MM-DD, defaulting to earliest match for passed dates.
+     - Discards dates in an unrecognised format as `None`.
      - Standardises capitalisation of author names.
     Returns the modified book info dictionary with the same key structure.
     """
-    while True:
-        date = book_info["publishedDate"]
-        if date is None:
-            break
-        elif re.match(r"^\d{4}$", date):
-            updated_date = "".join([date, "-01-01"])
-            book_info["publishedDate"] = updated_date
-            break
-        elif re.match(r"^\d{4}-\d{2}$", date):
-            updated_date = "".join([date, "-01"])
-            book_info["publishedDate"] = updated_date
-            break
-        elif re.match(r"^\d{4}-\d-*\d*\d*$", date):
-            updated_date = "".join([date[:4], "-0", date[5:]])
-            book_info["publishedDate"] = updated_date
-        elif re.match(r"^\d{4}-\d{2}-\d$", date):
-            updated_date = "".join([date[:7], "-0", date[-1]])
-            book_info["publishedDate"] = updated_date
-        elif re.match(r"^\d{4}-\d{2}-\d{2}$", date):
-            break
+    date = book_info["publishedDate"]
+    if date is not None:
+        book_info["publishedDate"] = normalise_published_date(date)
 
     book_info["authors"] = [a.title() for a in book_info["authors"]]
 
     return book_info
+
+
+def clean_book_infos(records: Iterable[dict]) -> list[dict]:
+    """
+    Cleans many book info dictionaries in one call, as `clean_book_info` does for a single dictionary.
+    Returns a list of the modified dictionaries in the same order.
+    """
+    return [clean_book_info(book_info) for book_info in records]
+
+
+@functools.lru_cache(maxsize=4096)
+def normalise_published_date(date: str) -> str | None:
+    """
+    Standardises a published date given as YYYY, YYYY-MM or YYYY-MM-DD as YYYY-MM-DD.
+    Months and days may have one or two digits, and missing values default to the first of the month or year.
+    Returns `None` if the date is in any other format.
+    """
+    match = PUBLISHED_DATE_PATTERN.fullmatch(date)
+    if match is None:
+        return None
+    year, month, day = match.groups()
+    return f"{year}-{(month or '1').zfill(2)}-{(day or '1').zfill(2)}"
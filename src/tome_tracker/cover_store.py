@@ -0,0 +1,189 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+
+
+class CoverStore:
+    """
+    A local store of cover thumbnails, so that covers can be shown without fetching them remotely on every render.
+    Thumbnails are downloaded by a pool of background workers and saved on disk under the SHA-256 of their content, so identical covers are only stored once.
+    Once the store grows past `max_bytes`, the least recently used covers are evicted.
+
+    ### Args:
+     - `directory`: the directory to store covers in, which is created if needed.
+     - `max_bytes`: the maximum total size of the stored covers.
+     - `max_workers`: the number of covers downloaded at once.
+     - `timeout`: the timeout in seconds for each download.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 100 * 1024 * 1024,
+        max_workers: int = 4,
+        timeout: float = 3.05,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="covers")
+        self.pending: dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            os.path.join(directory, "covers.sqlite3"), check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS covers (
+                url TEXT PRIMARY KEY,
+                digest TEXT,
+                size INTEGER,
+                accessed_at REAL
+            )
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS covers_accessed_at_idx
+            ON covers (accessed_at)
+        """)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Waits for any downloads in progress, then closes the store."""
+        self.executor.shutdown(wait=True)
+        self.session.close()
+        self.conn.close()
+
+    def prefetch(self, url: str | None) -> Future | None:
+        """
+        Queues a cover to be downloaded in the background, unless it is already stored or queued.
+
+        ### Returns:
+        A future resolving to the local path of the cover, or `None` if there was nothing to download.
+        """
+        if url is None:
+            return None
+        with self.lock:
+            if url in self.pending:
+                return self.pending[url]
+            if self._lookup(url) is not None:
+                return None
+            future = self.pending[url] = self.executor.submit(self._download, url)
+        return future
+
+    def get_cover_path(self, url: str | None) -> str | None:
+        """
+        Returns the local path of a stored cover, given the thumbnail URL stored with a book.
+        Returns `None` if the cover hasn't been downloaded, without fetching it.
+        """
+        if url is None:
+            return None
+        with self.lock:
+            digest = self._lookup(url)
+            if digest is None:
+                return None
+            self.conn.execute(
+                "UPDATE covers SET accessed_at = ? WHERE url = ?", (time.time(), url)
+            )
+            self.conn.commit()
+        return self._path(digest)
+
+    def get_cover_bytes(self, url: str | None) -> bytes | None:
+        """Returns the content of a stored cover, or `None` if it hasn't been downloaded."""
+        path = self.get_cover_path(url)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as cover:
+                return cover.read()
+        except FileNotFoundError:
+            return None
+
+    def _lookup(self, url: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT digest FROM covers WHERE url = ?", (url,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _download(self, url: str) -> str | None:
+        try:
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except RequestException:
+                return None
+            if response.status_code != 200 or not response.content:
+                return None
+
+            content = response.content
+            digest = hashlib.sha256(content).hexdigest()
+            path = self._path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as cover:
+                cover.write(content)
+
+            with self.lock:
+                # The file is only checked for once the lock is held, since another download's eviction may delete it until then
+                if os.path.exists(path):
+                    os.remove(temp_path)
+                else:
+                    os.replace(temp_path, path)
+                self.conn.execute(
+                    """
+                    INSERT INTO covers VALUES (?, ?, ?, ?)
+                    ON CONFLICT (url) DO UPDATE SET
+                        digest = excluded.digest,
+                        size = excluded.size,
+                        accessed_at = excluded.accessed_at
+                    """,
+                    (url, digest, len(content), time.time()),
+                )
+                self._evict()
+                self.conn.commit()
+                return self._path(digest) if self._lookup(url) else None
+        finally:
+            with self.lock:
+                self.pending.pop(url, None)
+
+    def _evict(self):
+        # Covers shared by several URLs only count towards the total once
+        (total,) = self.conn.execute("""
+            SELECT COALESCE(SUM(size), 0)
+            FROM (SELECT DISTINCT digest, size FROM covers)
+        """).fetchone()
+        while total > self.max_bytes:
+            url, digest, size = self.conn.execute("""
+                SELECT url, digest, size FROM covers
+                ORDER BY accessed_at
+                LIMIT 1
+            """).fetchone()
+            self.conn.execute("DELETE FROM covers WHERE url = ?", (url,))
+            shared = self.conn.execute(
+                "SELECT 1 FROM covers WHERE digest = ?", (digest,)
+            ).fetchone()
+            if shared is None:
+                total -= size
+                try:
+                    os.remove(self._path(digest))
+                except FileNotFoundError:
+                    pass
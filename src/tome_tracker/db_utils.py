@@ -1,34 +1,2325 @@
+import atexit
+import base64
 import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from typing import (
+    IO,
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Protocol,
+    Sequence,
+)
 
 import psycopg
 from dotenv import load_dotenv
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
 
 load_dotenv()
 
+BOOK_COLUMNS = (
+    "id",
+    "etag",
+    "self_link",
+    "title",
+    "authors",
+    "publisher",
+    "published_date",
+    "description",
+    "page_count",
+    "categories",
+    "language",
+    "isbn_10",
+    "isbn_13",
+    "thumbnail",
+    "read",
+    "added",
+)
 
-def create_books_table(db_name: str):
-    """Creates the `books` table in the passed database to store book info."""
-    with psycopg.connect(f"dbname={db_name}") as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS books (
-                id VARCHAR(20) PRIMARY KEY,
-                etag VARCHAR(20),
-                self_link TEXT,
-                title TEXT,
-                authors TEXT[],
-                publisher TEXT,
-                published_date DATE,
-                description TEXT,
-                page_count INT,
-                categories TEXT[],
-                language CHAR(2),
-                isbn_10 CHAR(10),
-                isbn_13 CHAR(13),
-                thumbnail TEXT,
-                read BOOLEAN,
-                added DATE
+READ_CONDITIONS = {None: "read IS NOT NULL", True: "read", False: "NOT read"}
+
+# Schema changes, applied in order by `BookRepository.migrate`
+# Each migration's version is its position in the list, starting at 1, so new migrations must only be appended
+MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS books (
+        id VARCHAR(20) PRIMARY KEY,
+        etag VARCHAR(20),
+        self_link TEXT,
+        title TEXT,
+        authors TEXT[],
+        publisher TEXT,
+        published_date DATE,
+        description TEXT,
+        page_count INT,
+        categories TEXT[],
+        language CHAR(2),
+        isbn_10 CHAR(10),
+        isbn_13 CHAR(13),
+        thumbnail TEXT,
+        read BOOLEAN,
+        added DATE
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS books_isbn_10_idx ON books (isbn_10);
+    CREATE INDEX IF NOT EXISTS books_isbn_13_idx ON books (isbn_13);
+    CREATE INDEX IF NOT EXISTS books_title_idx ON books (title);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS books_read_title_idx ON books (title) WHERE read;
+    CREATE INDEX IF NOT EXISTS books_unread_title_idx ON books (title) WHERE NOT read;
+    """,
+    # array_to_string is only stable, so generated columns need an immutable wrapper
+    """
+    CREATE OR REPLACE FUNCTION books_join_array(TEXT[]) RETURNS TEXT
+        LANGUAGE SQL IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT array_to_string($1, ' ') $$;
+    ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', COALESCE(title, '')), 'A')
+            || setweight(to_tsvector('english', COALESCE(books_join_array(authors), '')), 'B')
+            || setweight(to_tsvector('english', COALESCE(books_join_array(categories), '')), 'C')
+            || setweight(to_tsvector('english', COALESCE(description, '')), 'D')
+        ) STORED;
+    CREATE INDEX IF NOT EXISTS books_search_idx ON books USING GIN (search_vector);
+    """,
+    # Keyset pagination orders by (title, id), which these indexes also serve for title lookups
+    """
+    CREATE INDEX IF NOT EXISTS books_title_id_idx ON books (title, id);
+    CREATE INDEX IF NOT EXISTS books_read_title_id_idx ON books (title, id) WHERE read;
+    CREATE INDEX IF NOT EXISTS books_unread_title_id_idx ON books (title, id)
+        WHERE NOT read;
+    DROP INDEX IF EXISTS books_title_idx;
+    DROP INDEX IF EXISTS books_read_title_idx;
+    DROP INDEX IF EXISTS books_unread_title_idx;
+    """,
+    # Lets `CatalogueCache` in every process follow changes to the books
+    """
+    CREATE OR REPLACE FUNCTION books_notify() RETURNS TRIGGER
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'books_changed',
+                json_build_object('op', TG_OP, 'id', COALESCE(NEW.id, OLD.id))::text
+            );
+            RETURN NULL;
+        END
+        $$;
+    DROP TRIGGER IF EXISTS books_notify ON books;
+    CREATE TRIGGER books_notify
+        AFTER INSERT OR UPDATE OR DELETE ON books
+        FOR EACH ROW EXECUTE FUNCTION books_notify();
+    """,
+    # Summary tables for `get_library_stats`, kept up to date by a trigger rather than aggregated on demand
+    # The row-level trigger only orders the keys of one row, so it is replaced by statement-level triggers below
+    """
+    CREATE TABLE IF NOT EXISTS book_stats (
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        books BIGINT NOT NULL DEFAULT 0,
+        read_books BIGINT NOT NULL DEFAULT 0,
+        pages_read BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, value)
+    );
+    CREATE INDEX IF NOT EXISTS book_stats_ranking_idx
+        ON book_stats (dimension, books DESC, value);
+    CREATE OR REPLACE FUNCTION book_stats_keys(
+        book_authors TEXT[],
+        book_categories TEXT[],
+        book_language TEXT,
+        book_published_date DATE
+    )
+        RETURNS TABLE (dimension TEXT, value TEXT)
+        LANGUAGE SQL IMMUTABLE
+        AS $$
+            SELECT 'total', ''
+            UNION SELECT 'author', author FROM unnest(book_authors) AS author
+            UNION SELECT 'category', category FROM unnest(book_categories) AS category
+            UNION SELECT 'language', book_language
+            UNION SELECT 'year', extract(year FROM book_published_date)::int::text
+        $$;
+    CREATE OR REPLACE FUNCTION book_stats_apply(
+        book_authors TEXT[],
+        book_categories TEXT[],
+        book_language TEXT,
+        book_published_date DATE,
+        book_read BOOLEAN,
+        book_page_count INT,
+        direction INT
+    )
+        RETURNS VOID
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            INSERT INTO book_stats AS stats (dimension, value, books, read_books, pages_read)
+            SELECT
+                keys.dimension,
+                keys.value,
+                direction,
+                CASE WHEN book_read THEN direction ELSE 0 END,
+                CASE WHEN book_read THEN direction * COALESCE(book_page_count, 0) ELSE 0 END
+            FROM book_stats_keys(
+                book_authors, book_categories, book_language, book_published_date
+            ) AS keys
+            WHERE keys.value IS NOT NULL
+            ORDER BY keys.dimension, keys.value
+            ON CONFLICT (dimension, value) DO UPDATE SET
+                books = stats.books + excluded.books,
+                read_books = stats.read_books + excluded.read_books,
+                pages_read = stats.pages_read + excluded.pages_read;
+            IF direction < 0 THEN
+                DELETE FROM book_stats
+                WHERE dimension IN ('author', 'category', 'language', 'year') AND books = 0;
+            END IF;
+        END
+        $$;
+    CREATE OR REPLACE FUNCTION books_stats() RETURNS TRIGGER
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                PERFORM book_stats_apply(
+                    OLD.authors, OLD.categories, OLD.language, OLD.published_date,
+                    OLD.read, OLD.page_count, -1
+                );
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                PERFORM book_stats_apply(
+                    NEW.authors, NEW.categories, NEW.language, NEW.published_date,
+                    NEW.read, NEW.page_count, 1
+                );
+            END IF;
+            RETURN NULL;
+        END
+        $$;
+    DROP TRIGGER IF EXISTS books_stats ON books;
+    CREATE TRIGGER books_stats
+        AFTER INSERT OR UPDATE OR DELETE ON books
+        FOR EACH ROW EXECUTE FUNCTION books_stats();
+    INSERT INTO book_stats (dimension, value) VALUES ('total', '')
+        ON CONFLICT DO NOTHING;
+    INSERT INTO book_stats (dimension, value, books, read_books, pages_read)
+        SELECT
+            keys.dimension,
+            keys.value,
+            COUNT(*),
+            COUNT(*) FILTER (WHERE book.read),
+            COALESCE(SUM(book.page_count) FILTER (WHERE book.read), 0)
+        FROM books AS book
+            CROSS JOIN LATERAL book_stats_keys(
+                book.authors, book.categories, book.language, book.published_date
+            ) AS keys
+        WHERE keys.value IS NOT NULL
+        GROUP BY keys.dimension, keys.value
+        ON CONFLICT (dimension, value) DO UPDATE SET
+            books = excluded.books,
+            read_books = excluded.read_books,
+            pages_read = excluded.pages_read;
+    """,
+    # Trigram index for `find_similar_titles`, so fuzzy title matches are found through the index rather than by comparing every title
+    """
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS books_title_trgm_idx
+        ON books USING GIN (title gin_trgm_ops);
+    """,
+    # Keyset pagination orders by `COALESCE(title, '')` so that books without a title can be paged past
+    # `books_title_id_idx` stays for title lookups
+    """
+    CREATE INDEX IF NOT EXISTS books_title_key_idx ON books ((COALESCE(title, '')), id);
+    CREATE INDEX IF NOT EXISTS books_read_title_key_idx ON books ((COALESCE(title, '')), id)
+        WHERE read;
+    CREATE INDEX IF NOT EXISTS books_unread_title_key_idx ON books ((COALESCE(title, '')), id)
+        WHERE NOT read;
+    DROP INDEX IF EXISTS books_read_title_id_idx;
+    DROP INDEX IF EXISTS books_unread_title_id_idx;
+    """,
+    # Listings compared titles and ids by code point, until the migration below restored the database's collation
+    """
+    DROP INDEX IF EXISTS books_title_key_idx;
+    DROP INDEX IF EXISTS books_read_title_key_idx;
+    DROP INDEX IF EXISTS books_unread_title_key_idx;
+    CREATE INDEX books_title_key_idx
+        ON books ((COALESCE(title, '') COLLATE "C"), id COLLATE "C");
+    CREATE INDEX books_read_title_key_idx
+        ON books ((COALESCE(title, '') COLLATE "C"), id COLLATE "C") WHERE read;
+    CREATE INDEX books_unread_title_key_idx
+        ON books ((COALESCE(title, '') COLLATE "C"), id COLLATE "C") WHERE NOT read;
+    """,
+    # Statement-level stats triggers, which sum the changes of every row a statement touched and upsert each key once, in key order
+    # Concurrent multi-row writes then lock summary rows in the same order, rather than each row's keys in turn, which could deadlock
+    # The `total` row is still locked by every write until its transaction commits
+    # Transition tables can't be used by a trigger with more than one event, so there is a trigger per event
+    """
+    CREATE OR REPLACE FUNCTION books_stats() RETURNS TRIGGER
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+            changes TEXT;
+        BEGIN
+            changes := CASE TG_OP
+                WHEN 'INSERT' THEN 'SELECT *, 1 AS direction FROM new_books'
+                WHEN 'DELETE' THEN 'SELECT *, -1 AS direction FROM old_books'
+                ELSE 'SELECT *, -1 AS direction FROM old_books
+                    UNION ALL SELECT *, 1 AS direction FROM new_books'
+            END;
+            EXECUTE format($query$
+                INSERT INTO book_stats AS stats (dimension, value, books, read_books, pages_read)
+                SELECT
+                    keys.dimension,
+                    keys.value,
+                    SUM(change.direction) AS books,
+                    COALESCE(SUM(change.direction) FILTER (WHERE change.read), 0) AS read_books,
+                    COALESCE(
+                        SUM(change.direction * change.page_count) FILTER (WHERE change.read),
+                        0
+                    ) AS pages_read
+                FROM (%s) AS change
+                    CROSS JOIN LATERAL book_stats_keys(
+                        change.authors, change.categories, change.language, change.published_date
+                    ) AS keys
+                WHERE keys.value IS NOT NULL
+                GROUP BY keys.dimension, keys.value
+                HAVING
+                    SUM(change.direction) <> 0
+                    OR COALESCE(SUM(change.direction) FILTER (WHERE change.read), 0) <> 0
+                    OR COALESCE(
+                        SUM(change.direction * change.page_count) FILTER (WHERE change.read),
+                        0
+                    ) <> 0
+                ORDER BY keys.dimension, keys.value
+                ON CONFLICT (dimension, value) DO UPDATE SET
+                    books = stats.books + excluded.books,
+                    read_books = stats.read_books + excluded.read_books,
+                    pages_read = stats.pages_read + excluded.pages_read
+            $query$, changes);
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM book_stats
+                WHERE dimension IN ('author', 'category', 'language', 'year') AND books = 0;
+            END IF;
+            RETURN NULL;
+        END
+        $$;
+    DROP TRIGGER IF EXISTS books_stats ON books;
+    DROP TRIGGER IF EXISTS books_stats_insert ON books;
+    DROP TRIGGER IF EXISTS books_stats_update ON books;
+    DROP TRIGGER IF EXISTS books_stats_delete ON books;
+    CREATE TRIGGER books_stats_insert
+        AFTER INSERT ON books
+        REFERENCING NEW TABLE AS new_books
+        FOR EACH STATEMENT EXECUTE FUNCTION books_stats();
+    CREATE TRIGGER books_stats_update
+        AFTER UPDATE ON books
+        REFERENCING OLD TABLE AS old_books NEW TABLE AS new_books
+        FOR EACH STATEMENT EXECUTE FUNCTION books_stats();
+    CREATE TRIGGER books_stats_delete
+        AFTER DELETE ON books
+        REFERENCING OLD TABLE AS old_books
+        FOR EACH STATEMENT EXECUTE FUNCTION books_stats();
+    DROP FUNCTION IF EXISTS book_stats_apply(TEXT[], TEXT[], TEXT, DATE, BOOLEAN, INT, INT);
+    """,
+    # Listings compare titles with the database's collation again, so that accented and lowercase titles sort among the others
+    """
+    DROP INDEX IF EXISTS books_title_key_idx;
+    DROP INDEX IF EXISTS books_read_title_key_idx;
+    DROP INDEX IF EXISTS books_unread_title_key_idx;
+    CREATE INDEX books_title_key_idx ON books ((COALESCE(title, '')), id);
+    CREATE INDEX books_read_title_key_idx ON books ((COALESCE(title, '')), id)
+        WHERE read;
+    CREATE INDEX books_unread_title_key_idx ON books ((COALESCE(title, '')), id)
+        WHERE NOT read;
+    """,
+    # Years are zero-padded to four digits, as SQLite reads them from ISO dates, so that early years have the same key on both backends
+    # Writers are blocked while the year rows are rebuilt, so none of their changes are lost
+    """
+    CREATE OR REPLACE FUNCTION book_stats_keys(
+        book_authors TEXT[],
+        book_categories TEXT[],
+        book_language TEXT,
+        book_published_date DATE
+    )
+        RETURNS TABLE (dimension TEXT, value TEXT)
+        LANGUAGE SQL IMMUTABLE
+        AS $$
+            SELECT 'total', ''
+            UNION SELECT 'author', author FROM unnest(book_authors) AS author
+            UNION SELECT 'category', category FROM unnest(book_categories) AS category
+            UNION SELECT 'language', book_language
+            UNION SELECT 'year', lpad(extract(year FROM book_published_date)::int::text, 4, '0')
+        $$;
+    LOCK TABLE books IN SHARE MODE;
+    DELETE FROM book_stats WHERE dimension = 'year';
+    INSERT INTO book_stats (dimension, value, books, read_books, pages_read)
+        SELECT
+            keys.dimension,
+            keys.value,
+            COUNT(*),
+            COUNT(*) FILTER (WHERE book.read),
+            COALESCE(SUM(book.page_count) FILTER (WHERE book.read), 0)
+        FROM books AS book
+            CROSS JOIN LATERAL book_stats_keys(
+                book.authors, book.categories, book.language, book.published_date
+            ) AS keys
+        WHERE keys.dimension = 'year' AND keys.value IS NOT NULL
+        GROUP BY keys.dimension, keys.value;
+    """,
+]
+
+# The channel notified by the `books_notify` trigger
+CATALOGUE_CHANNEL = "books_changed"
+
+# Key for the advisory lock held while migrating
+MIGRATION_LOCK_ID = 0x746F6D65
+
+
+class BookPage(NamedTuple):
+    """A page of books from `list_books_page`, and the cursor to pass to fetch the next page."""
+
+    books: list[dict]
+    next_cursor: str | None
+
+
+class BulkInsertResult(NamedTuple):
+    """The ids of books added by `add_books_to_db`, and of those skipped because they were already stored."""
+
+    inserted: list[str]
+    duplicates: list[str]
+
+
+class TitleMatch(NamedTuple):
+    """A stored title returned by `find_similar_titles`, and its trigram similarity to the searched title, from 0 to 1."""
+
+    title: str
+    similarity: float
+
+
+class LibraryStats(NamedTuple):
+    """
+    The library summary returned by `get_library_stats`.
+    Each of `authors`, `categories`, `languages` and `years` maps the most common values to their number of books, most common first.
+    """
+
+    total_books: int
+    read_books: int
+    unread_books: int
+    pages_read: int
+    authors: dict[str, int]
+    categories: dict[str, int]
+    languages: dict[str, int]
+    years: dict[str, int]
+
+
+# The `book_stats` dimensions, and the `LibraryStats` fields they fill
+STATS_DIMENSIONS = {
+    "author": "authors",
+    "category": "categories",
+    "language": "languages",
+    "year": "years",
+}
+
+
+# Statements shared by `BookRepository` and `AsyncBookRepository`, so the two stay in step
+# The per-book statements are run as server-side prepared statements (see `BookRepository`), so they must stay single statements
+LOCK_MIGRATIONS_SQL = "SELECT pg_advisory_xact_lock(%s);"
+CREATE_SCHEMA_VERSION_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+"""
+SELECT_SCHEMA_VERSION_SQL = "SELECT COALESCE(MAX(version), 0) FROM schema_version;"
+INSERT_SCHEMA_VERSION_SQL = "INSERT INTO schema_version (version) VALUES (%s);"
+
+ADD_BOOK_SQL = f"""
+    INSERT INTO books ({", ".join(BOOK_COLUMNS)})
+    VALUES (
+        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+    )
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id;
+"""
+
+# The staging table has no primary key, so repeated ids are merged when copying into `books`
+CREATE_STAGING_SQL = """
+    CREATE TEMP TABLE books_staging (
+        LIKE books,
+        position BIGINT GENERATED ALWAYS AS IDENTITY
+    ) ON COMMIT DROP;
+"""
+COPY_STAGING_SQL = f"COPY books_staging ({', '.join(BOOK_COLUMNS)}) FROM STDIN"
+MERGE_STAGING_SQL = f"""
+    WITH inserted AS (
+        INSERT INTO books ({", ".join(BOOK_COLUMNS)})
+        SELECT DISTINCT ON (id) {", ".join(BOOK_COLUMNS)}
+        FROM books_staging
+        ORDER BY id, position
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id
+    )
+    SELECT
+        staged.id,
+        inserted.id IS NOT NULL
+    FROM
+        (SELECT id, MIN(position) AS position FROM books_staging GROUP BY id) AS staged
+        LEFT JOIN inserted ON inserted.id = staged.id
+    ORDER BY
+        staged.position;
+"""
+
+HAS_BOOK_SQL = """
+    SELECT 1 FROM books
+    WHERE {condition}
+    LIMIT 1;
+"""
+
+# Comparing as bpchar keeps the CHAR ISBN columns' indexes usable
+FIND_BOOKS_SQL = """
+    SELECT
+        id,
+        isbn_10,
+        isbn_13
+    FROM
+        books
+    WHERE
+        id = ANY(%s::text[])
+        OR isbn_10 = ANY(%s::bpchar[])
+        OR isbn_13 = ANY(%s::bpchar[]);
+"""
+
+# Listings sort by title and then id, missing titles first, since a NULL in a keyset comparison would end the listing early
+# Titles are compared with the database's collation, so `CatalogueCache` takes its order from the database rather than sorting itself
+TITLE_KEY = "COALESCE(title, '')"
+BOOK_SORT_KEY = f"{TITLE_KEY}, id"
+
+# A literal read condition lets the planner match the partial indexes on `read`
+LIST_BOOKS_SQL = f"""
+    SELECT
+        title
+    FROM
+        books
+    WHERE
+        {{read_condition}}
+    ORDER BY
+        {BOOK_SORT_KEY};
+"""
+
+LIST_BOOKS_PAGE_SQL = f"""
+    SELECT
+        {{columns}}
+    FROM
+        books
+    WHERE
+        {{read_condition}}
+        {{keyset}}
+    ORDER BY
+        {BOOK_SORT_KEY}
+    LIMIT {{limit}};
+"""
+
+ITER_BOOKS_SQL = f"""
+    SELECT
+        {{columns}}
+    FROM
+        books
+    WHERE
+        {{read_condition}}
+    ORDER BY
+        {BOOK_SORT_KEY};
+"""
+
+# `COPY` can't write arrays, dates and booleans the way the export module writes them for other backends, so they are converted in the query
+COPY_BOOKS_CSV_SQL = f"""
+    COPY (
+        SELECT
+            {{columns}}
+        FROM
+            books
+        WHERE
+            {{read_condition}}
+        ORDER BY
+            {BOOK_SORT_KEY}
+    ) TO STDOUT WITH (FORMAT csv, HEADER true);
+"""
+CSV_COLUMN_EXPRESSIONS = {
+    "authors": "to_json(authors)",
+    "categories": "to_json(categories)",
+    "published_date": "to_char(published_date, 'YYYY-MM-DD')",
+    "added": "to_char(added, 'YYYY-MM-DD')",
+    "read": "to_json(read)",
+}
+
+# The threshold is set per transaction, since the `%` operator reads it from `pg_trgm.similarity_threshold`
+SET_SIMILARITY_THRESHOLD_SQL = (
+    "SELECT set_config('pg_trgm.similarity_threshold', %s, true);"
+)
+FIND_SIMILAR_TITLES_SQL = """
+    SELECT
+        title,
+        similarity(title, %(title)s) AS similarity
+    FROM
+        books
+    WHERE
+        title %% %(title)s
+    ORDER BY
+        similarity DESC,
+        title ASC
+    LIMIT %(limit)s;
+"""
+
+SEARCH_BOOKS_SQL = f"""
+    SELECT
+        {", ".join(BOOK_COLUMNS)},
+        ts_rank(search_vector, query) AS rank
+    FROM
+        books,
+        websearch_to_tsquery('english', %s) AS query
+    WHERE
+        search_vector @@ query
+    ORDER BY
+        rank DESC,
+        title ASC
+    LIMIT %s
+    OFFSET %s;
+"""
+
+DELETE_BOOK_SQL = """
+    DELETE FROM
+        books
+    WHERE
+        {condition}
+    RETURNING id;
+"""
+
+SELECT_CATALOGUE_SQL = f"""
+    SELECT
+        id,
+        title,
+        isbn_10,
+        isbn_13,
+        read
+    FROM
+        books
+    ORDER BY
+        {BOOK_SORT_KEY};
+"""
+
+# Each changed book comes with the book listed just before it, after which `CatalogueCache` places it
+SELECT_CATALOGUE_ROWS_SQL = f"""
+    SELECT
+        book.id,
+        book.title,
+        book.isbn_10,
+        book.isbn_13,
+        book.read,
+        previous.id,
+        previous.title
+    FROM
+        books book
+        LEFT JOIN LATERAL (
+            SELECT
+                id,
+                title
+            FROM
+                books
+            WHERE
+                ({BOOK_SORT_KEY}) < (COALESCE(book.title, ''), book.id)
+            ORDER BY
+                COALESCE(title, '') DESC,
+                id DESC
+            LIMIT 1
+        ) previous ON true
+    WHERE
+        book.id = ANY(%s::text[])
+    ORDER BY
+        COALESCE(book.title, ''),
+        book.id;
+"""
+
+UPDATE_BOOK_SQL = """
+    UPDATE
+        books
+    SET
+        read = NOT read
+    WHERE
+        title = %s
+    RETURNING id;
+"""
+# An update which changes nothing only needs to find the book, rather than rewriting its row and firing the `books` triggers
+FIND_TITLE_SQL = """
+    SELECT
+        id
+    FROM
+        books
+    WHERE
+        title = %s;
+"""
+
+SELECT_STATS_SQL = "\nUNION ALL\n".join(
+    [
+        """
+    SELECT dimension, value, books, read_books, pages_read
+    FROM book_stats
+    WHERE dimension = 'total'
+    """,
+        *(
+            f"""
+    SELECT * FROM (
+        SELECT dimension, value, books, read_books, pages_read
+        FROM book_stats
+        WHERE dimension = '{dimension}'
+        ORDER BY books DESC, value ASC
+        LIMIT %s
+    ) AS {dimension}_stats
+    """
+            for dimension in STATS_DIMENSIONS
+        ),
+    ]
+)
+
+
+class BookRepository:
+    """
+    Stores books in the `books` table of a single database, reusing connections from a bounded pool rather than connecting for every query.
+    Pooled connections are checked before they are handed out, so connections dropped by the server are replaced transparently.
+    The pool is opened on `open` or when entering a `with` block, and closed on `close` or when leaving it.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `min_size`: the number of connections kept open while idle.
+     - `max_size`: the maximum number of connections open at once.
+     - `timeout`: the number of seconds to wait for a free connection before raising `psycopg_pool.PoolTimeout`.
+     - `prepare`: whether to run the per-book statements as prepared statements, which are parsed and planned once per pooled connection rather than on every call.
+     - `cache`: whether to answer existence checks and title listings from a `CatalogueCache`, which is loaded on first use.
+    """
+
+    def __init__(
+        self,
+        db_name: str,
+        min_size: int = 1,
+        max_size: int = 4,
+        timeout: float = 30.0,
+        prepare: bool = True,
+        cache: bool = False,
+    ):
+        self.db_name = db_name
+        self.prepare = prepare
+        self.catalogue = CatalogueCache(self) if cache else None
+        self.pool = ConnectionPool(
+            f"dbname={db_name}",
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            check=ConnectionPool.check_connection,
+            name=f"books-{db_name}",
+            open=False,
+        )
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        """Opens the connection pool, waiting until its minimum number of connections are ready."""
+        self.pool.open(wait=True)
+
+    def close(self):
+        """Closes the connection pool and all of its connections, and stops the catalogue cache."""
+        if self.catalogue is not None:
+            self.catalogue.stop()
+        self.pool.close()
+
+    def create_books_table(self):
+        """Creates the `books` table to store book info, by applying any pending migrations."""
+        self.migrate()
+
+    def cached_catalogue(self) -> "CatalogueCache | None":
+        """
+        Returns the catalogue cache, starting it if needed.
+        Returns `None` if caching is disabled, or while the cache isn't ready because its listener is reconnecting or has stopped, so that reads go to the database.
+        """
+        if self.catalogue is None:
+            return None
+        self.catalogue.start()
+        return self.catalogue if self.catalogue.ready.is_set() else None
+
+    def migrate(self) -> int:
+        """
+        Applies any migrations in `MIGRATIONS` which haven't been applied yet, in order, recording each in the `schema_version` table.
+        Migrations run in a single transaction under an advisory lock, so concurrent callers apply them only once.
+
+        ### Returns:
+        The schema version of the database after migrating.
+        """
+        with self.pool.connection() as conn:
+            conn.execute(LOCK_MIGRATIONS_SQL, (MIGRATION_LOCK_ID,))
+            conn.execute(CREATE_SCHEMA_VERSION_SQL)
+            (version,) = conn.execute(SELECT_SCHEMA_VERSION_SQL).fetchone()
+            for version, migration in enumerate(
+                MIGRATIONS[version:], start=version + 1
+            ):
+                conn.execute(migration)
+                conn.execute(INSERT_SCHEMA_VERSION_SQL, (version,))
+        return version
+
+    def add_book(self, book_info: dict, read: bool) -> bool:
+        """Adds a single book, returning `False` if its `id` is already stored. See `add_book_to_db`."""
+        added = datetime.date.today()
+        with self.pool.connection() as conn:
+            response = conn.execute(
+                ADD_BOOK_SQL, book_row(book_info, read, added), prepare=self.prepare
+            ).fetchone()
+        if response is not None and self.catalogue is not None:
+            self.catalogue.refresh([book_info["id"]])
+        return response is not None
+
+    def add_books(
+        self, records: Iterable[dict], read: bool = False
+    ) -> BulkInsertResult:
+        """Adds many books at once, skipping any already stored. See `add_books_to_db`."""
+        added = datetime.date.today()
+        with self.pool.connection() as conn:
+            conn.execute(CREATE_STAGING_SQL)
+            with conn.cursor() as cur:
+                with cur.copy(COPY_STAGING_SQL) as copy:
+                    for book_info in records:
+                        copy.write_row(book_row(book_info, read, added))
+                response = cur.execute(MERGE_STAGING_SQL).fetchall()
+        result = bulk_insert_result(response)
+        if self.catalogue is not None:
+            self.catalogue.refresh(result.inserted)
+        return result
+
+    def has_book(
+        self,
+        volume_id: str | None = None,
+        title: str | None = None,
+        isbn: str | None = None,
+    ) -> bool:
+        """Checks if a given book is stored. See `check_if_book_in_db`."""
+        condition, params = match_conditions(volume_id, title, isbn)
+        if not condition:
+            return False
+        if catalogue := self.cached_catalogue():
+            return catalogue.has_book(volume_id, title, isbn)
+
+        with self.pool.connection() as conn:
+            response = conn.execute(
+                HAS_BOOK_SQL.format(condition=condition), params, prepare=self.prepare
+            ).fetchone()
+        return response is not None
+
+    def find_books(
+        self, volume_ids: Iterable[str] = (), isbns: Iterable[str] = ()
+    ) -> set[str]:
+        """Returns which of the passed ids and ISBNs are stored. See `find_books_in_db`."""
+        volume_ids = list(volume_ids)
+        isbns = list(isbns)
+        if not volume_ids and not isbns:
+            return set()
+        if catalogue := self.cached_catalogue():
+            return catalogue.find_books(volume_ids, isbns)
+
+        with self.pool.connection() as conn:
+            response = conn.execute(
+                FIND_BOOKS_SQL, (volume_ids, isbns, isbns), prepare=self.prepare
+            ).fetchall()
+        return stored_keys(volume_ids, isbns, response)
+
+    def list_books(self, read_status: bool | None = None) -> list[str]:
+        """Retrieves the stored book titles. See `list_books_in_db`."""
+        if catalogue := self.cached_catalogue():
+            return catalogue.list_books(read_status)
+
+        with self.pool.connection() as conn:
+            response = conn.execute(
+                LIST_BOOKS_SQL.format(read_condition=READ_CONDITIONS[read_status]),
+                prepare=self.prepare,
+            ).fetchall()
+        return [title[0] for title in response]
+
+    def list_books_page(
+        self,
+        read_status: bool | None = None,
+        page_size: int = 50,
+        cursor: str | None = None,
+        columns: Sequence[str] = ("id", "title"),
+    ) -> BookPage:
+        """Retrieves a page of stored books ordered by title. See `list_books_page`."""
+        if set(book_columns(columns)) <= set(CatalogueEntry._fields) and (
+            catalogue := self.cached_catalogue()
+        ):
+            page = catalogue.list_books_page(read_status, page_size, cursor, columns)
+            if page is not None:
+                return page
+
+        query, params = page_query(read_status, page_size, cursor, columns)
+        with self.pool.connection() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                books = cur.execute(query, params, prepare=self.prepare).fetchall()
+        return book_page(books, page_size)
+
+    def iter_books(
+        self,
+        read_status: bool | None = None,
+        columns: Sequence[str] = ("id", "title"),
+        batch_size: int = 500,
+    ) -> Iterator[dict]:
+        """Streams the stored books ordered by title. See `iter_books_in_db`."""
+        query = ITER_BOOKS_SQL.format(
+            columns=select_columns(columns),
+            read_condition=READ_CONDITIONS[read_status],
+        )
+        with self.pool.connection() as conn:
+            with conn.cursor("books_stream", row_factory=dict_row) as cur:
+                cur.itersize = batch_size
+                cur.execute(query)
+                yield from cur
+
+    def copy_books_csv(
+        self,
+        file: IO[bytes],
+        read_status: bool | None = None,
+        columns: Sequence[str] = BOOK_COLUMNS,
+    ) -> int:
+        """
+        Writes the stored books to a binary file as CSV with a header row, streamed by `COPY ... TO STDOUT` without building rows in Python.
+        Returns the number of books written. See `export_utils.export_books`.
+        """
+        query = COPY_BOOKS_CSV_SQL.format(
+            columns=", ".join(
+                f"{CSV_COLUMN_EXPRESSIONS.get(column, column)} AS {column}"
+                for column in book_columns(columns)
+            ),
+            read_condition=READ_CONDITIONS[read_status],
+        )
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                with cur.copy(query) as copy:
+                    for data in copy:
+                        file.write(data)
+                return cur.rowcount
+
+    def search_books(self, query: str, limit: int = 10, offset: int = 0) -> list[dict]:
+        """Searches the stored books' text, returning the best matches first. See `search_books`."""
+        if not query.strip():
+            return []
+
+        with self.pool.connection() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                return cur.execute(
+                    SEARCH_BOOKS_SQL, (query, limit, offset), prepare=self.prepare
+                ).fetchall()
+
+    def find_similar_titles(
+        self, title: str, limit: int = 5, threshold: float = 0.3
+    ) -> list[TitleMatch]:
+        """Finds the stored titles most similar to a possibly misspelt title. See `find_similar_titles`."""
+        if not title.strip():
+            return []
+
+        with self.pool.connection() as conn:
+            with conn.transaction():
+                conn.execute(SET_SIMILARITY_THRESHOLD_SQL, (str(threshold),))
+                rows = conn.execute(
+                    FIND_SIMILAR_TITLES_SQL,
+                    {"title": title, "limit": limit},
+                    prepare=self.prepare,
+                ).fetchall()
+        return [TitleMatch(*row) for row in rows]
+
+    def delete_book(self, title: str | None = None, isbn: str | None = None) -> bool:
+        """Deletes a single book, returning `False` if it could not be found. See `delete_book_from_db`."""
+        condition, params = match_conditions(title=title, isbn=isbn)
+        if not condition:
+            return False
+
+        with self.pool.connection() as conn:
+            response = conn.execute(
+                DELETE_BOOK_SQL.format(condition=condition),
+                params,
+                prepare=self.prepare,
+            ).fetchall()
+        if self.catalogue is not None:
+            self.catalogue.refresh(volume_id for (volume_id,) in response)
+        return len(response) > 0
+
+    def update_book(self, title: str, toggle_read: bool) -> bool:
+        """Updates info on a single book, returning `False` if it could not be found. See `update_book_in_db`."""
+        query = UPDATE_BOOK_SQL if toggle_read else FIND_TITLE_SQL
+        with self.pool.connection() as conn:
+            response = conn.execute(query, (title,), prepare=self.prepare).fetchall()
+        if self.catalogue is not None and toggle_read:
+            self.catalogue.refresh(volume_id for (volume_id,) in response)
+        return len(response) > 0
+
+    def get_stats(self, top: int = 10) -> LibraryStats:
+        """Reads the library summary from the `book_stats` table. See `get_library_stats`."""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                SELECT_STATS_SQL, (top,) * len(STATS_DIMENSIONS), prepare=self.prepare
+            ).fetchall()
+        return library_stats(rows)
+
+
+class AsyncBookRepository:
+    """
+    An asyncio counterpart of `BookRepository`, for use from an event loop such as a web framework's, with the same methods and return values as coroutines.
+    The pool is opened on `open` or when entering an `async with` block, and closed on `close` or when leaving it.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `min_size`: the number of connections kept open while idle.
+     - `max_size`: the maximum number of connections open at once.
+     - `timeout`: the number of seconds to wait for a free connection before raising `psycopg_pool.PoolTimeout`.
+     - `prepare`: whether to run the per-book statements as prepared statements, which are parsed and planned once per pooled connection rather than on every call.
+    """
+
+    def __init__(
+        self,
+        db_name: str,
+        min_size: int = 1,
+        max_size: int = 4,
+        timeout: float = 30.0,
+        prepare: bool = True,
+    ):
+        self.db_name = db_name
+        self.prepare = prepare
+        self.pool = AsyncConnectionPool(
+            f"dbname={db_name}",
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            check=AsyncConnectionPool.check_connection,
+            name=f"async-books-{db_name}",
+            open=False,
+        )
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """Opens the connection pool, waiting until its minimum number of connections are ready."""
+        await self.pool.open(wait=True)
+
+    async def close(self):
+        """Closes the connection pool and all of its connections."""
+        await self.pool.close()
+
+    async def create_books_table(self):
+        """Creates the `books` table to store book info, by applying any pending migrations."""
+        await self.migrate()
+
+    async def migrate(self) -> int:
+        """Applies any pending migrations. See `BookRepository.migrate`."""
+        async with self.pool.connection() as conn:
+            await conn.execute(LOCK_MIGRATIONS_SQL, (MIGRATION_LOCK_ID,))
+            await conn.execute(CREATE_SCHEMA_VERSION_SQL)
+            cur = await conn.execute(SELECT_SCHEMA_VERSION_SQL)
+            (version,) = await cur.fetchone()
+            for version, migration in enumerate(
+                MIGRATIONS[version:], start=version + 1
+            ):
+                await conn.execute(migration)
+                await conn.execute(INSERT_SCHEMA_VERSION_SQL, (version,))
+        return version
+
+    async def add_book(self, book_info: dict, read: bool) -> bool:
+        """Adds a single book, returning `False` if its `id` is already stored. See `add_book_to_db`."""
+        added = datetime.date.today()
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                ADD_BOOK_SQL, book_row(book_info, read, added), prepare=self.prepare
+            )
+            response = await cur.fetchone()
+        return response is not None
+
+    async def add_books(
+        self, records: Iterable[dict] | AsyncIterable[dict], read: bool = False
+    ) -> BulkInsertResult:
+        """Adds many books at once, skipping any already stored. See `add_books_to_db`."""
+        added = datetime.date.today()
+        async with self.pool.connection() as conn:
+            await conn.execute(CREATE_STAGING_SQL)
+            async with conn.cursor() as cur:
+                async with cur.copy(COPY_STAGING_SQL) as copy:
+                    if isinstance(records, AsyncIterable):
+                        async for book_info in records:
+                            await copy.write_row(book_row(book_info, read, added))
+                    else:
+                        for book_info in records:
+                            await copy.write_row(book_row(book_info, read, added))
+                await cur.execute(MERGE_STAGING_SQL)
+                response = await cur.fetchall()
+        return bulk_insert_result(response)
+
+    async def has_book(
+        self,
+        volume_id: str | None = None,
+        title: str | None = None,
+        isbn: str | None = None,
+    ) -> bool:
+        """Checks if a given book is stored. See `check_if_book_in_db`."""
+        condition, params = match_conditions(volume_id, title, isbn)
+        if not condition:
+            return False
+
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                HAS_BOOK_SQL.format(condition=condition), params, prepare=self.prepare
+            )
+            response = await cur.fetchone()
+        return response is not None
+
+    async def find_books(
+        self, volume_ids: Iterable[str] = (), isbns: Iterable[str] = ()
+    ) -> set[str]:
+        """Returns which of the passed ids and ISBNs are stored. See `find_books_in_db`."""
+        volume_ids = list(volume_ids)
+        isbns = list(isbns)
+        if not volume_ids and not isbns:
+            return set()
+
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                FIND_BOOKS_SQL, (volume_ids, isbns, isbns), prepare=self.prepare
+            )
+            response = await cur.fetchall()
+        return stored_keys(volume_ids, isbns, response)
+
+    async def list_books(self, read_status: bool | None = None) -> list[str]:
+        """Retrieves the stored book titles. See `list_books_in_db`."""
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                LIST_BOOKS_SQL.format(read_condition=READ_CONDITIONS[read_status]),
+                prepare=self.prepare,
+            )
+            response = await cur.fetchall()
+        return [title[0] for title in response]
+
+    async def list_books_page(
+        self,
+        read_status: bool | None = None,
+        page_size: int = 50,
+        cursor: str | None = None,
+        columns: Sequence[str] = ("id", "title"),
+    ) -> BookPage:
+        """Retrieves a page of stored books ordered by title. See `list_books_page`."""
+        query, params = page_query(read_status, page_size, cursor, columns)
+        async with self.pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(query, params, prepare=self.prepare)
+                books = await cur.fetchall()
+        return book_page(books, page_size)
+
+    async def iter_books(
+        self,
+        read_status: bool | None = None,
+        columns: Sequence[str] = ("id", "title"),
+        batch_size: int = 500,
+    ) -> AsyncIterator[dict]:
+        """Streams the stored books ordered by title. See `iter_books_in_db`."""
+        query = ITER_BOOKS_SQL.format(
+            columns=select_columns(columns),
+            read_condition=READ_CONDITIONS[read_status],
+        )
+        async with self.pool.connection() as conn:
+            async with conn.cursor("books_stream", row_factory=dict_row) as cur:
+                cur.itersize = batch_size
+                await cur.execute(query)
+                async for book in cur:
+                    yield book
+
+    async def search_books(
+        self, query: str, limit: int = 10, offset: int = 0
+    ) -> list[dict]:
+        """Searches the stored books' text, returning the best matches first. See `search_books`."""
+        if not query.strip():
+            return []
+
+        async with self.pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(
+                    SEARCH_BOOKS_SQL, (query, limit, offset), prepare=self.prepare
+                )
+                return await cur.fetchall()
+
+    async def find_similar_titles(
+        self, title: str, limit: int = 5, threshold: float = 0.3
+    ) -> list[TitleMatch]:
+        """Finds the stored titles most similar to a possibly misspelt title. See `find_similar_titles`."""
+        if not title.strip():
+            return []
+
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                await conn.execute(SET_SIMILARITY_THRESHOLD_SQL, (str(threshold),))
+                cur = await conn.execute(
+                    FIND_SIMILAR_TITLES_SQL,
+                    {"title": title, "limit": limit},
+                    prepare=self.prepare,
+                )
+                rows = await cur.fetchall()
+        return [TitleMatch(*row) for row in rows]
+
+    async def delete_book(
+        self, title: str | None = None, isbn: str | None = None
+    ) -> bool:
+        """Deletes a single book, returning `False` if it could not be found. See `delete_book_from_db`."""
+        condition, params = match_conditions(title=title, isbn=isbn)
+        if not condition:
+            return False
+
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                DELETE_BOOK_SQL.format(condition=condition),
+                params,
+                prepare=self.prepare,
+            )
+            response = await cur.fetchall()
+        return len(response) > 0
+
+    async def update_book(self, title: str, toggle_read: bool) -> bool:
+        """Updates info on a single book, returning `False` if it could not be found. See `update_book_in_db`."""
+        query = UPDATE_BOOK_SQL if toggle_read else FIND_TITLE_SQL
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(query, (title,), prepare=self.prepare)
+            response = await cur.fetchall()
+        return len(response) > 0
+
+    async def get_stats(self, top: int = 10) -> LibraryStats:
+        """Reads the library summary from the `book_stats` table. See `get_library_stats`."""
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                SELECT_STATS_SQL, (top,) * len(STATS_DIMENSIONS), prepare=self.prepare
+            )
+            rows = await cur.fetchall()
+        return library_stats(rows)
+
+
+class CatalogueEntry(NamedTuple):
+    """The fields of a stored book held in memory by `CatalogueCache`."""
+
+    id: str
+    title: str | None
+    isbn_10: str | None
+    isbn_13: str | None
+    read: bool | None
+
+
+class CatalogueCache:
+    """
+    An in-memory copy of the id, title, ISBNs and read status of every book in a PostgreSQL database, so that existence checks and title listings don't need a query.
+    A trigger on `books` sends the id of every changed book to the `CATALOGUE_CHANNEL` channel with `NOTIFY`.
+    A background thread listens on that channel and re-reads changed books, so writes from every process show up within milliseconds.
+    If the listening connection drops, the cache reloads every book once it reconnects, since notifications may have been missed meanwhile.
+    Until then, and once stopped, the cache isn't `ready`, so that `BookRepository` reads from the database rather than from a snapshot that may be stale.
+
+    Books are kept in the database's listing order, since titles are compared with its collation.
+    Each re-read book is placed after the book the database lists before it. If that book's own change hasn't been seen yet, every book is reloaded instead.
+
+    ### Args:
+     - `repository`: the repository whose database is cached, and whose pool is used for `refresh`.
+     - `poll_interval`: how often in seconds the listener checks whether it has been stopped, and waits between reconnection attempts.
+    """
+
+    def __init__(self, repository: "BookRepository", poll_interval: float = 0.5):
+        self.repository = repository
+        self.poll_interval = poll_interval
+        self.entries: dict[str, CatalogueEntry] = {}
+        self.titles: dict[str, set[str]] = {}
+        self.isbns: dict[str, set[str]] = {}
+        # The ids of every book in listing order
+        self.order: list[str] = []
+        self.lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def start(self, timeout: float = 30.0):
+        """
+        Starts listening for changes and loads every book, if not already started.
+        Raises a `TimeoutError` if the books couldn't be loaded within `timeout` seconds.
+        """
+        with self.start_lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(
+                target=self._listen, name="catalogue", daemon=True
+            )
+            self.thread.start()
+        if not self.ready.wait(timeout):
+            raise TimeoutError("The catalogue cache could not be loaded")
+
+    def stop(self):
+        """Stops listening for changes, waiting for the listener thread to finish."""
+        self.stopped.set()
+        self.ready.clear()
+        if self.thread is not None:
+            self.thread.join()
+
+    def refresh(self, volume_ids: Iterable[str]):
+        """Re-reads the passed books from the database, so the process's own writes are seen without waiting for their notifications."""
+        if not self.ready.is_set():
+            return
+        with self.repository.pool.connection() as conn:
+            self._refresh(conn, volume_ids)
+
+    def has_book(
+        self,
+        volume_id: str | None = None,
+        title: str | None = None,
+        isbn: str | None = None,
+    ) -> bool:
+        """Checks if a given book is stored, matching all of the passed keys. See `check_if_book_in_db`."""
+        with self.lock:
+            candidates = None
+            if volume_id:
+                candidates = {volume_id} if volume_id in self.entries else set()
+            if title:
+                matches = self.titles.get(title, set())
+                candidates = matches if candidates is None else candidates & matches
+            if isbn:
+                matches = self.isbns.get(isbn, set())
+                candidates = matches if candidates is None else candidates & matches
+        return bool(candidates)
+
+    def find_books(
+        self, volume_ids: Iterable[str] = (), isbns: Iterable[str] = ()
+    ) -> set[str]:
+        """Returns which of the passed ids and ISBNs are stored. See `find_books_in_db`."""
+        with self.lock:
+            return {
+                volume_id for volume_id in volume_ids if volume_id in self.entries
+            } | {isbn for isbn in isbns if self.isbns.get(isbn)}
+
+    def list_books(self, read_status: bool | None = None) -> list[str]:
+        """Retrieves the stored book titles. See `list_books_in_db`."""
+        with self.lock:
+            return [entry.title for entry in self._listed(read_status, 0)]
+
+    def list_books_page(
+        self,
+        read_status: bool | None = None,
+        page_size: int = 50,
+        cursor: str | None = None,
+        columns: Sequence[str] = ("id", "title"),
+    ) -> BookPage | None:
+        """
+        Retrieves a page of stored books ordered by title. See `list_books_page`.
+        Only the columns held by `CatalogueEntry` can be served, and a `ValueError` is raised for others.
+        Returns `None` if the book the cursor points after has since been deleted or retitled, since its place can then only be found by the database.
+        """
+        columns = book_columns(columns)
+        unheld = [column for column in columns if column not in CatalogueEntry._fields]
+        if unheld:
+            raise ValueError(f"Columns not held by the catalogue: {', '.join(unheld)}")
+        after = None if cursor is None else decode_cursor(cursor)
+        with self.lock:
+            start = 0
+            if after is not None:
+                title, volume_id = after
+                entry = self.entries.get(volume_id)
+                if entry is None or (entry.title or "") != title:
+                    return None
+                start = self.order.index(volume_id) + 1
+            entries = list(islice(self._listed(read_status, start), page_size + 1))
+        return book_page(
+            [
+                {column: getattr(entry, column) for column in columns}
+                for entry in entries
+            ],
+            page_size,
+        )
+
+    def _listed(self, read_status: bool | None, start: int) -> Iterator[CatalogueEntry]:
+        """Yields the listed books with the given read status in listing order, from the `start` index of `order`. Must be called with the lock held."""
+        for volume_id in islice(self.order, start, None):
+            entry = self.entries[volume_id]
+            if entry.read is not None and (
+                read_status is None or entry.read == read_status
+            ):
+                yield entry
+
+    def _listen(self):
+        try:
+            while not self.stopped.is_set():
+                try:
+                    with psycopg.connect(
+                        self.repository.pool.conninfo, autocommit=True
+                    ) as conn:
+                        # Loading after listening means no change can fall between the two
+                        conn.execute(f"LISTEN {CATALOGUE_CHANNEL};")
+                        self._load(conn)
+                        self.ready.set()
+                        while not self.stopped.is_set():
+                            notifies = list(
+                                conn.notifies(timeout=self.poll_interval, stop_after=1)
+                            )
+                            if not notifies:
+                                continue
+                            # Apply bursts of changes, e.g. from a bulk import, together
+                            notifies.extend(conn.notifies(timeout=0))
+                            self._refresh(
+                                conn,
+                                {
+                                    json.loads(notify.payload)["id"]
+                                    for notify in notifies
+                                },
+                            )
+                except psycopg.Error:
+                    # Changes are missed until the listener reconnects, so the cache isn't read meanwhile
+                    self.ready.clear()
+                    self.stopped.wait(self.poll_interval)
+        finally:
+            self.ready.clear()
+
+    def _load(self, conn: psycopg.Connection):
+        rows = conn.execute(SELECT_CATALOGUE_SQL).fetchall()
+        with self.lock:
+            self.entries.clear()
+            self.titles.clear()
+            self.isbns.clear()
+            for row in rows:
+                self._put(CatalogueEntry(*row))
+            self.order = [row[0] for row in rows]
+
+    def _refresh(self, conn: psycopg.Connection, volume_ids: Iterable[str]):
+        volume_ids = set(volume_ids)
+        rows = conn.execute(SELECT_CATALOGUE_ROWS_SQL, (list(volume_ids),)).fetchall()
+        refreshed = {row[0]: row[1] for row in rows}
+        with self.lock:
+            # Each book is placed after the book listed before it, whose own place must be known
+            # That's so if it was re-read too, or its cached title is the one the database listed it by
+            if all(
+                previous_id is None
+                or previous_id in refreshed
+                or (
+                    previous_id not in volume_ids
+                    and previous_id in self.entries
+                    and self.entries[previous_id].title == previous_title
+                )
+                for *_, previous_id, previous_title in rows
+            ):
+                for volume_id in volume_ids:
+                    self._discard(volume_id)
+                # Rows are in listing order, so a re-read book is placed before any book listed after it
+                for *row, previous_id, _ in rows:
+                    self._put(CatalogueEntry(*row))
+                    position = (
+                        0 if previous_id is None else self.order.index(previous_id) + 1
+                    )
+                    self.order.insert(position, row[0])
+                return
+        self._load(conn)
+
+    def _put(self, entry: CatalogueEntry):
+        self.entries[entry.id] = entry
+        if entry.title is not None:
+            self.titles.setdefault(entry.title, set()).add(entry.id)
+        for isbn in (entry.isbn_10, entry.isbn_13):
+            if isbn is not None:
+                self.isbns.setdefault(isbn, set()).add(entry.id)
+
+    def _discard(self, volume_id: str):
+        entry = self.entries.pop(volume_id, None)
+        if entry is None:
+            return
+        self.order.remove(volume_id)
+        for index, key in (
+            (self.titles, entry.title),
+            (self.isbns, entry.isbn_10),
+            (self.isbns, entry.isbn_13),
+        ):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(volume_id)
+                if not ids:
+                    del index[key]
+
+
+class BookStore(Protocol):
+    """
+    The storage backend interface that the module-level functions dispatch through, implemented by `BookRepository` for PostgreSQL and `SqliteBookRepository` for SQLite.
+    See the module-level function of the same purpose for each method's behaviour.
+    """
+
+    def close(self): ...
+
+    def create_books_table(self): ...
+
+    def migrate(self) -> int: ...
+
+    def add_book(self, book_info: dict, read: bool) -> bool: ...
+
+    def add_books(
+        self, records: Iterable[dict], read: bool = False
+    ) -> BulkInsertResult: ...
+
+    def has_book(
+        self,
+        volume_id: str | None = None,
+        title: str | None = None,
+        isbn: str | None = None,
+    ) -> bool: ...
+
+    def find_books(
+        self, volume_ids: Iterable[str] = (), isbns: Iterable[str] = ()
+    ) -> set[str]: ...
+
+    def list_books(self, read_status: bool | None = None) -> list[str]: ...
+
+    def list_books_page(
+        self,
+        read_status: bool | None = None,
+        page_size: int = 50,
+        cursor: str | None = None,
+        columns: Sequence[str] = ("id", "title"),
+    ) -> BookPage: ...
+
+    def iter_books(
+        self,
+        read_status: bool | None = None,
+        columns: Sequence[str] = ("id", "title"),
+        batch_size: int = 500,
+    ) -> Iterator[dict]: ...
+
+    def search_books(
+        self, query: str, limit: int = 10, offset: int = 0
+    ) -> list[dict]: ...
+
+    def find_similar_titles(
+        self, title: str, limit: int = 5, threshold: float = 0.3
+    ) -> list[TitleMatch]: ...
+
+    def delete_book(
+        self, title: str | None = None, isbn: str | None = None
+    ) -> bool: ...
+
+    def update_book(self, title: str, toggle_read: bool) -> bool: ...
+
+    def get_stats(self, top: int = 10) -> LibraryStats: ...
+
+
+def sqlite_stats_keys(book: str) -> str:
+    """Builds the `book_stats` keys of a SQLite `books` row, as the SQLite counterpart of the `book_stats_keys` function."""
+    return f"""
+        SELECT 'total' AS dimension, '' AS value
+        UNION SELECT 'author', value FROM json_each({book}.authors)
+        UNION SELECT 'category', value FROM json_each({book}.categories)
+        UNION SELECT 'language', {book}.language
+        UNION SELECT 'year', substr({book}.published_date, 1, 4)
+    """
+
+
+def sqlite_stats_apply(book: str, direction: int) -> str:
+    """Builds the statement adding a SQLite `books` row to `book_stats`, or removing it if `direction` is -1."""
+    return f"""
+        INSERT INTO book_stats (dimension, value, books, read_books, pages_read)
+        SELECT
+            dimension,
+            value,
+            {direction},
+            {direction} * COALESCE({book}.read, 0),
+            {direction} * COALESCE({book}.read, 0) * COALESCE({book}.page_count, 0)
+        FROM ({sqlite_stats_keys(book)})
+        WHERE value IS NOT NULL
+        ON CONFLICT (dimension, value) DO UPDATE SET
+            books = books + excluded.books,
+            read_books = read_books + excluded.read_books,
+            pages_read = pages_read + excluded.pages_read;
+    """
+
+
+def sqlite_stats_migration() -> list[str]:
+    """Builds the SQLite migration for the `book_stats` summary table, mirroring the PostgreSQL one."""
+    remove_empty = """
+        DELETE FROM book_stats
+        WHERE dimension IN ('author', 'category', 'language', 'year') AND books = 0;
+    """
+    backfill = [
+        f"""
+        INSERT INTO book_stats (dimension, value, books, read_books, pages_read)
+        SELECT
+            '{dimension}',
+            value,
+            COUNT(*),
+            COALESCE(SUM(read), 0),
+            COALESCE(SUM(read * COALESCE(page_count, 0)), 0)
+        FROM (SELECT DISTINCT books.id, books.read, books.page_count, {value} AS value {source})
+        WHERE value IS NOT NULL
+        GROUP BY value
+        """
+        for dimension, value, source in (
+            ("total", "''", "FROM books"),
+            (
+                "author",
+                "author.value",
+                "FROM books, json_each(books.authors) AS author",
+            ),
+            (
+                "category",
+                "category.value",
+                "FROM books, json_each(books.categories) AS category",
+            ),
+            ("language", "books.language", "FROM books"),
+            ("year", "substr(books.published_date, 1, 4)", "FROM books"),
+        )
+    ]
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS book_stats (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            books INTEGER NOT NULL DEFAULT 0,
+            read_books INTEGER NOT NULL DEFAULT 0,
+            pages_read INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS book_stats_ranking_idx
+        ON book_stats (dimension, books DESC, value)
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS books_stats_insert AFTER INSERT ON books BEGIN
+            {sqlite_stats_apply("new", 1)}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS books_stats_delete AFTER DELETE ON books BEGIN
+            {sqlite_stats_apply("old", -1)}
+            {remove_empty}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS books_stats_update AFTER UPDATE ON books BEGIN
+            {sqlite_stats_apply("old", -1)}
+            {sqlite_stats_apply("new", 1)}
+            {remove_empty}
+        END
+        """,
+        "DELETE FROM book_stats",
+        *backfill,
+        "INSERT INTO book_stats (dimension, value) VALUES ('total', '') ON CONFLICT DO NOTHING",
+    ]
+
+
+# Schema changes for `SqliteBookRepository`, mirroring `MIGRATIONS`
+# Each migration is a list of single statements, since trigger bodies contain semicolons
+SQLITE_MIGRATIONS = [
+    [
+        """
+        CREATE TABLE IF NOT EXISTS books (
+            id TEXT PRIMARY KEY,
+            etag TEXT,
+            self_link TEXT,
+            title TEXT,
+            authors TEXT,
+            publisher TEXT,
+            published_date TEXT,
+            description TEXT,
+            page_count INTEGER,
+            categories TEXT,
+            language TEXT,
+            isbn_10 TEXT,
+            isbn_13 TEXT,
+            thumbnail TEXT,
+            read INTEGER,
+            added TEXT
+        )
+        """,
+    ],
+    [
+        "CREATE INDEX IF NOT EXISTS books_isbn_10_idx ON books (isbn_10)",
+        "CREATE INDEX IF NOT EXISTS books_isbn_13_idx ON books (isbn_13)",
+        "CREATE INDEX IF NOT EXISTS books_title_id_idx ON books (title, id)",
+        "CREATE INDEX IF NOT EXISTS books_read_title_id_idx ON books (title, id) WHERE read",
+        """
+        CREATE INDEX IF NOT EXISTS books_unread_title_id_idx ON books (title, id)
+        WHERE NOT read
+        """,
+    ],
+    [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_search USING fts5 (
+            title,
+            authors,
+            categories,
+            description,
+            content = 'books',
+            tokenize = 'porter unicode61'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_search_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_search (rowid, title, authors, categories, description)
+            VALUES (new.rowid, new.title, new.authors, new.categories, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_search_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_search (
+                books_search, rowid, title, authors, categories, description
+            )
+            VALUES (
+                'delete', old.rowid, old.title, old.authors, old.categories, old.description
+            );
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_search_update AFTER UPDATE ON books BEGIN
+            INSERT INTO books_search (
+                books_search, rowid, title, authors, categories, description
+            )
+            VALUES (
+                'delete', old.rowid, old.title, old.authors, old.categories, old.description
             );
-        """)
+            INSERT INTO books_search (rowid, title, authors, categories, description)
+            VALUES (new.rowid, new.title, new.authors, new.categories, new.description);
+        END
+        """,
+        "INSERT INTO books_search (books_search) VALUES ('rebuild')",
+    ],
+    sqlite_stats_migration(),
+    [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_titles USING fts5(
+            title,
+            content = 'books',
+            tokenize = 'trigram'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_titles_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_titles (rowid, title) VALUES (new.rowid, new.title);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_titles_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_titles (books_titles, rowid, title)
+            VALUES ('delete', old.rowid, old.title);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_titles_update AFTER UPDATE OF title ON books BEGIN
+            INSERT INTO books_titles (books_titles, rowid, title)
+            VALUES ('delete', old.rowid, old.title);
+            INSERT INTO books_titles (rowid, title) VALUES (new.rowid, new.title);
+        END
+        """,
+        "INSERT INTO books_titles (books_titles) VALUES ('rebuild')",
+    ],
+    [
+        "CREATE INDEX IF NOT EXISTS books_title_key_idx ON books (COALESCE(title, ''), id)",
+        """
+        CREATE INDEX IF NOT EXISTS books_read_title_key_idx ON books (COALESCE(title, ''), id)
+        WHERE read
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS books_unread_title_key_idx ON books (COALESCE(title, ''), id)
+        WHERE NOT read
+        """,
+        "DROP INDEX IF EXISTS books_read_title_id_idx",
+        "DROP INDEX IF EXISTS books_unread_title_id_idx",
+    ],
+]
+
+# The number of best trigram matches scored by `SqliteBookRepository.find_similar_titles`
+SQLITE_SIMILAR_TITLE_CANDIDATES = 50
+
+# Column weights for bm25, matching the title, authors, categories, description weighting of `search_vector`
+SQLITE_SEARCH_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+
+class SqliteBookRepository:
+    """
+    Stores books in a local SQLite database file, for installs without a PostgreSQL server.
+    It has the same methods and return values as `BookRepository`, with the same schema, indexes and full-text search built on SQLite's WAL mode and FTS5.
+    A single connection is shared between threads, and writers are serialised.
+
+    ### Args:
+     - `path`: the file path of the database, which is created if needed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the connection to the database file."""
+        self.conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Holds the connection and a write lock on the database until the block exits, then commits, or rolls back on error."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def create_books_table(self):
+        """Creates the `books` table to store book info, by applying any pending migrations."""
+        self.migrate()
+
+    def migrate(self) -> int:
+        """Applies any migrations in `SQLITE_MIGRATIONS` which haven't been applied yet. See `BookRepository.migrate`."""
+        with self.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            (version,) = conn.execute(SELECT_SCHEMA_VERSION_SQL).fetchone()
+            for version, migration in enumerate(
+                SQLITE_MIGRATIONS[version:], start=version + 1
+            ):
+                for statement in migration:
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_version (version) VALUES (?)", (version,)
+                )
+        return version
+
+    def add_book(self, book_info: dict, read: bool) -> bool:
+        """Adds a single book, returning `False` if its `id` is already stored. See `add_book_to_db`."""
+        added = datetime.date.today()
+        with self.transaction() as conn:
+            response = conn.execute(
+                SQLITE_ADD_BOOK_SQL, sqlite_book_row(book_info, read, added)
+            ).fetchone()
+        return response is not None
+
+    def add_books(
+        self, records: Iterable[dict], read: bool = False
+    ) -> BulkInsertResult:
+        """Adds many books at once, skipping any already stored. See `add_books_to_db`."""
+        added = datetime.date.today()
+        result = BulkInsertResult([], [])
+        seen = set()
+        with self.transaction() as conn:
+            for book_info in records:
+                if book_info["id"] in seen:
+                    continue
+                seen.add(book_info["id"])
+                inserted = conn.execute(
+                    SQLITE_ADD_BOOK_SQL, sqlite_book_row(book_info, read, added)
+                ).fetchone()
+                (result.inserted if inserted else result.duplicates).append(
+                    book_info["id"]
+                )
+        return result
+
+    def has_book(
+        self,
+        volume_id: str | None = None,
+        title: str | None = None,
+        isbn: str | None = None,
+    ) -> bool:
+        """Checks if a given book is stored. See `check_if_book_in_db`."""
+        condition, params = match_conditions(volume_id, title, isbn, placeholder="?")
+        if not condition:
+            return False
+
+        with self.lock:
+            response = self.conn.execute(
+                HAS_BOOK_SQL.format(condition=condition), params
+            ).fetchone()
+        return response is not None
+
+    def find_books(
+        self, volume_ids: Iterable[str] = (), isbns: Iterable[str] = ()
+    ) -> set[str]:
+        """Returns which of the passed ids and ISBNs are stored. See `find_books_in_db`."""
+        volume_ids = list(volume_ids)
+        isbns = list(isbns)
+        if not volume_ids and not isbns:
+            return set()
+
+        with self.lock:
+            response = self.conn.execute(
+                """
+                SELECT
+                    id,
+                    isbn_10,
+                    isbn_13
+                FROM
+                    books
+                WHERE
+                    id IN (SELECT value FROM json_each(?))
+                    OR isbn_10 IN (SELECT value FROM json_each(?))
+                    OR isbn_13 IN (SELECT value FROM json_each(?))
+                """,
+                (json.dumps(volume_ids), json.dumps(isbns), json.dumps(isbns)),
+            ).fetchall()
+        return stored_keys(volume_ids, isbns, [tuple(row) for row in response])
+
+    def list_books(self, read_status: bool | None = None) -> list[str]:
+        """Retrieves the stored book titles. See `list_books_in_db`."""
+        with self.lock:
+            response = self.conn.execute(
+                LIST_BOOKS_SQL.format(read_condition=READ_CONDITIONS[read_status])
+            ).fetchall()
+        return [title[0] for title in response]
+
+    def list_books_page(
+        self,
+        read_status: bool | None = None,
+        page_size: int = 50,
+        cursor: str | None = None,
+        columns: Sequence[str] = ("id", "title"),
+    ) -> BookPage:
+        """Retrieves a page of stored books ordered by title. See `list_books_page`."""
+        query, params = page_query(
+            read_status, page_size, cursor, columns, placeholder="?"
+        )
+        with self.lock:
+            books = self.conn.execute(query, params).fetchall()
+        return book_page([sqlite_book(book) for book in books], page_size)
+
+    def iter_books(
+        self,
+        read_status: bool | None = None,
+        columns: Sequence[str] = ("id", "title"),
+        batch_size: int = 500,
+    ) -> Iterator[dict]:
+        """
+        Streams the stored books ordered by title. See `iter_books_in_db`.
+        Batches are read as pages, so the connection isn't held between them.
+        """
+        cursor = None
+        while True:
+            page = self.list_books_page(read_status, batch_size, cursor, columns)
+            yield from page.books
+            cursor = page.next_cursor
+            if cursor is None:
+                return
+
+    def search_books(self, query: str, limit: int = 10, offset: int = 0) -> list[dict]:
+        """Searches the stored books' text, returning the best matches first. See `search_books`."""
+        match = fts5_query(query)
+        if match is None:
+            return []
+
+        with self.lock:
+            books = self.conn.execute(
+                f"""
+                SELECT
+                    {", ".join(f"books.{column}" for column in BOOK_COLUMNS)},
+                    -bm25(books_search, ?, ?, ?, ?) AS rank
+                FROM
+                    books_search
+                    JOIN books ON books.rowid = books_search.rowid
+                WHERE
+                    books_search MATCH ?
+                ORDER BY
+                    rank DESC,
+                    books.title ASC
+                LIMIT ?
+                OFFSET ?
+                """,
+                (*SQLITE_SEARCH_WEIGHTS, match, limit, offset),
+            ).fetchall()
+        return [sqlite_book(book) for book in books]
+
+    def find_similar_titles(
+        self, title: str, limit: int = 5, threshold: float = 0.3
+    ) -> list[TitleMatch]:
+        """
+        Finds the stored titles most similar to a possibly misspelt title. See `find_similar_titles`.
+        Candidates sharing trigrams with the title are found through the trigram FTS5 index, then scored in Python the way `pg_trgm` scores them.
+        """
+        match = trigram_query(title)
+        if match is None:
+            return []
+
+        with self.lock:
+            rows = self.conn.execute(
+                """
+                SELECT books_titles.title
+                FROM books_titles
+                WHERE books_titles MATCH ?
+                ORDER BY rank
+                LIMIT ?
+                """,
+                (match, max(limit, SQLITE_SIMILAR_TITLE_CANDIDATES)),
+            ).fetchall()
+        matches = [
+            TitleMatch(candidate, title_similarity(title, candidate))
+            for (candidate,) in rows
+        ]
+        matches = [match for match in matches if match.similarity >= threshold]
+        matches.sort(key=lambda match: (-match.similarity, match.title))
+        return matches[:limit]
+
+    def delete_book(self, title: str | None = None, isbn: str | None = None) -> bool:
+        """Deletes a single book, returning `False` if it could not be found. See `delete_book_from_db`."""
+        condition, params = match_conditions(title=title, isbn=isbn, placeholder="?")
+        if not condition:
+            return False
+
+        with self.transaction() as conn:
+            response = conn.execute(
+                DELETE_BOOK_SQL.format(condition=condition), params
+            ).fetchall()
+        return len(response) > 0
+
+    def update_book(self, title: str, toggle_read: bool) -> bool:
+        """Updates info on a single book, returning `False` if it could not be found. See `update_book_in_db`."""
+        query = SQLITE_UPDATE_BOOK_SQL if toggle_read else SQLITE_FIND_TITLE_SQL
+        with self.transaction() as conn:
+            response = conn.execute(query, (title,)).fetchall()
+        return len(response) > 0
+
+    def get_stats(self, top: int = 10) -> LibraryStats:
+        """Reads the library summary from the `book_stats` table. See `get_library_stats`."""
+        with self.lock:
+            rows = self.conn.execute(
+                SQLITE_SELECT_STATS_SQL, (top,) * len(STATS_DIMENSIONS)
+            ).fetchall()
+        return library_stats([tuple(row) for row in rows])
+
+
+SQLITE_ADD_BOOK_SQL = f"""
+    INSERT INTO books ({", ".join(BOOK_COLUMNS)})
+    VALUES ({", ".join("?" for _ in BOOK_COLUMNS)})
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id
+"""
+SQLITE_UPDATE_BOOK_SQL = UPDATE_BOOK_SQL.replace("%s", "?")
+SQLITE_FIND_TITLE_SQL = FIND_TITLE_SQL.replace("%s", "?")
+SQLITE_SELECT_STATS_SQL = SELECT_STATS_SQL.replace("%s", "?")
+
+
+def sqlite_book_row(book_info: dict, read: bool, added: datetime.date) -> tuple:
+    """Converts a book info dictionary into a row of the SQLite `books` table, storing lists as JSON and dates as ISO strings."""
+    row = list(book_row(book_info, read, added))
+    for column in ("authors", "categories"):
+        index = BOOK_COLUMNS.index(column)
+        row[index] = None if row[index] is None else json.dumps(row[index])
+    row[BOOK_COLUMNS.index("added")] = added.isoformat()
+    return tuple(row)
+
+
+def sqlite_book(row: sqlite3.Row) -> dict:
+    """Converts a row of the SQLite `books` table into the same dictionary a PostgreSQL query returns."""
+    book = dict(row)
+    for column in ("authors", "categories"):
+        if book.get(column) is not None:
+            book[column] = json.loads(book[column])
+    for column in ("published_date", "added"):
+        if book.get(column) is not None:
+            book[column] = datetime.date.fromisoformat(book[column])
+    if book.get("read") is not None:
+        book["read"] = bool(book["read"])
+    return book
+
+
+def fts5_query(query: str) -> str | None:
+    """
+    Converts web search syntax, as accepted by `websearch_to_tsquery`, into an FTS5 query.
+    Words and quoted phrases must all match, `or` between them allows either, and a leading `-` excludes a word or phrase.
+    Returns `None` if the query has no terms to match.
+    """
+    included = []
+    excluded = []
+    either = False
+    for term in re.findall(r'-?"[^"]*"?|\S+', query):
+        if term.casefold() == "or":
+            either = bool(included)
+            continue
+        negated = term.startswith("-")
+        words = re.findall(r"\w+", term)
+        if not words:
+            continue
+        phrase = '"' + " ".join(words) + '"'
+        if negated:
+            excluded.append(phrase)
+        elif either:
+            included[-1].append(phrase)
+            either = False
+        else:
+            included.append([phrase])
+    if not included:
+        return None
+    match = " AND ".join(
+        phrases[0] if len(phrases) == 1 else f"({' OR '.join(phrases)})"
+        for phrases in included
+    )
+    if excluded:
+        match = " NOT ".join([f"({match})", *excluded])
+    return match
+
+
+def title_trigrams(title: str) -> set[str]:
+    """
+    Splits a title into the trigrams `pg_trgm` compares: each word is lowercased and padded with two spaces before and one after.
+    Words are runs of letters and digits.
+    """
+    return {
+        padded[index : index + 3]
+        for word in re.findall(r"[^\W_]+", title.lower())
+        for padded in [f"  {word} "]
+        for index in range(len(padded) - 2)
+    }
+
+
+def title_similarity(first: str, second: str) -> float:
+    """Scores how alike two titles are as the share of their trigrams in common, as `pg_trgm`'s `similarity` does."""
+    first_trigrams = title_trigrams(first)
+    second_trigrams = title_trigrams(second)
+    if not first_trigrams or not second_trigrams:
+        return 0.0
+    common = len(first_trigrams & second_trigrams)
+    return common / len(first_trigrams | second_trigrams)
+
+
+def trigram_query(title: str) -> str | None:
+    """
+    Builds an FTS5 query matching titles which share any trigram with the passed title, for the trigram tokenizer.
+    Returns `None` if the title is too short to have any trigrams.
+    """
+    trigrams = {
+        word[index : index + 3]
+        for word in re.findall(r"[^\W_]+", title.lower())
+        for index in range(len(word) - 2)
+    }
+    if not trigrams:
+        return None
+    return " OR ".join(f'"{trigram}"' for trigram in sorted(trigrams))
+
+
+def library_stats(rows: list[tuple]) -> LibraryStats:
+    """Builds a `LibraryStats` from `(dimension, value, books, read_books, pages_read)` rows of the `book_stats` table."""
+    total_books = read_books = pages_read = 0
+    counts = {field: {} for field in STATS_DIMENSIONS.values()}
+    for dimension, value, books, dimension_read_books, dimension_pages_read in sorted(
+        rows, key=lambda row: (-row[2], row[1])
+    ):
+        if dimension == "total":
+            total_books, read_books = books, dimension_read_books
+            pages_read = dimension_pages_read
+        else:
+            counts[STATS_DIMENSIONS[dimension]][value] = books
+    return LibraryStats(
+        total_books=total_books,
+        read_books=read_books,
+        unread_books=total_books - read_books,
+        pages_read=pages_read,
+        **counts,
+    )
+
+
+def bulk_insert_result(response: list[tuple[str, bool]]) -> BulkInsertResult:
+    """Splits the rows returned by `MERGE_STAGING_SQL` into inserted and duplicate ids."""
+    result = BulkInsertResult([], [])
+    for volume_id, inserted in response:
+        (result.inserted if inserted else result.duplicates).append(volume_id)
+    return result
+
+
+def stored_keys(
+    volume_ids: list[str], isbns: list[str], response: list[tuple]
+) -> set[str]:
+    """Picks the passed ids and ISBNs which appear in the rows returned by `FIND_BOOKS_SQL`."""
+    stored_ids = {volume_id for volume_id, _, _ in response}
+    stored_isbns = {isbn for _, *book_isbns in response for isbn in book_isbns}
+    return {volume_id for volume_id in volume_ids if volume_id in stored_ids} | {
+        isbn for isbn in isbns if isbn in stored_isbns
+    }
+
+
+def page_query(
+    read_status: bool | None,
+    page_size: int,
+    cursor: str | None,
+    columns: Sequence[str],
+    placeholder: str = "%s",
+) -> tuple[str, list]:
+    """Builds the query and parameters for a page of books, fetching one extra book to tell whether another page follows."""
+    keyset = ""
+    params = []
+    if cursor is not None:
+        # SQLite can't seek an expression index with a row value, so the title is also bounded on its own
+        keyset = (
+            f"AND {TITLE_KEY} >= {placeholder}"
+            f" AND ({BOOK_SORT_KEY}) > ({placeholder}, {placeholder})"
+        )
+        title, volume_id = decode_cursor(cursor)
+        params.extend([title, title, volume_id])
+    params.append(page_size + 1)
+    query = LIST_BOOKS_PAGE_SQL.format(
+        columns=select_columns(columns),
+        read_condition=READ_CONDITIONS[read_status],
+        keyset=keyset,
+        limit=placeholder,
+    )
+    return query, params
+
+
+def book_page(books: list[dict], page_size: int) -> BookPage:
+    """Trims the extra book fetched by `page_query`, and encodes the cursor for the next page if there is one."""
+    if len(books) <= page_size:
+        return BookPage(books, None)
+    books = books[:page_size]
+    return BookPage(books, encode_cursor(books[-1]["title"] or "", books[-1]["id"]))
+
+
+def book_row(book_info: dict, read: bool, added: datetime.date) -> tuple:
+    """Converts a book info dictionary into a row of the `books` table, in the order of `BOOK_COLUMNS`."""
+    return (
+        book_info["id"],
+        book_info["etag"],
+        book_info["selfLink"],
+        book_info["title"],
+        book_info["authors"],
+        book_info["publisher"],
+        book_info["publishedDate"],
+        book_info["description"],
+        book_info["pageCount"],
+        book_info["categories"],
+        book_info["language"],
+        book_info["isbn_10"],
+        book_info["isbn_13"],
+        book_info["thumbnail"],
+        read,
+        added,
+    )
+
+
+def book_columns(columns: Sequence[str]) -> list[str]:
+    """
+    Lists the requested `books` columns in order, always starting with `id` and `title`.
+    Raises a `ValueError` for unknown columns, so that column names are never taken from user input unchecked.
+    """
+    unknown = [column for column in columns if column not in BOOK_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown book columns: {', '.join(unknown)}")
+    return list(dict.fromkeys(["id", "title", *columns]))
+
+
+def select_columns(columns: Sequence[str]) -> str:
+    """Builds the select list for the requested `books` columns. See `book_columns`."""
+    return ", ".join(book_columns(columns))
+
+
+def encode_cursor(title: str, volume_id: str) -> str:
+    """Encodes the position after a book as an opaque cursor token."""
+    return base64.urlsafe_b64encode(json.dumps([title, volume_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Decodes a cursor token from `encode_cursor`, raising a `ValueError` if it is malformed."""
+    try:
+        title, volume_id = json.loads(base64.urlsafe_b64decode(cursor))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}") from None
+    return title, volume_id
+
+
+def match_conditions(
+    volume_id: str | None = None,
+    title: str | None = None,
+    isbn: str | None = None,
+    placeholder: str = "%s",
+) -> tuple[str, list]:
+    """
+    Builds a `WHERE` condition matching books by all of the passed keys, and its parameters.
+    Returns an empty condition if no keys are passed.
+    """
+    conditions = []
+    params = []
+    if volume_id:
+        conditions.append(f"id = {placeholder}")
+        params.append(volume_id)
+    if title:
+        conditions.append(f"title = {placeholder}")
+        params.append(title)
+    if isbn:
+        conditions.append(f"(isbn_10 = {placeholder} OR isbn_13 = {placeholder})")
+        params.extend((isbn, isbn))
+    return " AND ".join(conditions), params
+
+
+_repositories: dict[tuple[str, str], BookStore] = {}
+_repositories_lock = threading.Lock()
+
+
+def open_repository(db_name: str) -> BookStore:
+    """
+    Opens the storage backend chosen by the `TOME_TRACKER_BACKEND` environment variable for the passed database.
+    `postgres`, the default, connects to the PostgreSQL database called `db_name`, with a `CatalogueCache` if `TOME_TRACKER_CATALOGUE_CACHE` is `1` or `true`.
+    `sqlite` opens the file `<db_name>.sqlite3` in the `TOME_TRACKER_SQLITE_DIR` directory, which defaults to the working directory.
+    """
+    backend = os.getenv("TOME_TRACKER_BACKEND", "postgres")
+    if backend == "postgres":
+        cache = os.getenv("TOME_TRACKER_CATALOGUE_CACHE", "").lower() in ("1", "true")
+        repository = BookRepository(db_name, cache=cache)
+        repository.open()
+        return repository
+    if backend == "sqlite":
+        directory = os.getenv("TOME_TRACKER_SQLITE_DIR", ".")
+        return SqliteBookRepository(os.path.join(directory, f"{db_name}.sqlite3"))
+    raise ValueError(f"Unknown storage backend: {backend!r}")
+
+
+def get_repository(db_name: str) -> BookStore:
+    """
+    Returns an open storage backend for the passed database, shared by the module-level functions below.
+    Backends are opened with `open_repository` on first use and closed when the interpreter exits.
+    """
+    key = (os.getenv("TOME_TRACKER_BACKEND", "postgres"), db_name)
+    with _repositories_lock:
+        repository = _repositories.get(key)
+        if repository is None:
+            repository = _repositories[key] = open_repository(db_name)
+    return repository
+
+
+@atexit.register
+def close_repositories():
+    """Closes every repository opened by `get_repository`."""
+    with _repositories_lock:
+        for repository in _repositories.values():
+            repository.close()
+        _repositories.clear()
+
+
+def create_books_table(db_name: str):
+    """Creates the `books` table in the passed database to store book info. See `migrate_db`."""
+    get_repository(db_name).create_books_table()
 
 
 def add_book_to_db(db_name: str, book_info: dict, read: bool) -> bool:
@@ -44,39 +2335,37 @@ def add_book_to_db(db_name: str, book_info: dict, read: bool) -> bool:
     ### Returns:
     `True` if the book has been added to the database, `False` if it is already there.
     """
-    added = datetime.date.today()
+    return get_repository(db_name).add_book(book_info, read)
 
-    if check_if_book_in_db(db_name, volume_id=book_info["id"]):
-        return False
 
-    with psycopg.connect(f"dbname={db_name}") as conn:
-        conn.execute(
-            """
-            INSERT INTO books
-            VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-            );
-            """,
-            (
-                book_info["id"],
-                book_info["etag"],
-                book_info["selfLink"],
-                book_info["title"],
-                book_info["authors"],
-                book_info["publisher"],
-                book_info["publishedDate"],
-                book_info["description"],
-                book_info["pageCount"],
-                book_info["categories"],
-                book_info["language"],
-                book_info["isbn_10"],
-                book_info["isbn_13"],
-                book_info["thumbnail"],
-                read,
-                added,
-            ),
-        )
-    return True
+def add_books_to_db(
+    db_name: str, records: Iterable[dict], read: bool = False
+) -> BulkInsertResult:
+    """
+    Adds many books to the `books` table of the passed database in a single transaction.
+    Books are streamed to the database with `COPY` as `records` is iterated, so any iterable can be passed, including generators over files too large to hold in memory.
+    Books whose `id` is already stored, or appears earlier in `records`, are skipped.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `records`: an iterable of book info dictionaries.
+     - `read`: whether the books have been read.
+
+    ### Returns:
+    A `BulkInsertResult` listing the ids which were added and the ids which were already stored, in the order they first appeared.
+    """
+    return get_repository(db_name).add_books(records, read)
+
+
+def migrate_db(db_name: str) -> int:
+    """
+    Brings the schema of the passed database up to date, creating the `books` table and its indexes if needed.
+    Safe to call at every startup, since migrations which have already been applied are skipped.
+
+    ### Returns:
+    The schema version of the database after migrating.
+    """
+    return get_repository(db_name).migrate()
 
 
 def check_if_book_in_db(
@@ -87,6 +2376,7 @@ def check_if_book_in_db(
 ) -> bool:
     """
     Checks if a given book is stored in the database.
+    If several of `volume_id`, `title` and `isbn` are passed, the book must match all of them.
 
     ### Args:
      - `db_name`: the name of the database with the `books` table.
@@ -97,32 +2387,25 @@ def check_if_book_in_db(
     ### Returns:
     `True` if the book is in the database, `False` otherwise.
     """
-    with psycopg.connect(f"dbname={db_name}") as conn:
-        if volume_id:
-            response = conn.execute(
-                """
-                SELECT * FROM books
-                WHERE id = %s
-                """,
-                (volume_id,),
-            ).fetchall()
-        if title:
-            response = conn.execute(
-                """
-                SELECT * FROM books
-                WHERE title = %s
-                """,
-                (title,),
-            ).fetchall()
-        if isbn:
-            response = conn.execute(
-                """
-                SELECT * FROM books
-                WHERE isbn_10 = %s OR isbn_13 = %s
-                """,
-                (isbn, isbn),
-            ).fetchall()
-    return len(response) > 0
+    return get_repository(db_name).has_book(volume_id=volume_id, title=title, isbn=isbn)
+
+
+def find_books_in_db(
+    db_name: str, volume_ids: Iterable[str] = (), isbns: Iterable[str] = ()
+) -> set[str]:
+    """
+    Checks which of many books are stored in the database, with a single query.
+    Useful for skipping books that are already stored before spending API calls on them.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `volume_ids`: the ids of the books to check.
+     - `isbns`: the ISBN 10s or ISBN 13s of the books to check.
+
+    ### Returns:
+    The set of passed ids and ISBNs which belong to stored books.
+    """
+    return get_repository(db_name).find_books(volume_ids, isbns)
 
 
 def list_books_in_db(db_name: str, read_status: bool | None = None) -> list[str]:
@@ -136,21 +2419,76 @@ def list_books_in_db(db_name: str, read_status: bool | None = None) -> list[str]
     ### Returns:
     A list of book titles as strings.
     """
-    with psycopg.connect(f"dbname={db_name}") as conn:
-        response = conn.execute(
-            """
-            SELECT
-                title
-            FROM
-                books
-            WHERE
-                read = COALESCE(%s, read)
-            ORDER BY
-                title ASC;
-            """,
-            (read_status,),
-        ).fetchall()
-    return [title[0] for title in response]
+    return get_repository(db_name).list_books(read_status)
+
+
+def list_books_page(
+    db_name: str,
+    read_status: bool | None = None,
+    page_size: int = 50,
+    cursor: str | None = None,
+    columns: Sequence[str] = ("id", "title"),
+) -> BookPage:
+    """
+    Retrieves one page of stored books, ordered by title.
+    Pages are found by seeking to the last book of the previous page with an index, so later pages are as fast as the first, and books added or deleted meanwhile don't shift the remaining pages.
+    Titles are compared with the database's collation, with missing titles first. With a `CatalogueCache`, pages of the columns it holds are served from memory.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `read_status`: whether the returned books have been read or not. Defaults to `None`, which returns all books.
+     - `page_size`: the maximum number of books on the page.
+     - `cursor`: the `next_cursor` of the previous page, or `None` for the first page.
+     - `columns`: the `books` columns to return. `id` and `title` are always included.
+
+    ### Returns:
+    A `BookPage` with a list of dictionaries keyed by column name, and the cursor for the next page, which is `None` on the last page.
+    """
+    return get_repository(db_name).list_books_page(
+        read_status, page_size, cursor, columns
+    )
+
+
+def iter_books_in_db(
+    db_name: str,
+    read_status: bool | None = None,
+    columns: Sequence[str] = ("id", "title"),
+    batch_size: int = 500,
+) -> Iterator[dict]:
+    """
+    Streams the stored books, ordered by title, from a server-side cursor.
+    Books are fetched in batches of `batch_size` as the generator is consumed, so memory use and the time to the first book don't grow with the size of the library.
+    The generator holds a pooled connection until it is exhausted or closed.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `read_status`: whether the returned books have been read or not. Defaults to `None`, which returns all books.
+     - `columns`: the `books` columns to return. `id` and `title` are always included.
+     - `batch_size`: the number of books fetched from the database at once.
+
+    ### Returns:
+    A generator of dictionaries keyed by column name.
+    """
+    return get_repository(db_name).iter_books(read_status, columns, batch_size)
+
+
+def search_books(
+    db_name: str, query: str, limit: int = 10, offset: int = 0
+) -> list[dict]:
+    """
+    Searches the title, authors, categories and description of the stored books, using the database's full-text search index.
+    Matches in titles rank above matches in authors, then categories, then descriptions.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `query`: the search terms, in web search syntax, e.g. `greek myth -odyssey` or `"time and chance"`.
+     - `limit`: the maximum number of books to return.
+     - `offset`: the number of best matches to skip, to page through results.
+
+    ### Returns:
+    A list of dictionaries, one per matching book, keyed by the `books` column names plus a `rank` score.
+    """
+    return get_repository(db_name).search_books(query, limit, offset)
 
 
 def delete_book_from_db(
@@ -158,6 +2496,7 @@ def delete_book_from_db(
 ):
     """
     Deletes a single book from the database.
+    If both `title` and `isbn` are passed, only a book matching both is deleted.
     If passed info doesn't match a stored book, or if neither `title` nor `isbn` are passed, does nothing.
 
     ### Args:
@@ -168,35 +2507,7 @@ def delete_book_from_db(
     ### Returns:
     `True` if the book has been deleted, `False` if it could not be found.
     """
-    if title:
-        if not check_if_book_in_db(db_name, title=title):
-            return False
-    if isbn:
-        if not check_if_book_in_db(db_name, isbn=isbn):
-            return False
-
-    with psycopg.connect(f"dbname={db_name}") as conn:
-        if title:
-            conn.execute(
-                """
-                DELETE FROM
-                    books
-                WHERE
-                    title = %s;
-                """,
-                (title,),
-            )
-        if isbn:
-            conn.execute(
-                """
-                DELETE FROM
-                    books
-                WHERE
-                    isbn_10 = %s OR isbn_13 = %s;
-                """,
-                (isbn, isbn),
-            )
-    return True
+    return get_repository(db_name).delete_book(title=title, isbn=isbn)
 
 
 def update_book_in_db(db_name: str, title: str, toggle_read: bool):
@@ -206,25 +2517,43 @@ def update_book_in_db(db_name: str, title: str, toggle_read: bool):
     ### Args:
      - `db_name`: the name of the database with the `books` table.
      - `title`: the title of the book to update.
-     - `toggle_read`: if `True`, will flip a book's read status.
+     - `toggle_read`: if `True`, will flip a book's read status. Otherwise the book is only looked up, and its row is left untouched.
 
     ### Returns:
     `True` if the book has been updated, `False` if it could not be found.
     """
-    if not check_if_book_in_db(db_name, title=title):
-        return False
+    return get_repository(db_name).update_book(title, toggle_read)
 
-    if toggle_read:
-        with psycopg.connect(f"dbname={db_name}") as conn:
-            conn.execute(
-                """
-                UPDATE
-                    books
-                SET
-                    read = NOT read
-                WHERE
-                    title = %s;
-                """,
-                (title,),
-            )
-    return True
+
+def get_library_stats(db_name: str, top: int = 10) -> LibraryStats:
+    """
+    Summarises the stored books: how many there are, how many have been read, and the most common authors, categories, languages and publication years.
+    The counts are kept up to date by database triggers as books are added, updated and deleted, so this doesn't scan the `books` table.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `top`: the number of most common values to return for each of authors, categories, languages and years.
+
+    ### Returns:
+    A `LibraryStats` named tuple.
+    """
+    return get_repository(db_name).get_stats(top)
+
+
+def find_similar_titles(
+    db_name: str, title: str, limit: int = 5, threshold: float = 0.3
+) -> list[TitleMatch]:
+    """
+    Finds the stored titles most similar to a possibly misspelt title, so that a near miss can be offered instead of failing.
+    Titles are compared by the trigrams they share, found through a trigram index rather than by scoring every stored title.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `title`: the title to match.
+     - `limit`: the maximum number of titles to return.
+     - `threshold`: the minimum similarity, from 0 to 1, of returned titles.
+
+    ### Returns:
+    A list of `TitleMatch`es, most similar first.
+    """
+    return get_repository(db_name).find_similar_titles(title, limit, threshold)
@@ -0,0 +1,164 @@
+import csv
+import datetime
+import io
+import json
+import os
+from itertools import batched
+from typing import IO, Iterator, Sequence
+
+try:
+    from .db_utils import BOOK_COLUMNS, BookRepository, book_columns, get_repository
+except ImportError:
+    from db_utils import BOOK_COLUMNS, BookRepository, book_columns, get_repository
+
+EXPORT_FORMATS = ("jsonl", "csv", "parquet")
+
+# Parquet column types, so that every chunk is written with the same schema however many values are missing
+PARQUET_TYPES = {
+    "authors": "list<string>",
+    "categories": "list<string>",
+    "published_date": "date32",
+    "added": "date32",
+    "page_count": "int32",
+    "read": "bool",
+}
+
+
+def export_books(
+    db_name: str,
+    path: str,
+    format: str | None = None,
+    read_status: bool | None = None,
+    columns: Sequence[str] = BOOK_COLUMNS,
+    batch_size: int = 5000,
+) -> int:
+    """
+    Exports the stored books, ordered by title, to a JSON Lines, CSV or Parquet file.
+    Books are streamed from the database and written in chunks of `batch_size`, so memory use doesn't grow with the size of the library.
+    With PostgreSQL, CSV is written straight from `COPY ... TO STDOUT`.
+    The file is written under a temporary name and moved into place once complete, so an interrupted export never leaves a partial file at `path`.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `path`: the file path to write the export to.
+     - `format`: one of `jsonl`, `csv` or `parquet`. Defaults to the extension of `path`.
+     - `read_status`: whether the exported books have been read or not. Defaults to `None`, which exports all books.
+     - `columns`: the `books` columns to export. `id` and `title` are always included.
+     - `batch_size`: the number of books fetched and written at once.
+
+    ### Returns:
+    The number of books exported.
+    """
+    if format is None:
+        format = os.path.splitext(path)[1].lstrip(".").lower()
+    if format not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Unknown export format {format!r}, expected one of {', '.join(EXPORT_FORMATS)}"
+        )
+    columns = book_columns(columns)
+    repository = get_repository(db_name)
+
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            if format == "csv" and isinstance(repository, BookRepository):
+                count = repository.copy_books_csv(file, read_status, columns)
+            else:
+                books = repository.iter_books(read_status, columns, batch_size)
+                write = {
+                    "jsonl": write_jsonl,
+                    "csv": write_csv,
+                    "parquet": write_parquet,
+                }[format]
+                count = write(books, file, columns, batch_size)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return count
+
+
+def write_jsonl(
+    books: Iterator[dict], file: IO[bytes], columns: list[str], batch_size: int
+) -> int:
+    """Writes books to a binary file as JSON Lines, one object per book with dates as ISO strings."""
+    count = 0
+    for chunk in batched(books, batch_size):
+        lines = (
+            json.dumps(book, ensure_ascii=False, default=json_value) + "\n"
+            for book in chunk
+        )
+        file.write("".join(lines).encode())
+        count += len(chunk)
+    return count
+
+
+def write_csv(
+    books: Iterator[dict], file: IO[bytes], columns: list[str], batch_size: int
+) -> int:
+    """Writes books to a binary file as CSV with a header row, in the same shape as `BookRepository.copy_books_csv`."""
+    buffer = io.StringIO(newline="")
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    count = 0
+    for chunk in batched(books, batch_size):
+        writer.writerows(
+            [csv_value(book[column]) for column in columns] for book in chunk
+        )
+        file.write(buffer.getvalue().encode())
+        buffer.seek(0)
+        buffer.truncate()
+        count += len(chunk)
+    # The header is still buffered if there were no books
+    file.write(buffer.getvalue().encode())
+    return count
+
+
+def write_parquet(
+    books: Iterator[dict], file: IO[bytes], columns: list[str], batch_size: int
+) -> int:
+    """Writes books to a binary file as Parquet, one row group per chunk. Requires `pyarrow`."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "Exporting to Parquet requires pyarrow, installed with the `parquet` extra"
+        ) from None
+
+    types = {
+        "list<string>": pa.list_(pa.string()),
+        "date32": pa.date32(),
+        "int32": pa.int32(),
+        "bool": pa.bool_(),
+    }
+    schema = pa.schema(
+        (column, types.get(PARQUET_TYPES.get(column), pa.string()))
+        for column in columns
+    )
+    count = 0
+    with pq.ParquetWriter(file, schema) as writer:
+        for chunk in batched(books, batch_size):
+            writer.write_batch(pa.RecordBatch.from_pylist(list(chunk), schema=schema))
+            count += len(chunk)
+    return count
+
+
+def json_value(value: object) -> str:
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def csv_value(value: object) -> object:
+    """Converts a book value into a CSV cell, writing lists as JSON arrays, dates as ISO strings and booleans as `true` or `false`."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
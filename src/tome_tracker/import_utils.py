@@ -0,0 +1,443 @@
+import csv
+import json
+import os
+import queue
+import re
+import threading
+from typing import IO, Callable, Iterator, NamedTuple
+
+from requests.exceptions import RequestException
+
+try:
+    from .api_utils import BooksApiClient, NoMatchingISBN, get_default_client
+    from .db_utils import BookStore, get_repository
+    from .isbn_index import normalise_isbn
+except ImportError:
+    from api_utils import BooksApiClient, NoMatchingISBN, get_default_client
+    from db_utils import BookStore, get_repository
+    from isbn_index import normalise_isbn
+
+# ISBN columns of Goodreads and LibraryThing exports, most preferred first
+ISBN_COLUMNS = ("ISBN13", "ISBN", "ISBNs", "ISBN10")
+FAILURE_REPORT_COLUMNS = ("row", "isbn", "reason")
+ISBN_SEPARATORS = re.compile(r"[\s,;]+")
+
+
+class ImportRow(NamedTuple):
+    """A book to import from a row of a library export, with its normalised ISBN."""
+
+    row: int
+    isbn: str
+    read: bool
+
+
+class ImportFailure(NamedTuple):
+    """A row of a library export that could not be imported, and why."""
+
+    row: int
+    isbn: str
+    reason: str
+
+
+class ImportProgress(NamedTuple):
+    """
+    Running totals for `import_library`, passed to its progress callback and returned once the import finishes.
+    Rows already imported by an earlier, interrupted run are not counted.
+    """
+
+    processed: int
+    added: int
+    already_stored: int
+    failed: int
+
+
+class _Skipped(NamedTuple):
+    row: int
+
+
+class _Found(NamedTuple):
+    row: int
+    book_info: dict
+    read: bool
+
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class _Stopped(Exception):
+    """Raised in a stage when another stage has failed, to unwind it."""
+
+
+def read_library_export(
+    path: str, start_row: int = 0
+) -> Iterator[ImportRow | ImportFailure]:
+    """
+    Streams the books in a Goodreads or LibraryThing CSV export, one row at a time.
+    Goodreads books count as read if they are on the `read` shelf, and LibraryThing books if they have a read date or are in the `Read but unowned` collection.
+
+    ### Args:
+     - `path`: the path of the CSV export.
+     - `start_row`: the number of data rows to skip, to resume an import.
+
+    ### Returns:
+    A generator of `ImportRow`s, or `ImportFailure`s for rows without a valid ISBN, numbered from 1.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as export:
+        for number, row in enumerate(csv.DictReader(export), start=1):
+            if number <= start_row:
+                continue
+            values = [row[column] for column in ISBN_COLUMNS if row.get(column)]
+            isbn = export_isbn(values)
+            if isbn is None:
+                raw_isbn = clean_isbn_cell(values[0]) if values else ""
+                yield ImportFailure(number, raw_isbn, "No valid ISBN")
+            else:
+                yield ImportRow(number, isbn, export_read_status(row))
+
+
+def clean_isbn_cell(value: str) -> str:
+    """Strips the spreadsheet quoting Goodreads wraps ISBNs in, e.g. `="0753820161"`, and the brackets LibraryThing uses."""
+    return value.strip().lstrip("=").strip('"[]').strip()
+
+
+def export_isbn(values: list[str]) -> str | None:
+    """Picks the first valid ISBN from the ISBN cells of an export row, ignoring dashes and spaces, or returns `None` if there isn't one."""
+    for value in values:
+        for candidate in ISBN_SEPARATORS.split(clean_isbn_cell(value)):
+            key = normalise_isbn(candidate.strip('"[]'))
+            if key is not None:
+                return key.decode("ascii").strip()
+    return None
+
+
+def export_read_status(row: dict) -> bool:
+    """Works out whether the book on an export row has been read."""
+    if row.get("Exclusive Shelf"):
+        return row["Exclusive Shelf"].strip().casefold() == "read"
+    if row.get("Date Read", "").strip():
+        return True
+    return "read but unowned" in row.get("Collections", "").casefold()
+
+
+class LibraryImport:
+    """
+    Imports a Goodreads or LibraryThing CSV export as a pipeline of stages, each on its own thread and connected by bounded queues, so that parsing, database checks, API lookups and inserts overlap.
+     1. The export is parsed and its ISBNs normalised.
+     2. ISBNs which are already stored are dropped, checked in batches with the repository's `find_books`.
+     3. The remaining ISBNs are looked up by a pool of workers sharing the API client, so the client's rate limiter rather than waiting on each request sets the pace.
+     4. Found books are added in batches with the repository's `add_books`, grouped by read status.
+
+    Progress is saved to the checkpoint file after each batch, as the number of leading rows that are done, so that an interrupted import can be rerun and picks up where it stopped.
+    The checkpoint file is removed once the import completes.
+    Rows that can't be imported are appended to the failure report, a CSV with `row`, `isbn` and `reason` columns.
+    When resuming, failures reported for rows after the checkpoint are dropped from the report, since those rows are imported again.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `path`: the path of the CSV export.
+     - `checkpoint_path`: an optional file to save progress to and resume from.
+     - `failures_path`: an optional CSV file to report failed rows to.
+     - `progress`: an optional callback, passed an `ImportProgress` each time a row is done.
+     - `client`: the API client to look books up with. Defaults to the client shared by `api_utils`.
+     - `batch_size`: the number of books checked against or added to the database at once.
+     - `max_workers`: the number of concurrent lookups. Defaults to the client's `pool_size`.
+     - `repository`: the storage backend to check and add books with. Defaults to the backend shared by the module-level `db_utils` functions for `db_name`.
+     - `queue_size`: the number of rows each queue holds, bounding memory use however large the export.
+    """
+
+    def __init__(
+        self,
+        db_name: str,
+        path: str,
+        checkpoint_path: str | None = None,
+        failures_path: str | None = None,
+        progress: Callable[[ImportProgress], None] | None = None,
+        client: BooksApiClient | None = None,
+        batch_size: int = 100,
+        max_workers: int | None = None,
+        repository: BookStore | None = None,
+        queue_size: int = 1000,
+    ):
+        self.db_name = db_name
+        self.repository = (
+            repository if repository is not None else get_repository(db_name)
+        )
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.failures_path = failures_path
+        self.progress = progress
+        self.client = client if client is not None else get_default_client()
+        self.batch_size = batch_size
+        self.max_workers = max_workers or self.client.pool_size
+        self.parsed = queue.Queue(queue_size)
+        self.lookups = queue.Queue(queue_size)
+        self.results = queue.Queue(queue_size)
+        self.stopped = threading.Event()
+        self.errors: list[BaseException] = []
+        self.totals = ImportProgress(0, 0, 0, 0)
+
+        self.start_row = self._read_checkpoint()
+        self.done_row = self.start_row
+        self.done_rows: set[int] = set()
+        self.report = None
+
+    def run(self) -> ImportProgress:
+        """Runs the import to completion, re-raising the first error from any stage."""
+        stages = [
+            threading.Thread(
+                target=self._stage, args=(self._parse,), name="import-parse"
+            ),
+            threading.Thread(
+                target=self._stage, args=(self._filter,), name="import-filter"
+            ),
+            *(
+                threading.Thread(
+                    target=self._stage,
+                    args=(self._look_up,),
+                    name=f"import-lookup-{number}",
+                )
+                for number in range(self.max_workers)
+            ),
+        ]
+        for stage in stages:
+            stage.start()
+        try:
+            self._write()
+        except BaseException as error:
+            self.errors.append(error)
+        finally:
+            self.stopped.set()
+            for stage in stages:
+                stage.join()
+        if self.errors:
+            raise self.errors[0]
+        if self.checkpoint_path is not None and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return self.totals
+
+    def _stage(self, function: Callable[[], None]):
+        try:
+            function()
+        except _Stopped:
+            pass
+        except BaseException as error:
+            self.errors.append(error)
+            self.stopped.set()
+
+    def _put(self, target: queue.Queue, item: object):
+        # Gives up if another stage has failed, rather than blocking on a queue nobody is reading
+        while True:
+            if self.stopped.is_set():
+                raise _Stopped
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, source: queue.Queue) -> object:
+        while True:
+            if self.stopped.is_set():
+                raise _Stopped
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _parse(self):
+        for item in read_library_export(self.path, self.start_row):
+            self._put(self.parsed, item)
+        self._put(self.parsed, _DONE)
+
+    def _filter(self):
+        finished = False
+        while not finished:
+            # Waits for one row, then takes whatever else is ready, so batches never wait to fill up
+            batch = [self._get(self.parsed)]
+            while len(batch) < self.batch_size and batch[-1] is not _DONE:
+                try:
+                    batch.append(self.parsed.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _DONE:
+                batch.pop()
+                finished = True
+
+            rows = [item for item in batch if isinstance(item, ImportRow)]
+            stored = (
+                self.repository.find_books(isbns=[row.isbn for row in rows])
+                if rows
+                else set()
+            )
+            for item in batch:
+                if isinstance(item, ImportFailure):
+                    self._put(self.results, item)
+                elif item.isbn in stored:
+                    self._put(self.results, _Skipped(item.row))
+                else:
+                    self._put(self.lookups, item)
+        for _ in range(self.max_workers):
+            self._put(self.lookups, _DONE)
+
+    def _look_up(self):
+        while (item := self._get(self.lookups)) is not _DONE:
+            try:
+                book_info = self.client.get_book_by_isbn(item.isbn)
+            except NoMatchingISBN:
+                self._put(
+                    self.results,
+                    ImportFailure(item.row, item.isbn, "No matching book found"),
+                )
+            except RequestException as error:
+                self._put(
+                    self.results,
+                    ImportFailure(item.row, item.isbn, f"Lookup failed: {error}"),
+                )
+            else:
+                self._put(self.results, _Found(item.row, book_info, item.read))
+        self._put(self.results, _DONE)
+
+    def _write(self):
+        pending: dict[bool, list[_Found]] = {True: [], False: []}
+        report_file = self._open_failure_report()
+        try:
+            finished_workers = 0
+            while finished_workers < self.max_workers:
+                item = self._get(self.results)
+                if item is _DONE:
+                    finished_workers += 1
+                elif isinstance(item, _Found):
+                    pending[item.read].append(item)
+                    if len(pending[item.read]) >= self.batch_size:
+                        self._insert(pending[item.read], item.read)
+                elif isinstance(item, ImportFailure):
+                    if self.report is not None:
+                        self.report.writerow(item)
+                    self._finish([item.row], failed=1)
+                else:
+                    self._finish([item.row], already_stored=1)
+            for read, found in pending.items():
+                if found:
+                    self._insert(found, read)
+        finally:
+            if report_file is not None:
+                report_file.close()
+
+    def _insert(self, found: list[_Found], read: bool):
+        result = self.repository.add_books([item.book_info for item in found], read)
+        self._finish(
+            [item.row for item in found],
+            added=len(result.inserted),
+            already_stored=len(found) - len(result.inserted),
+        )
+        found.clear()
+
+    def _finish(
+        self, rows: list[int], added: int = 0, already_stored: int = 0, failed: int = 0
+    ):
+        processed, total_added, total_stored, total_failed = self.totals
+        self.totals = ImportProgress(
+            processed + len(rows),
+            total_added + added,
+            total_stored + already_stored,
+            total_failed + failed,
+        )
+        # Rows finish out of order, so only the unbroken run from the start is checkpointed
+        self.done_rows.update(rows)
+        done_row = self.done_row
+        while done_row + 1 in self.done_rows:
+            done_row += 1
+            self.done_rows.remove(done_row)
+        if done_row != self.done_row:
+            self.done_row = done_row
+            self._write_checkpoint()
+        if self.progress is not None:
+            self.progress(self.totals)
+
+    def _read_checkpoint(self) -> int:
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as checkpoint:
+            return json.load(checkpoint)["row"]
+
+    def _write_checkpoint(self):
+        if self.checkpoint_path is None:
+            return
+        # Failures must be reported before the checkpoint moves past them
+        if self.report is not None:
+            self.report_file.flush()
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w") as checkpoint:
+            json.dump({"row": self.done_row}, checkpoint)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _open_failure_report(self) -> IO[str] | None:
+        if self.failures_path is None:
+            return None
+        if self.start_row > 0 and os.path.exists(self.failures_path):
+            self._trim_failure_report()
+            self.report_file = open(self.failures_path, "a", newline="")
+            self.report = csv.writer(self.report_file)
+        else:
+            self.report_file = open(self.failures_path, "w", newline="")
+            self.report = csv.writer(self.report_file)
+            self.report.writerow(FAILURE_REPORT_COLUMNS)
+        return self.report_file
+
+    def _trim_failure_report(self):
+        # Resumed imports add to the report from the interrupted run, which may have reported rows after its last checkpoint
+        with open(self.failures_path, newline="") as report:
+            kept = [
+                failure
+                for failure in csv.DictReader(report)
+                if int(failure["row"]) <= self.start_row
+            ]
+        temp_path = f"{self.failures_path}.tmp"
+        with open(temp_path, "w", newline="") as report:
+            writer = csv.DictWriter(report, FAILURE_REPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(kept)
+        os.replace(temp_path, self.failures_path)
+
+
+def import_library(
+    db_name: str,
+    path: str,
+    checkpoint_path: str | None = None,
+    failures_path: str | None = None,
+    progress: Callable[[ImportProgress], None] | None = None,
+    client: BooksApiClient | None = None,
+    batch_size: int = 100,
+    max_workers: int | None = None,
+    repository: BookStore | None = None,
+) -> ImportProgress:
+    """
+    Imports the books in a Goodreads or LibraryThing CSV export, looking each new ISBN up with the Google Books API.
+    Books already stored are skipped without calling the API. See `LibraryImport` for how the import is pipelined.
+
+    ### Args:
+     - `db_name`: the name of the database with the `books` table.
+     - `path`: the path of the CSV export.
+     - `checkpoint_path`: an optional file to save progress to while importing. If it exists, the import resumes from it.
+     - `failures_path`: an optional CSV file listing the rows that couldn't be imported, and why.
+     - `progress`: an optional callback, passed an `ImportProgress` each time a row is done.
+     - `client`: the API client to look books up with. Defaults to the client shared by `api_utils`.
+     - `batch_size`: the number of books checked against or added to the database at once.
+     - `max_workers`: the number of concurrent lookups. Defaults to the client's `pool_size`.
+     - `repository`: the storage backend to check and add books with, e.g. one already open for a session. Defaults to the backend shared by the module-level `db_utils` functions for `db_name`.
+
+    ### Returns:
+    The final `ImportProgress` totals.
+    """
+    return LibraryImport(
+        db_name,
+        path,
+        checkpoint_path,
+        failures_path,
+        progress,
+        client,
+        batch_size,
+        max_workers,
+        repository,
+    ).run()
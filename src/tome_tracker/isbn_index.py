@@ -0,0 +1,170 @@
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from typing import IO, Iterable, Iterator
+
+# File layout: header, then entries sorted by key, then the book records they point to
+MAGIC = b"TTISBN01"
+HEADER = struct.Struct("<8sQ")  # magic, number of entries
+ENTRY = struct.Struct("<13sQI")  # ISBN key, record offset, record length
+KEY_LENGTH = 13
+
+
+def normalise_isbn(isbn: str) -> bytes | None:
+    """
+    Converts an ISBN 10 or ISBN 13 into a fixed-width index key, ignoring dashes and spaces.
+    Returns `None` if the passed value isn't shaped like an ISBN.
+    """
+    isbn = isbn.replace("-", "").replace(" ", "").upper()
+    if len(isbn) == 13 and isbn.isdigit():
+        return isbn.encode("ascii")
+    if len(isbn) == 10 and isbn[:9].isdigit() and (isbn[9].isdigit() or isbn[9] == "X"):
+        return isbn.encode("ascii").ljust(KEY_LENGTH)
+    return None
+
+
+class IsbnIndex:
+    """
+    A read-only index of book info keyed by ISBN 10 and ISBN 13, built with `write_isbn_index`.
+    The index file is memory-mapped and searched with a binary search, so lookups are fast without loading the index into memory.
+
+    ### Args:
+     - `path`: the file path of the index.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an ISBN index")
+        self.records_start = HEADER.size + self.count * ENTRY.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        """Unmaps and closes the index file."""
+        self.map.close()
+        self.file.close()
+
+    def get(self, isbn: str) -> dict | None:
+        """Returns the book info stored for the passed ISBN 10 or ISBN 13, or `None` if it isn't in the index."""
+        key = normalise_isbn(isbn)
+        if key is None:
+            return None
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            position = HEADER.size + middle * ENTRY.size
+            middle_key = self.map[position : position + KEY_LENGTH]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                _, offset, length = ENTRY.unpack_from(self.map, position)
+                start = self.records_start + offset
+                return json.loads(self.map[start : start + length])
+        return None
+
+
+def write_isbn_index(
+    records: Iterable[dict], index_path: str, chunk_size: int = 100_000
+) -> int:
+    """
+    Builds an `IsbnIndex` file from a stream of book info dictionaries, keyed by their `isbn_10` and `isbn_13`.
+    Records are written to disk as they arrive, and keys are sorted in bounded chunks then merged, so memory use doesn't grow with the number of records.
+    If several records share an ISBN, the first one is kept.
+
+    ### Args:
+     - `records`: an iterable of book info dictionaries, in the shape returned by `get_book_by_volume_id`.
+     - `index_path`: the file path to write the index to.
+     - `chunk_size`: the number of keys to sort in memory at once.
+
+    ### Returns:
+    The number of ISBNs in the index.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        records_path = os.path.join(temp_dir, "records")
+        run_paths = []
+        keys = []
+        offset = 0
+
+        with open(records_path, "wb") as records_file:
+            for book_info in records:
+                record_keys = [
+                    normalise_isbn(book_info[field])
+                    for field in ("isbn_10", "isbn_13")
+                    if book_info.get(field)
+                ]
+                record_keys = [key for key in record_keys if key is not None]
+                if not record_keys:
+                    continue
+
+                record = json.dumps(book_info, separators=(",", ":")).encode()
+                records_file.write(record)
+                keys.extend(ENTRY.pack(key, offset, len(record)) for key in record_keys)
+                offset += len(record)
+
+                if len(keys) >= chunk_size:
+                    run_paths.append(write_sorted_run(keys, temp_dir, len(run_paths)))
+                    keys = []
+        if keys:
+            run_paths.append(write_sorted_run(keys, temp_dir, len(run_paths)))
+
+        run_files = [open(path, "rb") for path in run_paths]
+        try:
+            with open(index_path, "wb") as index_file:
+                index_file.write(HEADER.pack(MAGIC, 0))
+                count = 0
+                previous_key = None
+                runs = (read_run(file) for file in run_files)
+                for entry in heapq.merge(*runs, key=entry_key):
+                    key = entry_key(entry)
+                    if key == previous_key:
+                        continue
+                    index_file.write(entry)
+                    previous_key = key
+                    count += 1
+
+                with open(records_path, "rb") as records_file:
+                    shutil.copyfileobj(records_file, index_file)
+                index_file.seek(0)
+                index_file.write(HEADER.pack(MAGIC, count))
+        finally:
+            for file in run_files:
+                file.close()
+
+    return count
+
+
+def write_sorted_run(entries: list[bytes], temp_dir: str, run_number: int) -> str:
+    """Sorts a chunk of packed index entries and writes them to a temporary run file, returning its path."""
+    entries.sort(key=entry_key)
+    path = os.path.join(temp_dir, f"run{run_number}")
+    with open(path, "wb") as run_file:
+        run_file.writelines(entries)
+    return path
+
+
+def entry_key(entry: bytes) -> bytes:
+    return entry[:KEY_LENGTH]
+
+
+def read_run(run_file: IO[bytes]) -> Iterator[bytes]:
+    """Streams the packed index entries from a run file."""
+    while entry := run_file.read(ENTRY.size):
+        yield entry
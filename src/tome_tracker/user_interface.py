@@ -1,18 +1,19 @@
-from api_utils import NoMatchingISBN, get_book_by_volume_id, get_volume_id_by_isbn
+import os
+
+from api_utils import NoMatchingISBN, get_book_by_isbn
 from barcode_scanner import scan_barcode
-from db_utils import (
-    add_book_to_db,
-    create_books_table,
-    delete_book_from_db,
-    list_books_in_db,
-    update_book_in_db,
-)
+from cover_store import CoverStore
+from db_utils import open_repository
+from import_utils import ImportProgress, import_library
 
 
 class UserInterface:
     def __init__(self):
         self.db_name = "tome_tracker"
-        create_books_table(self.db_name)
+        self.repository = open_repository(self.db_name)
+        self.repository.create_books_table()
+        cover_dir = os.getenv("TOME_TRACKER_COVER_DIR")
+        self.covers = CoverStore(cover_dir) if cover_dir else None
 
     def main_loop(self):
         self.print_intro_message()
@@ -23,6 +24,12 @@ class UserInterface:
                 self.add_book()
             elif command == "l":
                 self.list_stored_books()
+            elif command == "s":
+                self.search_stored_books()
+            elif command == "i":
+                self.import_books()
+            elif command == "t":
+                self.show_stats()
             elif command == "d":
                 self.delete_book()
             elif command == "u":
@@ -30,13 +37,20 @@ class UserInterface:
             elif command == "q":
                 break
             else:
-                print("Command not recognised. Choose one of a/l/d/u/q.")
+                print("Command not recognised. Choose one of a/i/l/s/t/d/u/q.")
+
+        self.repository.close()
+        if self.covers is not None:
+            self.covers.close()
 
     def print_intro_message(self):
         print("\nWelcome to Tome Tracker!")
         print("\nChoose from one of the following options:")
         print(" - [a]dd a book to storage")
+        print(" - [i]mport books from a Goodreads or LibraryThing CSV export")
         print(" - [l]ist stored books")
+        print(" - [s]earch stored books")
+        print(" - show library s[t]atistics")
         print(" - [d]elete a stored book")
         print(" - [u]pdate a stored book")
         print(" - [q]uit")
@@ -49,9 +63,11 @@ class UserInterface:
             isbn = scan_barcode()
         else:
             isbn = input("Please provide the book's ISBN:\n> ")
+        if self.repository.find_books(isbns=[isbn]):
+            print("Book has already been added!")
+            return
         try:
-            volume_id = get_volume_id_by_isbn(isbn)
-            book_info = get_book_by_volume_id(volume_id)
+            book_info = get_book_by_isbn(isbn)
             print(f"{book_info['title']} has been found.")
         except NoMatchingISBN:
             print("No book with that ISBN could be found!")
@@ -59,41 +75,111 @@ class UserInterface:
 
         read_status = input("Press 'y' if you have read this book:\n> ")
         read_status = read_status == "y"
-        response = add_book_to_db(self.db_name, book_info, read_status)
+        response = self.repository.add_book(book_info, read_status)
         if response:
             print("Book successfully added!")
+            if self.covers is not None:
+                self.covers.prefetch(book_info["thumbnail"])
         else:
             print("Book has already been added!")
 
+    def import_books(self):
+        path = input("Please enter the path of the CSV export:\n> ")
+        if not os.path.exists(path):
+            print("No file could be found at that path!")
+            return
+
+        def show_progress(progress: ImportProgress):
+            print(f"\rImported {progress.processed} rows...", end="", flush=True)
+
+        # Rerunning the import on the same file resumes from the checkpoint
+        totals = import_library(
+            self.db_name,
+            path,
+            checkpoint_path=f"{path}.checkpoint",
+            failures_path=f"{path}.failures.csv",
+            progress=show_progress,
+            repository=self.repository,
+        )
+        print(
+            f"\n{totals.added} books added, {totals.already_stored} already stored, {totals.failed} failed."
+        )
+        if totals.failed:
+            print(f"Failed rows are listed in {path}.failures.csv")
+
     def list_stored_books(self):
         read_status = input(
             "Press 'r' to see all read books, 'u' to see all unread books, and any other key to see all books:\n> "
         )
         if read_status == "r":
-            stored_books = list_books_in_db(self.db_name, True)
+            read_status = True
         elif read_status == "u":
-            stored_books = list_books_in_db(self.db_name, False)
+            read_status = False
         else:
-            stored_books = list_books_in_db(self.db_name)
+            read_status = None
 
         print("Currently stored books:")
-        for book in stored_books:
-            print(f" - {book}")
+        cursor = None
+        while True:
+            page = self.repository.list_books_page(
+                read_status, page_size=20, cursor=cursor
+            )
+            for book in page.books:
+                print(f" - {book['title']}")
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+            if input("Press enter to see more books, or any other key to stop:\n> "):
+                break
+
+    def search_stored_books(self):
+        query = input(
+            "Please enter words from the title, authors, categories or description:\n> "
+        )
+        results = self.repository.search_books(query)
+        if not results:
+            print("No matching books could be found!")
+            return
+
+        print("Best matching books:")
+        for book in results:
+            authors = ", ".join(book["authors"] or [])
+            print(
+                f" - {book['title']} ({authors})" if authors else f" - {book['title']}"
+            )
+
+    def show_stats(self):
+        stats = self.repository.get_stats(top=5)
+        print(f"Stored books: {stats.total_books}")
+        print(f"Read books: {stats.read_books} ({stats.pages_read} pages)")
+        print(f"Unread books: {stats.unread_books}")
+        for heading, counts in (
+            ("Top authors", stats.authors),
+            ("Top categories", stats.categories),
+            ("Languages", stats.languages),
+            ("Publication years", stats.years),
+        ):
+            if counts:
+                print(f"{heading}:")
+                for value, books in counts.items():
+                    print(f" - {value}: {books}")
 
     def delete_book(self):
         deletion_command = input(
             "Press 't' to delete by title, 'i' to delete by ISBN, or any other key to cancel deletion:\n> "
         )
         if deletion_command == "t":
-            title = input("Please enter the title exactly:\n> ")
-            response = delete_book_from_db(self.db_name, title=title)
+            title = input("Please enter the title:\n> ")
+            response = self.repository.delete_book(title=title)
+            if not response and (match := self.choose_similar_title(title)):
+                response = self.repository.delete_book(title=match)
             if response:
                 print("Book deleted from storage!")
             else:
                 print("Book could not be found!")
         elif deletion_command == "i":
             isbn = input("Please enter the ISBN without dashes or spaces:\n> ")
-            response = delete_book_from_db(self.db_name, isbn=isbn)
+            response = self.repository.delete_book(isbn=isbn)
             if response:
                 print("Book deleted from storage!")
             else:
@@ -102,12 +188,27 @@ class UserInterface:
     def update_book(self):
         print("This will toggle whether a book is marked as read or not.")
         title = input("Please enter the title of the book to update:\n> ")
-        response = update_book_in_db(self.db_name, title, True)
+        response = self.repository.update_book(title, True)
+        if not response and (match := self.choose_similar_title(title)):
+            response = self.repository.update_book(match, True)
         if response:
             print("Book updated!")
         else:
             print("Book could not be found!")
 
+    def choose_similar_title(self, title: str) -> str | None:
+        matches = self.repository.find_similar_titles(title)
+        if not matches:
+            return None
+
+        print("No book has that exact title. Did you mean:")
+        for number, match in enumerate(matches, start=1):
+            print(f" {number}. {match.title}")
+        choice = input("Enter the number of the book, or any other key to cancel:\n> ")
+        if choice.isdigit() and 1 <= int(choice) <= len(matches):
+            return matches[int(choice) - 1].title
+        return None
+
 
 if __name__ == "__main__":
     UserInterface().main_loop()
@@ -1,14 +1,35 @@
-from unittest.mock import patch
+import asyncio
+import gzip
+import json
+import threading
+import time
+from unittest.mock import call, patch
 
+import httpx
 import pytest
-from requests.exceptions import HTTPError
+from requests.exceptions import ConnectionError, HTTPError
 
 from src.tome_tracker.api_utils import (
+    AsyncBooksApiClient,
+    AsyncSingleFlight,
+    BooksApiClient,
+    LookupCache,
     NoMatchingISBN,
+    RateLimiter,
+    RetryPolicy,
+    SingleFlight,
+    build_isbn_index,
     clean_book_info,
+    clean_book_infos,
+    extract_openlibrary_book_info,
+    get_book_by_isbn,
     get_book_by_volume_id,
+    get_books_by_isbns,
+    get_default_client,
     get_volume_id_by_isbn,
+    read_metadata_dump,
 )
+from src.tome_tracker.isbn_index import IsbnIndex, write_isbn_index
 
 
 def mocked_requests_get(*args, **kwargs):
@@ -58,6 +79,33 @@ def mocked_requests_get(*args, **kwargs):
     elif args[0] == "https://www.googleapis.com/books/v1/volumes?q=isbn:1234":
         return MockResponse({"totalItems": 0}, 200)
 
+    elif args[0] == "https://www.googleapis.com/books/v1/volumes?q=isbn:9780753820162":
+        json_data = {
+            "totalItems": 1,
+            "items": [
+                {
+                    "id": "pMyoPwAACAAJ",
+                    "etag": "WmUhbbR1UHg",
+                    "selfLink": "https://www.googleapis.com/books/v1/volumes/pMyoPwAACAAJ",
+                    "volumeInfo": {
+                        "title": "Meditations",
+                        "publishedDate": "2004",
+                        "description": "A new translation of one of the most important texts of Western philosophy.",
+                        "industryIdentifiers": [
+                            {"type": "ISBN_10", "identifier": "0753820161"},
+                            {"type": "ISBN_13", "identifier": "9780753820162"},
+                        ],
+                        "pageCount": 200,
+                        "imageLinks": {
+                            "thumbnail": "http://books.google.com/books/content?id=pMyoPwAACAAJ&printsec=frontcover&img=1&zoom=1&imgtk=AFLRE70wIuIPNQ8IJVGr-Er8MuUwDiPJE4xvb1UtvG3CZPDojWA3H05h1OnRPYbFjglMyKYHMc3_wEZ0EDgstcqmXUI9EjstHgvcCrcGLCjCVpcRpuNsDyuMRAbsQSQ5PopjBnrvLVW7&source=gbs_api"
+                        },
+                        "language": "en",
+                    },
+                }
+            ],
+        }
+        return MockResponse(json_data, 200)
+
     elif args[0] == "https://www.googleapis.com/books/v1/volumes/qm2PPwAACAAJ":
         json_data = {
             "id": "qm2PPwAACAAJ",
@@ -116,7 +164,9 @@ def mocked_requests_get(*args, **kwargs):
     return MockResponse(None, 404)
 
 
-@patch("src.tome_tracker.api_utils.requests.get", side_effect=mocked_requests_get)
+@patch(
+    "src.tome_tracker.api_utils.requests.Session.get", side_effect=mocked_requests_get
+)
 class TestGetVolumeIdByISBN:
     def test_returns_volume_id_given_correct_isbn_13(self, mock_request):
         forever_war_isbn = "9780575094147"
@@ -137,7 +187,9 @@ class TestGetVolumeIdByISBN:
             get_volume_id_by_isbn("1234")
 
 
-@patch("src.tome_tracker.api_utils.requests.get", side_effect=mocked_requests_get)
+@patch(
+    "src.tome_tracker.api_utils.requests.Session.get", side_effect=mocked_requests_get
+)
 class TestGetBookByVolumeId:
     def test_returns_correctly_formatted_dictionary_given_volume_id(self, mock_request):
         expected = {
@@ -190,6 +242,731 @@ class TestGetBookByVolumeId:
         assert get_book_by_volume_id("pMyoPwAACAAJ") == expected
 
 
+@patch(
+    "src.tome_tracker.api_utils.requests.Session.get", side_effect=mocked_requests_get
+)
+class TestBooksApiClient:
+    def test_reuses_a_single_session_across_lookups(self, mock_request):
+        with BooksApiClient() as client:
+            session = client.session
+            volume_id = client.get_volume_id_by_isbn("9780575094147")
+            client.get_book_by_volume_id(volume_id)
+            assert client.session is session
+        assert mock_request.call_count == 2
+
+    def test_passes_configured_timeout_to_requests(self, mock_request):
+        with BooksApiClient(timeout=(1.0, 5.0)) as client:
+            client.get_volume_id_by_isbn("9780575094147")
+        assert mock_request.call_args.kwargs["timeout"] == (1.0, 5.0)
+
+    def test_uses_configured_base_url(self, mock_request):
+        with BooksApiClient(base_url="https://books.example.com/v1/") as client:
+            with pytest.raises(HTTPError):
+                client.get_volume_id_by_isbn("9780575094147")
+        assert (
+            mock_request.call_args.args[0]
+            == "https://books.example.com/v1/volumes?q=isbn:9780575094147"
+        )
+
+    def test_configures_connection_pool_size(self, mock_request):
+        with BooksApiClient(pool_size=4) as client:
+            adapter = client.session.get_adapter("https://www.googleapis.com")
+            assert adapter._pool_maxsize == 4
+
+    def test_module_functions_share_the_default_client(self, mock_request):
+        assert get_default_client() is get_default_client()
+        get_volume_id_by_isbn("9780575094147")
+        assert mock_request.call_count == 1
+
+
+@patch(
+    "src.tome_tracker.api_utils.requests.Session.get", side_effect=mocked_requests_get
+)
+class TestGetBooksByISBNs:
+    def test_returns_results_in_input_order(self, mock_request):
+        isbns = ["9780575094147", "1234", "0575094141"]
+        results = get_books_by_isbns(isbns, max_workers=3)
+        assert [result.isbn for result in results] == isbns
+        assert results[0].book_info["title"] == "The Forever War"
+        assert results[2].book_info["title"] == "The Forever War"
+
+    def test_records_errors_per_isbn_without_failing_the_batch(self, mock_request):
+        results = get_books_by_isbns(["1234", "network_failure", "9780575094147"])
+        assert isinstance(results[0].error, NoMatchingISBN)
+        assert results[0].book_info is None
+        assert isinstance(results[1].error, HTTPError)
+        assert results[1].book_info is None
+        assert results[2].error is None
+
+    def test_limits_concurrent_lookups_to_max_workers(self, mock_request):
+        lock = threading.Lock()
+        active = 0
+        peak = 0
+
+        def slow_request(*args, **kwargs):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.01)
+            with lock:
+                active -= 1
+            return mocked_requests_get(*args, **kwargs)
+
+        mock_request.side_effect = slow_request
+        get_books_by_isbns(["9780575094147"] * 12, max_workers=3)
+        assert peak <= 3
+
+
+@patch(
+    "src.tome_tracker.api_utils.requests.Session.get", side_effect=mocked_requests_get
+)
+class TestGetBookByISBN:
+    def test_builds_book_info_from_search_response_in_one_request(self, mock_request):
+        expected = get_book_by_volume_id("pMyoPwAACAAJ")
+        mock_request.reset_mock()
+        assert get_book_by_isbn("9780753820162") == expected
+        assert mock_request.call_count == 1
+
+    def test_fetches_volume_when_search_response_is_missing_stored_fields(
+        self, mock_request
+    ):
+        expected = get_book_by_volume_id("qm2PPwAACAAJ")
+        mock_request.reset_mock()
+        assert get_book_by_isbn("9780575094147") == expected
+        assert mock_request.call_count == 2
+
+    def test_raises_no_matching_isbn_error_given_incorrect_isbn(self, mock_request):
+        with pytest.raises(NoMatchingISBN):
+            get_book_by_isbn("1234")
+
+    def test_caches_complete_search_payloads_as_volumes(self, mock_request, tmp_path):
+        client = BooksApiClient(cache=LookupCache(str(tmp_path / "cache.sqlite3")))
+        client.get_book_by_isbn("9780753820162")
+        client.get_book_by_volume_id("pMyoPwAACAAJ")
+        assert mock_request.call_count == 1
+
+
+OPEN_LIBRARY_EDITION = {
+    "type": {"key": "/type/edition"},
+    "key": "/books/OL7353617M",
+    "title": "Fantastic Mr. Fox",
+    "publishers": ["Puffin"],
+    "publish_date": "October 1, 1988",
+    "number_of_pages": 96,
+    "isbn_10": ["0140328726"],
+    "isbn_13": ["9780140328721"],
+    "languages": [{"key": "/languages/eng"}],
+    "covers": [8739161],
+    "subjects": ["Animals", "Foxes"],
+    "description": {"type": "/type/text", "value": "A fox outwits three farmers."},
+}
+
+
+class TestReadMetadataDump:
+    def test_reads_google_volumes_jsonl(self, tmp_path):
+        dump_path = tmp_path / "volumes.jsonl"
+        volume = mocked_requests_get(
+            "https://www.googleapis.com/books/v1/volumes/pMyoPwAACAAJ"
+        ).json()
+        dump_path.write_text(json.dumps(volume) + "\n\n")
+        with patch(
+            "src.tome_tracker.api_utils.requests.Session.get",
+            side_effect=mocked_requests_get,
+        ):
+            expected = get_book_by_volume_id("pMyoPwAACAAJ")
+        assert list(read_metadata_dump(str(dump_path))) == [expected]
+
+    def test_reads_gzipped_open_library_editions_dump(self, tmp_path):
+        dump_path = tmp_path / "ol_dump_editions.txt.gz"
+        with gzip.open(dump_path, "wt") as dump:
+            dump.write(
+                "/type/edition\t/books/OL7353617M\t4\t2010-03-11T23:51:36\t"
+                + json.dumps(OPEN_LIBRARY_EDITION)
+                + "\n"
+            )
+        [book_info] = read_metadata_dump(str(dump_path), "openlibrary")
+        assert book_info == {
+            "id": "OL7353617M",
+            "etag": None,
+            "selfLink": "https://openlibrary.org/books/OL7353617M.json",
+            "title": "Fantastic Mr. Fox",
+            "authors": [],
+            "publisher": "Puffin",
+            "publishedDate": None,
+            "description": "A fox outwits three farmers.",
+            "pageCount": 96,
+            "categories": ["Animals", "Foxes"],
+            "language": "en",
+            "isbn_10": "0140328726",
+            "isbn_13": "9780140328721",
+            "thumbnail": "https://covers.openlibrary.org/b/id/8739161-M.jpg",
+        }
+
+    def test_normalises_open_library_isbns(self):
+        book_info = extract_openlibrary_book_info(
+            {
+                **OPEN_LIBRARY_EDITION,
+                "isbn_10": ["not an isbn", "0-14-032872-6"],
+                "isbn_13": ["978-0-14-032872-1"],
+            }
+        )
+        assert book_info["isbn_10"] == "0140328726"
+        assert book_info["isbn_13"] == "9780140328721"
+
+    def test_rejects_unknown_dump_formats(self, tmp_path):
+        with pytest.raises(ValueError):
+            list(read_metadata_dump(str(tmp_path / "dump.jsonl"), "marc"))
+
+
+@patch(
+    "src.tome_tracker.api_utils.requests.Session.get", side_effect=mocked_requests_get
+)
+class TestOfflineIndexLookups:
+    def test_resolves_indexed_isbns_without_calling_the_api(
+        self, mock_request, tmp_path
+    ):
+        dump_path = tmp_path / "editions.jsonl"
+        dump_path.write_text(json.dumps(OPEN_LIBRARY_EDITION) + "\n")
+        index_path = str(tmp_path / "isbn.idx")
+        assert build_isbn_index(str(dump_path), index_path, "openlibrary") == 2
+
+        with IsbnIndex(index_path) as index:
+            client = BooksApiClient(index=index)
+            assert client.get_book_by_isbn("0140328726")["id"] == "OL7353617M"
+            assert client.get_book_by_isbn("9780140328721")["id"] == "OL7353617M"
+        assert mock_request.call_count == 0
+
+    def test_calls_the_api_on_an_index_miss(self, mock_request, tmp_path):
+        index_path = str(tmp_path / "isbn.idx")
+        write_isbn_index([], index_path)
+        with IsbnIndex(index_path) as index:
+            client = BooksApiClient(index=index)
+            assert client.get_book_by_isbn("9780753820162")["id"] == "pMyoPwAACAAJ"
+        assert mock_request.call_count == 1
+
+
+@pytest.fixture
+def lookup_cache(tmp_path):
+    cache = LookupCache(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+@patch(
+    "src.tome_tracker.api_utils.requests.Session.get", side_effect=mocked_requests_get
+)
+class TestLookupCache:
+    def test_repeat_lookups_are_served_from_the_cache(self, mock_request, lookup_cache):
+        client = BooksApiClient(cache=lookup_cache)
+        first = client.get_book_by_isbn("9780575094147")
+        second = client.get_book_by_isbn("9780575094147")
+        assert first == second
+        assert mock_request.call_count == 2
+        assert lookup_cache.stats() == {"hits": 2, "misses": 2, "entries": 2}
+
+    def test_caches_isbns_with_no_match(self, mock_request, lookup_cache):
+        client = BooksApiClient(cache=lookup_cache)
+        for _ in range(2):
+            with pytest.raises(NoMatchingISBN):
+                client.get_volume_id_by_isbn("1234")
+        assert mock_request.call_count == 1
+
+    def test_does_not_cache_http_errors(self, mock_request, lookup_cache):
+        client = BooksApiClient(cache=lookup_cache)
+        for _ in range(2):
+            with pytest.raises(HTTPError):
+                client.get_volume_id_by_isbn("network_failure")
+        assert mock_request.call_count == 2
+
+    def test_refetches_stale_entries(self, mock_request, tmp_path):
+        cache = LookupCache(str(tmp_path / "cache.sqlite3"), ttl=0)
+        client = BooksApiClient(cache=cache)
+        client.get_volume_id_by_isbn("9780575094147")
+        client.get_volume_id_by_isbn("9780575094147")
+        assert mock_request.call_count == 2
+
+    def test_serves_stale_entries_while_the_api_is_unreachable(
+        self, mock_request, tmp_path
+    ):
+        cache = LookupCache(str(tmp_path / "cache.sqlite3"), ttl=0)
+        client = BooksApiClient(cache=cache)
+        expected = client.get_book_by_isbn("9780575094147")
+        mock_request.side_effect = ConnectionError()
+        assert client.get_book_by_isbn("9780575094147") == expected
+
+    def test_raises_when_the_api_is_unreachable_and_nothing_is_cached(
+        self, mock_request, lookup_cache
+    ):
+        mock_request.side_effect = ConnectionError()
+        client = BooksApiClient(cache=lookup_cache)
+        with pytest.raises(ConnectionError):
+            client.get_volume_id_by_isbn("9780575094147")
+
+    def test_evicts_least_recently_used_entries(self, mock_request, tmp_path):
+        cache = LookupCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+        cache.set_volume_id("a", "1")
+        cache.set_volume_id("b", "2")
+        cache.get_volume_id("a")
+        cache.set_volume_id("c", "3")
+        assert cache.get_volume_id("a") == (True, "1")
+        assert cache.get_volume_id("b") == (False, None)
+        assert cache.get_volume_id("c") == (True, "3")
+
+    def test_tracks_the_entry_count_across_sessions(self, mock_request, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        LookupCache(path).set_volume_id("a", "1")
+        cache = LookupCache(path, max_entries=2)
+        for _ in range(3):
+            cache.set_volume_id("b", "2")
+        assert cache.entries == 2
+        assert cache.get_volume_id("a") == (True, "1")
+        cache.set_volume_id("c", "3")
+        assert cache.entries == 2
+        assert cache.get_volume_id("b") == (False, None)
+        assert cache.stats()["entries"] == 2
+
+    def test_buffers_access_times_of_hits(self, mock_request, tmp_path):
+        cache = LookupCache(str(tmp_path / "cache.sqlite3"), touch_batch_size=2)
+        cache.set_volume_id("a", "1")
+        cache.set_volume_id("b", "2")
+        changes = cache.conn.total_changes
+        cache.get_volume_id("a")
+        cache.get_volume_id("a")
+        assert cache.conn.total_changes == changes
+        cache.get_volume_id("b")
+        assert cache.conn.total_changes == changes + 2
+        assert cache.touched == {}
+
+    def test_writes_buffered_access_times_on_close(self, mock_request, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        cache = LookupCache(path)
+        cache.set_volume_id("a", "1")
+        cache.set_volume_id("b", "2")
+        cache.get_volume_id("a")
+        cache.close()
+        cache = LookupCache(path, max_entries=2)
+        cache.set_volume_id("c", "3")
+        assert cache.get_volume_id("a") == (True, "1")
+        assert cache.get_volume_id("b") == (False, None)
+
+    def test_persists_entries_on_disk(self, mock_request, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        BooksApiClient(cache=LookupCache(path)).get_volume_id_by_isbn("0575094141")
+        client = BooksApiClient(cache=LookupCache(path))
+        assert client.get_volume_id_by_isbn("0575094141") == "qm2PPwAACAAJ"
+        assert mock_request.call_count == 1
+
+
+def mocked_failing_requests_get(*failures):
+    """Fails with each of the passed status codes or exceptions in turn, then succeeds."""
+    remaining = list(failures)
+
+    class MockErrorResponse:
+        def __init__(self, status_code, headers):
+            self.status_code = status_code
+            self.headers = headers
+
+    def side_effect(*args, **kwargs):
+        if remaining:
+            failure = remaining.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            status_code, headers = failure
+            return MockErrorResponse(status_code, headers)
+        return mocked_requests_get(*args, **kwargs)
+
+    return side_effect
+
+
+class TestRateLimiter:
+    def test_allows_a_burst_then_throttles(self):
+        limiter = RateLimiter(rate=100, burst=2)
+        assert limiter.reserve() == 0
+        assert limiter.reserve() == 0
+        assert limiter.reserve() == pytest.approx(0.01, abs=0.005)
+        assert limiter.metrics()["requests"] == 3
+        assert limiter.metrics()["throttled"] == 1
+
+    def test_pausing_delays_every_caller(self):
+        limiter = RateLimiter(rate=100, burst=5)
+        limiter.pause(2)
+        assert limiter.reserve() == pytest.approx(2.01, abs=0.005)
+        assert limiter.metrics()["throttle_delay"] == pytest.approx(2.01, abs=0.005)
+
+    def test_pausing_after_idling_waits_the_full_pause(self):
+        with patch("src.tome_tracker.api_utils.time.monotonic") as clock:
+            clock.return_value = 100.0
+            limiter = RateLimiter(rate=1, burst=1)
+            assert limiter.reserve() == 0
+            clock.return_value = 102.0
+            limiter.pause(3)
+            assert limiter.reserve() == pytest.approx(4)
+
+
+class TestRetryPolicy:
+    def test_backoff_is_jittered_and_exponential(self):
+        retry = RetryPolicy(max_attempts=10, base_delay=1, max_delay=5)
+        for attempt, ceiling in [(1, 1), (2, 2), (3, 4), (4, 5), (9, 5)]:
+            assert 0 <= retry.get_delay(attempt) <= ceiling
+
+    def test_honours_retry_after_in_seconds(self):
+        assert RetryPolicy().get_delay(1, "7") == 7
+
+    def test_honours_retry_after_as_a_date(self):
+        retry_at = time.time() + 10
+        header = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(retry_at))
+        assert RetryPolicy().get_delay(1, header) == pytest.approx(10, abs=1.5)
+
+    def test_gives_up_after_max_attempts(self):
+        assert RetryPolicy(max_attempts=3).get_delay(3) is None
+
+    def test_gives_up_if_retry_after_exceeds_max_delay(self):
+        assert RetryPolicy(max_delay=5).get_delay(1, "60") is None
+
+    def test_counts_retries_and_delay(self):
+        retry = RetryPolicy()
+        retry.get_delay(1, "1")
+        retry.get_delay(2, "2")
+        assert retry.metrics() == {"retries": 2, "retry_delay": 3}
+
+
+@patch("src.tome_tracker.api_utils.time.sleep")
+@patch("src.tome_tracker.api_utils.requests.Session.get")
+class TestClientRetries:
+    def test_retries_transient_server_errors(self, mock_request, mock_sleep):
+        mock_request.side_effect = mocked_failing_requests_get((503, {}), (500, {}))
+        client = BooksApiClient(retry=RetryPolicy())
+        assert client.get_volume_id_by_isbn("0575094141") == "qm2PPwAACAAJ"
+        assert mock_request.call_count == 3
+        assert client.metrics()["retries"] == 2
+
+    def test_retries_connection_failures(self, mock_request, mock_sleep):
+        mock_request.side_effect = mocked_failing_requests_get(ConnectionError())
+        client = BooksApiClient(retry=RetryPolicy())
+        assert client.get_volume_id_by_isbn("0575094141") == "qm2PPwAACAAJ"
+
+    def test_waits_for_retry_after_and_pauses_rate_limiter(
+        self, mock_request, mock_sleep
+    ):
+        mock_request.side_effect = mocked_failing_requests_get(
+            (429, {"Retry-After": "3"})
+        )
+        limiter = RateLimiter(rate=100, burst=100)
+        client = BooksApiClient(rate_limiter=limiter, retry=RetryPolicy())
+        client.get_volume_id_by_isbn("0575094141")
+        assert call(3) in mock_sleep.call_args_list
+        assert limiter.metrics()["throttled"] == 1
+        assert limiter.metrics()["throttle_delay"] == pytest.approx(3, abs=0.1)
+
+    def test_raises_http_error_once_attempts_are_exhausted(
+        self, mock_request, mock_sleep
+    ):
+        mock_request.side_effect = mocked_failing_requests_get(*[(503, {})] * 3)
+        client = BooksApiClient(retry=RetryPolicy(max_attempts=3))
+        with pytest.raises(HTTPError):
+            client.get_volume_id_by_isbn("0575094141")
+        assert mock_request.call_count == 3
+
+    def test_does_not_retry_client_errors(self, mock_request, mock_sleep):
+        mock_request.side_effect = mocked_requests_get
+        client = BooksApiClient(retry=RetryPolicy())
+        with pytest.raises(HTTPError):
+            client.get_volume_id_by_isbn("network_failure")
+        assert mock_request.call_count == 1
+
+    def test_does_not_retry_without_a_retry_policy(self, mock_request, mock_sleep):
+        mock_request.side_effect = mocked_failing_requests_get((503, {}))
+        with pytest.raises(HTTPError):
+            BooksApiClient().get_volume_id_by_isbn("0575094141")
+
+
+class TestSingleFlight:
+    def call_concurrently(self, function, count=8):
+        barrier = threading.Barrier(count)
+        results = [None] * count
+
+        def worker(position):
+            barrier.wait()
+            try:
+                results[position] = function()
+            except Exception as error:
+                results[position] = error
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = 0
+
+        def slow_lookup():
+            nonlocal calls
+            calls += 1
+            time.sleep(0.1)
+            return "qm2PPwAACAAJ"
+
+        results = self.call_concurrently(lambda: flight.do("key", slow_lookup))
+        assert results == ["qm2PPwAACAAJ"] * 8
+        assert calls == 1
+
+    def test_concurrent_callers_share_one_exception(self):
+        flight = SingleFlight()
+        calls = 0
+
+        def failing_lookup():
+            nonlocal calls
+            calls += 1
+            time.sleep(0.1)
+            raise NoMatchingISBN()
+
+        results = self.call_concurrently(lambda: flight.do("key", failing_lookup))
+        assert all(isinstance(result, NoMatchingISBN) for result in results)
+        assert calls == 1
+
+    def test_calls_again_once_the_previous_call_completes(self):
+        flight = SingleFlight()
+        assert flight.do("key", lambda: 1) == 1
+        assert flight.do("key", lambda: 2) == 2
+
+    @patch("src.tome_tracker.api_utils.requests.Session.get")
+    def test_client_coalesces_concurrent_lookups(self, mock_request):
+        def slow_request(*args, **kwargs):
+            time.sleep(0.1)
+            return mocked_requests_get(*args, **kwargs)
+
+        mock_request.side_effect = slow_request
+        client = BooksApiClient()
+        results = self.call_concurrently(
+            lambda: client.get_book_by_isbn("9780753820162")
+        )
+        assert all(result["id"] == "pMyoPwAACAAJ" for result in results)
+        assert mock_request.call_count == 1
+
+
+class TestAsyncSingleFlight:
+    def test_concurrent_callers_share_one_call(self):
+        flight = AsyncSingleFlight()
+        calls = 0
+
+        async def slow_lookup():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "qm2PPwAACAAJ"
+
+        async def run():
+            return await asyncio.gather(
+                *(flight.do("key", slow_lookup) for _ in range(8))
+            )
+
+        assert asyncio.run(run()) == ["qm2PPwAACAAJ"] * 8
+        assert calls == 1
+
+    def test_concurrent_callers_share_one_exception(self):
+        flight = AsyncSingleFlight()
+
+        async def failing_lookup():
+            await asyncio.sleep(0.05)
+            raise NoMatchingISBN()
+
+        async def run():
+            return await asyncio.gather(
+                *(flight.do("key", failing_lookup) for _ in range(3)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+        assert all(isinstance(result, NoMatchingISBN) for result in results)
+
+    def test_cancelling_one_caller_leaves_the_others_running(self):
+        flight = AsyncSingleFlight()
+
+        async def slow_lookup():
+            await asyncio.sleep(0.05)
+            return "qm2PPwAACAAJ"
+
+        async def run():
+            first = asyncio.create_task(flight.do("key", slow_lookup))
+            second = asyncio.create_task(flight.do("key", slow_lookup))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(run()) == "qm2PPwAACAAJ"
+
+    def test_cancelling_every_caller_cancels_the_shared_call(self):
+        flight = AsyncSingleFlight()
+        cancelled = False
+
+        async def slow_lookup():
+            nonlocal cancelled
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+
+        async def run():
+            callers = [
+                asyncio.create_task(flight.do("key", slow_lookup)) for _ in range(2)
+            ]
+            await asyncio.sleep(0.01)
+            for caller in callers:
+                caller.cancel()
+            await asyncio.gather(*callers, return_exceptions=True)
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        assert cancelled
+        assert flight.calls == {}
+
+    def test_client_coalesces_concurrent_lookups(self):
+        requests_made = 0
+
+        async def handler(request):
+            nonlocal requests_made
+            requests_made += 1
+            await asyncio.sleep(0.05)
+            response = mocked_requests_get(str(request.url))
+            return httpx.Response(response.status_code, json=response.json_data)
+
+        async def run():
+            async with AsyncBooksApiClient(
+                transport=httpx.MockTransport(handler)
+            ) as client:
+                return await asyncio.gather(
+                    *(client.get_book_by_isbn("9780753820162") for _ in range(5))
+                )
+
+        results = asyncio.run(run())
+        assert all(result["id"] == "pMyoPwAACAAJ" for result in results)
+        assert requests_made == 1
+
+
+def mocked_async_transport(delay: float = 0):
+    async def handler(request):
+        await asyncio.sleep(delay)
+        response = mocked_requests_get(str(request.url))
+        if response.json_data is None:
+            return httpx.Response(response.status_code)
+        return httpx.Response(response.status_code, json=response.json_data)
+
+    return httpx.MockTransport(handler)
+
+
+class TestAsyncBooksApiClient:
+    def run_with_client(self, method, *args, transport=None, **client_kwargs):
+        async def run():
+            async with AsyncBooksApiClient(
+                transport=transport or mocked_async_transport(), **client_kwargs
+            ) as client:
+                return await getattr(client, method)(*args)
+
+        return asyncio.run(run())
+
+    @patch(
+        "src.tome_tracker.api_utils.requests.Session.get",
+        side_effect=mocked_requests_get,
+    )
+    def test_returns_the_same_book_info_as_the_sync_client(self, mock_request):
+        expected = BooksApiClient().get_book_by_isbn("9780575094147")
+        assert self.run_with_client("get_book_by_isbn", "9780575094147") == expected
+
+    def test_returns_volume_id_given_correct_isbn(self):
+        assert (
+            self.run_with_client("get_volume_id_by_isbn", "0575094141")
+            == "qm2PPwAACAAJ"
+        )
+
+    def test_raises_no_matching_isbn_error_given_incorrect_isbn(self):
+        with pytest.raises(NoMatchingISBN):
+            self.run_with_client("get_volume_id_by_isbn", "1234")
+
+    def test_raises_http_error_on_a_bad_request(self):
+        with pytest.raises(HTTPError):
+            self.run_with_client("get_book_by_volume_id", "network_failure")
+
+    def test_raises_timeout_error_on_a_slow_request(self):
+        with pytest.raises(TimeoutError):
+            self.run_with_client(
+                "get_volume_id_by_isbn",
+                "0575094141",
+                transport=mocked_async_transport(delay=1),
+                timeout=0.05,
+            )
+
+    def test_batch_returns_results_and_errors_in_input_order(self):
+        isbns = ["1234", "9780575094147", "network_failure"]
+        results = self.run_with_client("get_books_by_isbns", isbns)
+        assert [result.isbn for result in results] == isbns
+        assert isinstance(results[0].error, NoMatchingISBN)
+        assert results[1].book_info["title"] == "The Forever War"
+        assert isinstance(results[2].error, HTTPError)
+
+    def test_batch_limits_requests_in_flight_to_max_concurrency(self):
+        active = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            response = mocked_requests_get(str(request.url))
+            return httpx.Response(response.status_code, json=response.json_data)
+
+        self.run_with_client(
+            "get_books_by_isbns",
+            ["9780575094147"] * 10,
+            transport=httpx.MockTransport(handler),
+            max_concurrency=2,
+        )
+        assert peak <= 2
+
+    def test_retries_transient_server_errors(self):
+        failures = [503, 429]
+
+        async def handler(request):
+            if failures:
+                return httpx.Response(failures.pop(0), headers={"Retry-After": "0"})
+            response = mocked_requests_get(str(request.url))
+            return httpx.Response(response.status_code, json=response.json_data)
+
+        assert (
+            self.run_with_client(
+                "get_volume_id_by_isbn",
+                "0575094141",
+                transport=httpx.MockTransport(handler),
+                retry=RetryPolicy(),
+            )
+            == "qm2PPwAACAAJ"
+        )
+        assert not failures
+
+    def test_cancelling_a_batch_cancels_outstanding_lookups(self):
+        async def run():
+            async with AsyncBooksApiClient(
+                transport=mocked_async_transport(delay=1)
+            ) as client:
+                task = asyncio.create_task(
+                    client.get_books_by_isbns(["9780575094147"] * 5)
+                )
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                return asyncio.all_tasks()
+
+        remaining = asyncio.run(run())
+        assert len(remaining) == 1
+
+
 class TestCleanBookInfo:
     def test_returns_dict_unchanged_given_full_date_info(self):
         book_info = {
@@ -298,3 +1075,29 @@ class TestCleanBookInfo:
             "authors": ["Jane Doe", "David Z. Albert"],
         }
         assert clean_book_info(book_info) == expected
+
+    def test_discards_dates_in_an_unrecognised_format(self):
+        for date in ["March 2004", "2004-1-", "2004-115", "c. 1990"]:
+            book_info = {"publishedDate": date, "authors": []}
+            assert clean_book_info(book_info)["publishedDate"] is None
+
+
+class TestCleanBookInfos:
+    def test_cleans_every_record_in_order(self):
+        records = [
+            {"id": "a", "publishedDate": "2004-1-5", "authors": ["jane doe"]},
+            {"id": "b", "publishedDate": None, "authors": []},
+            {"id": "c", "publishedDate": "1862", "authors": ["VICTOR HUGO"]},
+        ]
+        expected = [
+            {"id": "a", "publishedDate": "2004-01-05", "authors": ["Jane Doe"]},
+            {"id": "b", "publishedDate": None, "authors": []},
+            {"id": "c", "publishedDate": "1862-01-01", "authors": ["Victor Hugo"]},
+        ]
+        assert clean_book_infos(records) == expected
+
+    def test_matches_clean_book_info(self):
+        dates = ["2010", "2010-03", "2010-3", "2010-3-4", "2010-03-4", "2010-3-14"]
+        records = [{"publishedDate": d, "authors": ["a b"]} for d in dates]
+        expected = [clean_book_info(dict(record)) for record in records]
+        assert clean_book_infos(records) == expected
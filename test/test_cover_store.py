@@ -0,0 +1,128 @@
+import hashlib
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+from requests.exceptions import ConnectionError
+
+from src.tome_tracker.cover_store import CoverStore
+
+FOREVER_WAR_COVER = "http://books.google.com/books/content?id=qm2PPwAACAAJ"
+MEDITATIONS_COVER = "http://books.google.com/books/content?id=pMyoPwAACAAJ"
+CIRCE_COVER = "http://books.google.com/books/content?id=d6kyEAAAQBAJ"
+TIME_AND_CHANCE_COVER = "http://books.google.com/books/content?id=lnlAnwEACAAJ"
+
+
+def mocked_requests_get(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, content, status_code):
+            self.content = content
+            self.status_code = status_code
+
+    if args[0] == FOREVER_WAR_COVER:
+        return MockResponse(b"forever war cover", 200)
+    elif args[0] == MEDITATIONS_COVER:
+        return MockResponse(b"meditations cover", 200)
+    elif args[0] == CIRCE_COVER:
+        return MockResponse(b"forever war cover", 200)
+    elif args[0] == TIME_AND_CHANCE_COVER:
+        return MockResponse(b"time and chance cover", 200)
+    elif args[0] == "network_failure":
+        raise ConnectionError()
+
+    return MockResponse(b"", 404)
+
+
+@pytest.fixture
+def cover_store(tmp_path):
+    with CoverStore(str(tmp_path / "covers")) as store:
+        yield store
+
+
+@patch(
+    "src.tome_tracker.cover_store.requests.Session.get",
+    side_effect=mocked_requests_get,
+)
+class TestCoverStore:
+    def test_prefetch_downloads_cover_in_the_background(
+        self, mock_request, cover_store
+    ):
+        path = cover_store.prefetch(FOREVER_WAR_COVER).result()
+        assert cover_store.get_cover_path(FOREVER_WAR_COVER) == path
+        assert cover_store.get_cover_bytes(FOREVER_WAR_COVER) == b"forever war cover"
+
+    def test_stores_covers_under_a_hash_of_their_content(
+        self, mock_request, cover_store
+    ):
+        forever_war = cover_store.prefetch(FOREVER_WAR_COVER).result()
+        circe = cover_store.prefetch(CIRCE_COVER).result()
+        assert forever_war == circe
+        digest = hashlib.sha256(b"forever war cover").hexdigest()
+        assert os.path.basename(forever_war) == digest
+
+    def test_does_not_download_stored_covers_again(self, mock_request, cover_store):
+        cover_store.prefetch(FOREVER_WAR_COVER).result()
+        assert cover_store.prefetch(FOREVER_WAR_COVER) is None
+        assert mock_request.call_count == 1
+
+    def test_returns_none_for_covers_not_downloaded(self, mock_request, cover_store):
+        assert cover_store.get_cover_path(FOREVER_WAR_COVER) is None
+        assert cover_store.get_cover_bytes(FOREVER_WAR_COVER) is None
+        assert cover_store.get_cover_path(None) is None
+        assert mock_request.call_count == 0
+
+    def test_ignores_failed_downloads(self, mock_request, cover_store):
+        assert cover_store.prefetch("missing_cover").result() is None
+        assert cover_store.prefetch("network_failure").result() is None
+        assert cover_store.get_cover_path("missing_cover") is None
+
+    def test_ignores_books_without_a_thumbnail(self, mock_request, cover_store):
+        assert cover_store.prefetch(None) is None
+
+    def test_evicts_least_recently_used_covers_past_max_bytes(
+        self, mock_request, tmp_path
+    ):
+        with CoverStore(str(tmp_path / "covers"), max_bytes=40) as store:
+            forever_war = store.prefetch(FOREVER_WAR_COVER).result()
+            store.prefetch(MEDITATIONS_COVER).result()
+            store.get_cover_path(FOREVER_WAR_COVER)
+            store.prefetch(TIME_AND_CHANCE_COVER).result()
+            assert store.get_cover_path(FOREVER_WAR_COVER) == forever_war
+            assert store.get_cover_path(MEDITATIONS_COVER) is None
+            assert store.get_cover_path(TIME_AND_CHANCE_COVER) is not None
+
+    def test_keeps_covers_evicted_while_a_duplicate_downloads(
+        self, mock_request, cover_store
+    ):
+        path = cover_store.prefetch(FOREVER_WAR_COVER).result()
+        lock = cover_store.lock
+
+        class EvictingLock:
+            """Evicts the stored cover just before the download thread first takes the lock, as another download might."""
+
+            evicted = False
+
+            def __enter__(self):
+                if not self.evicted and threading.current_thread().name.startswith(
+                    "covers"
+                ):
+                    self.evicted = True
+                    with lock:
+                        cover_store.conn.execute("DELETE FROM covers")
+                        os.remove(path)
+                return lock.__enter__()
+
+            def __exit__(self, *exc_info):
+                return lock.__exit__(*exc_info)
+
+        cover_store.lock = EvictingLock()
+        assert cover_store.prefetch(CIRCE_COVER).result() == path
+        assert cover_store.get_cover_bytes(CIRCE_COVER) == b"forever war cover"
+
+    def test_persists_covers_between_sessions(self, mock_request, tmp_path):
+        directory = str(tmp_path / "covers")
+        with CoverStore(directory) as store:
+            store.prefetch(MEDITATIONS_COVER)
+        with CoverStore(directory) as store:
+            assert store.get_cover_bytes(MEDITATIONS_COVER) == b"meditations cover"
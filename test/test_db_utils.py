@@ -1,14 +1,42 @@
+import asyncio
 import datetime
+import inspect
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from unittest.mock import patch
 
 import psycopg
 import pytest
 
 from src.tome_tracker.db_utils import (
+    BOOK_COLUMNS,
+    MIGRATIONS,
+    SQLITE_MIGRATIONS,
+    AsyncBookRepository,
+    BookRepository,
+    SqliteBookRepository,
     add_book_to_db,
+    add_books_to_db,
     check_if_book_in_db,
+    close_repositories,
     create_books_table,
     delete_book_from_db,
+    encode_cursor,
+    find_books_in_db,
+    find_similar_titles,
+    fts5_query,
+    get_library_stats,
+    get_repository,
+    iter_books_in_db,
     list_books_in_db,
+    list_books_page,
+    migrate_db,
+    page_query,
+    search_books,
+    title_similarity,
     update_book_in_db,
 )
 
@@ -80,12 +108,31 @@ TIME_AND_CHANCE_INFO = {
 }
 
 
+def pytest_generate_tests(metafunc):
+    # Tests run against every storage backend, unless marked with the backends they need
+    marker = metafunc.definition.get_closest_marker("backends")
+    backends = marker.args if marker is not None else ("postgres", "sqlite")
+    metafunc.parametrize("backend", backends, indirect=True)
+
+
 @pytest.fixture(autouse=True)
-def clean_test_db():
-    with psycopg.connect(f"dbname={DBNAME}") as conn:
-        conn.execute("""
-            DROP TABLE IF EXISTS books;
-        """)
+def backend(request, monkeypatch, tmp_path):
+    monkeypatch.setenv("TOME_TRACKER_BACKEND", request.param)
+    monkeypatch.setenv("TOME_TRACKER_SQLITE_DIR", str(tmp_path))
+    yield request.param
+    close_repositories()
+
+
+@pytest.fixture(autouse=True)
+def clean_test_db(backend):
+    # SQLite databases start empty in a fresh temporary directory
+    if backend == "postgres":
+        with psycopg.connect(f"dbname={DBNAME}") as conn:
+            conn.execute("""
+                DROP TABLE IF EXISTS books;
+                DROP TABLE IF EXISTS book_stats;
+                DROP TABLE IF EXISTS schema_version;
+            """)
 
 
 @pytest.fixture
@@ -93,18 +140,59 @@ def table_creation():
     create_books_table(DBNAME)
 
 
+def sqlite_path() -> str:
+    return os.path.join(os.environ["TOME_TRACKER_SQLITE_DIR"], f"{DBNAME}.sqlite3")
+
+
+def open_test_repository(
+    backend: str, **options
+) -> BookRepository | SqliteBookRepository:
+    # `options` are only passed to PostgreSQL repositories, e.g. pool sizes, as SQLite shares one connection
+    if backend == "postgres":
+        return BookRepository(DBNAME, **options)
+    return SqliteBookRepository(sqlite_path())
+
+
+def query_db(backend: str, query: str, params: tuple | None = None) -> list[tuple]:
+    # Runs a query on the test database directly, committing any changes
+    # Without parameters, PostgreSQL queries may hold several statements
+    if backend == "postgres":
+        with psycopg.connect(f"dbname={DBNAME}") as conn:
+            cur = conn.execute(query, params)
+            return cur.fetchall() if cur.description else []
+    with closing(sqlite3.connect(sqlite_path())) as conn, conn:
+        return conn.execute(query, params or ()).fetchall()
+
+
+def table_columns(backend: str, table: str) -> list[str]:
+    if backend == "postgres":
+        query = """
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s
+            ORDER BY ordinal_position
+        """
+    else:
+        query = "SELECT name FROM pragma_table_info(?) ORDER BY cid"
+    return [row[0] for row in query_db(backend, query, (table,))]
+
+
+def index_names(backend: str, table: str) -> set[str]:
+    if backend == "postgres":
+        query = "SELECT indexname FROM pg_indexes WHERE tablename = %s"
+    else:
+        query = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?"
+    return {row[0] for row in query_db(backend, query, (table,))}
+
+
+def stored_books() -> list[dict]:
+    # Read through the repository, so that both backends return the same types
+    return list(iter_books_in_db(DBNAME, columns=BOOK_COLUMNS))
+
+
 class TestCreateBooksTable:
-    def test_creates_table_with_correct_name_and_columns(self):
+    def test_creates_table_with_correct_name_and_columns(self, backend):
         create_books_table(DBNAME)
-        with psycopg.connect(f"dbname={DBNAME}") as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT
-                        *
-                    FROM
-                        books;
-                """)
-                actual_columns = [col.name for col in cur.description]
+        actual_columns = table_columns(backend, "books")
         expected_columns = [
             "id",
             "etag",
@@ -123,37 +211,82 @@ class TestCreateBooksTable:
             "read",
             "added",
         ]
+        # PostgreSQL keeps its full-text index in the table, where SQLite uses an FTS5 table
+        if backend == "postgres":
+            expected_columns.append("search_vector")
         assert actual_columns == expected_columns
 
 
+class TestMigrateDB:
+    @pytest.fixture
+    def migrations(self, backend) -> list:
+        return MIGRATIONS if backend == "postgres" else SQLITE_MIGRATIONS
+
+    def test_applies_all_migrations_in_order(self, backend, migrations):
+        assert migrate_db(DBNAME) == len(migrations)
+        versions = query_db(
+            backend, "SELECT version FROM schema_version ORDER BY version;"
+        )
+        assert [version[0] for version in versions] == list(
+            range(1, len(migrations) + 1)
+        )
+
+    def test_is_idempotent(self, backend, migrations, table_creation):
+        add_book_to_db(DBNAME, CIRCE_INFO, True)
+        assert migrate_db(DBNAME) == len(migrations)
+        [(count,)] = query_db(backend, "SELECT COUNT(*) FROM schema_version;")
+        assert count == len(migrations)
+        assert list_books_in_db(DBNAME) == ["Circe"]
+
+    def test_adopts_a_books_table_created_before_migrations(self, backend, migrations):
+        # A PostgreSQL migration is one script, and a SQLite one a list of statements
+        first = [migrations[0]] if backend == "postgres" else migrations[0]
+        for statement in first:
+            query_db(backend, statement)
+        add_book_to_db(DBNAME, CIRCE_INFO, True)
+        assert migrate_db(DBNAME) == len(migrations)
+        assert list_books_in_db(DBNAME) == ["Circe"]
+
+    def test_creates_lookup_indexes(self, backend, table_creation):
+        expected = {
+            "books_isbn_10_idx",
+            "books_isbn_13_idx",
+            "books_title_id_idx",
+            "books_title_key_idx",
+            "books_read_title_key_idx",
+            "books_unread_title_key_idx",
+        }
+        # SQLite finds similar titles through an FTS5 table rather than an index
+        if backend == "postgres":
+            expected.add("books_title_trgm_idx")
+        assert index_names(backend, "books") >= expected
+
+
 class TestAddBookToDB:
     def test_adds_a_book_to_the_database(self, table_creation):
         response = add_book_to_db(DBNAME, MEDITATIONS_INFO, True)
 
-        with psycopg.connect(f"dbname={DBNAME}") as conn:
-            table_rows = conn.execute("""
-                SELECT * FROM books;
-                """).fetchall()
+        table_rows = stored_books()
 
         expected = [
-            (
-                "pMyoPwAACAAJ",
-                "WmUhbbR1UHg",
-                "https://www.googleapis.com/books/v1/volumes/pMyoPwAACAAJ",
-                "Meditations",
-                ["Marcus Aurelius"],
-                "Phoenix",
-                datetime.date(2004, 1, 1),
-                "A new translation of one of the most important texts of Western philosophy.",
-                200,
-                None,
-                "en",
-                "0753820161",
-                "9780753820162",
-                "http://books.google.com/books/content?id=pMyoPwAACAAJ&printsec=frontcover&img=1&zoom=1&imgtk=AFLRE70wIuIPNQ8IJVGr-Er8MuUwDiPJE4xvb1UtvG3CZPDojWA3H05h1OnRPYbFjglMyKYHMc3_wEZ0EDgstcqmXUI9EjstHgvcCrcGLCjCVpcRpuNsDyuMRAbsQSQ5PopjBnrvLVW7&source=gbs_api",
-                True,
-                datetime.date.today(),
-            )
+            {
+                "id": "pMyoPwAACAAJ",
+                "etag": "WmUhbbR1UHg",
+                "self_link": "https://www.googleapis.com/books/v1/volumes/pMyoPwAACAAJ",
+                "title": "Meditations",
+                "authors": ["Marcus Aurelius"],
+                "publisher": "Phoenix",
+                "published_date": datetime.date(2004, 1, 1),
+                "description": "A new translation of one of the most important texts of Western philosophy.",
+                "page_count": 200,
+                "categories": None,
+                "language": "en",
+                "isbn_10": "0753820161",
+                "isbn_13": "9780753820162",
+                "thumbnail": "http://books.google.com/books/content?id=pMyoPwAACAAJ&printsec=frontcover&img=1&zoom=1&imgtk=AFLRE70wIuIPNQ8IJVGr-Er8MuUwDiPJE4xvb1UtvG3CZPDojWA3H05h1OnRPYbFjglMyKYHMc3_wEZ0EDgstcqmXUI9EjstHgvcCrcGLCjCVpcRpuNsDyuMRAbsQSQ5PopjBnrvLVW7&source=gbs_api",
+                "read": True,
+                "added": datetime.date.today(),
+            }
         ]
         assert table_rows == expected
         assert response
@@ -162,35 +295,64 @@ class TestAddBookToDB:
         add_book_to_db(DBNAME, MEDITATIONS_INFO, True)
         response = add_book_to_db(DBNAME, MEDITATIONS_INFO, False)
 
-        with psycopg.connect(f"dbname={DBNAME}") as conn:
-            table_rows = conn.execute("""
-                SELECT * FROM books;
-                """).fetchall()
+        table_rows = stored_books()
 
         expected = [
-            (
-                "pMyoPwAACAAJ",
-                "WmUhbbR1UHg",
-                "https://www.googleapis.com/books/v1/volumes/pMyoPwAACAAJ",
-                "Meditations",
-                ["Marcus Aurelius"],
-                "Phoenix",
-                datetime.date(2004, 1, 1),
-                "A new translation of one of the most important texts of Western philosophy.",
-                200,
-                None,
-                "en",
-                "0753820161",
-                "9780753820162",
-                "http://books.google.com/books/content?id=pMyoPwAACAAJ&printsec=frontcover&img=1&zoom=1&imgtk=AFLRE70wIuIPNQ8IJVGr-Er8MuUwDiPJE4xvb1UtvG3CZPDojWA3H05h1OnRPYbFjglMyKYHMc3_wEZ0EDgstcqmXUI9EjstHgvcCrcGLCjCVpcRpuNsDyuMRAbsQSQ5PopjBnrvLVW7&source=gbs_api",
-                True,
-                datetime.date.today(),
-            )
+            {
+                "id": "pMyoPwAACAAJ",
+                "etag": "WmUhbbR1UHg",
+                "self_link": "https://www.googleapis.com/books/v1/volumes/pMyoPwAACAAJ",
+                "title": "Meditations",
+                "authors": ["Marcus Aurelius"],
+                "publisher": "Phoenix",
+                "published_date": datetime.date(2004, 1, 1),
+                "description": "A new translation of one of the most important texts of Western philosophy.",
+                "page_count": 200,
+                "categories": None,
+                "language": "en",
+                "isbn_10": "0753820161",
+                "isbn_13": "9780753820162",
+                "thumbnail": "http://books.google.com/books/content?id=pMyoPwAACAAJ&printsec=frontcover&img=1&zoom=1&imgtk=AFLRE70wIuIPNQ8IJVGr-Er8MuUwDiPJE4xvb1UtvG3CZPDojWA3H05h1OnRPYbFjglMyKYHMc3_wEZ0EDgstcqmXUI9EjstHgvcCrcGLCjCVpcRpuNsDyuMRAbsQSQ5PopjBnrvLVW7&source=gbs_api",
+                "read": True,
+                "added": datetime.date.today(),
+            }
         ]
         assert table_rows == expected
         assert not response
 
 
+class TestAddBooksToDB:
+    def test_adds_all_books_to_the_database(self, table_creation):
+        response = add_books_to_db(DBNAME, [MEDITATIONS_INFO, CIRCE_INFO], read=True)
+        assert response.inserted == [MEDITATIONS_INFO["id"], CIRCE_INFO["id"]]
+        assert response.duplicates == []
+        assert list_books_in_db(DBNAME, True) == ["Circe", "Meditations"]
+
+    def test_reports_books_already_in_database_as_duplicates(self, table_creation):
+        add_book_to_db(DBNAME, CIRCE_INFO, False)
+        response = add_books_to_db(DBNAME, [CIRCE_INFO, TIME_AND_CHANCE_INFO])
+        assert response.inserted == [TIME_AND_CHANCE_INFO["id"]]
+        assert response.duplicates == [CIRCE_INFO["id"]]
+        assert len(list_books_in_db(DBNAME)) == 2
+
+    def test_keeps_the_first_of_repeated_books(self, table_creation):
+        renamed = {**CIRCE_INFO, "title": "Circe (Reissue)"}
+        response = add_books_to_db(DBNAME, [CIRCE_INFO, renamed])
+        assert response.inserted == [CIRCE_INFO["id"]]
+        assert list_books_in_db(DBNAME) == ["Circe"]
+
+    def test_accepts_a_generator_of_books(self, table_creation):
+        books = (book for book in [MEDITATIONS_INFO, TIME_AND_CHANCE_INFO])
+        response = add_books_to_db(DBNAME, books)
+        assert len(response.inserted) == 2
+        assert list_books_in_db(DBNAME, False) == ["Meditations", "Time and Chance"]
+
+    def test_does_nothing_for_no_books(self, table_creation):
+        response = add_books_to_db(DBNAME, [])
+        assert response.inserted == []
+        assert response.duplicates == []
+
+
 class TestListBooksInDB:
     def test_returns_list_of_all_book_titles_in_db(self, table_creation):
         add_book_to_db(DBNAME, MEDITATIONS_INFO, True)
@@ -217,6 +379,141 @@ class TestListBooksInDB:
         assert actual == expected
 
 
+class TestListBooksPage:
+    @pytest.fixture(autouse=True)
+    def library(self, table_creation):
+        add_books_to_db(DBNAME, [MEDITATIONS_INFO, TIME_AND_CHANCE_INFO], True)
+        add_book_to_db(DBNAME, CIRCE_INFO, False)
+
+    def test_pages_through_all_books_in_title_order(self):
+        first = list_books_page(DBNAME, page_size=2)
+        second = list_books_page(DBNAME, page_size=2, cursor=first.next_cursor)
+        assert [book["title"] for book in first.books] == ["Circe", "Meditations"]
+        assert [book["title"] for book in second.books] == ["Time and Chance"]
+        assert second.next_cursor is None
+
+    def test_last_full_page_has_no_cursor(self):
+        page = list_books_page(DBNAME, page_size=3)
+        assert len(page.books) == 3
+        assert page.next_cursor is None
+
+    def test_filters_by_read_status(self):
+        page = list_books_page(DBNAME, read_status=True, page_size=1)
+        page = list_books_page(DBNAME, read_status=True, cursor=page.next_cursor)
+        assert [book["title"] for book in page.books] == ["Time and Chance"]
+
+    def test_returns_requested_columns(self):
+        page = list_books_page(DBNAME, columns=("authors", "read"))
+        assert page.books[0] == {
+            "id": CIRCE_INFO["id"],
+            "title": "Circe",
+            "authors": ["Madeline Miller"],
+            "read": False,
+        }
+
+    def test_is_not_shifted_by_books_deleted_between_pages(self):
+        first = list_books_page(DBNAME, page_size=2)
+        delete_book_from_db(DBNAME, title="Circe")
+        second = list_books_page(DBNAME, page_size=2, cursor=first.next_cursor)
+        assert [book["title"] for book in second.books] == ["Time and Chance"]
+
+    def test_pages_past_books_without_a_title(self):
+        add_books_to_db(
+            DBNAME,
+            [
+                {**CIRCE_INFO, "id": "untitled1", "title": None},
+                {**CIRCE_INFO, "id": "untitled2", "title": None},
+            ],
+        )
+        first = list_books_page(DBNAME, page_size=2)
+        second = list_books_page(DBNAME, page_size=2, cursor=first.next_cursor)
+        third = list_books_page(DBNAME, page_size=2, cursor=second.next_cursor)
+        assert [book["title"] for book in first.books] == [None, None]
+        assert [book["title"] for book in second.books + third.books] == [
+            "Circe",
+            "Meditations",
+            "Time and Chance",
+        ]
+        assert third.next_cursor is None
+
+    def test_pages_in_the_same_order_as_listings(self):
+        add_books_to_db(
+            DBNAME,
+            [
+                {**CIRCE_INFO, "id": "lower", "title": "circe"},
+                {**CIRCE_INFO, "id": "accented", "title": "Éloge"},
+                {**CIRCE_INFO, "id": "untitled", "title": None},
+            ],
+        )
+        titles = []
+        cursor = None
+        while True:
+            page = list_books_page(DBNAME, page_size=2, cursor=cursor)
+            titles.extend(book["title"] for book in page.books)
+            if (cursor := page.next_cursor) is None:
+                break
+        assert titles[0] is None
+        assert sorted(titles[1:]) == [
+            "Circe",
+            "Meditations",
+            "Time and Chance",
+            "circe",
+            "Éloge",
+        ]
+        assert list_books_in_db(DBNAME) == titles
+
+    def test_rejects_unknown_columns(self):
+        with pytest.raises(ValueError):
+            list_books_page(DBNAME, columns=("title; DROP TABLE books",))
+
+    def test_rejects_malformed_cursors(self):
+        with pytest.raises(ValueError):
+            list_books_page(DBNAME, cursor="not a cursor")
+
+
+class TestIterBooksInDB:
+    def test_streams_all_books_in_title_order(self, table_creation):
+        add_books_to_db(DBNAME, [MEDITATIONS_INFO, CIRCE_INFO, TIME_AND_CHANCE_INFO])
+        books = iter_books_in_db(DBNAME, batch_size=2)
+        assert [book["title"] for book in books] == [
+            "Circe",
+            "Meditations",
+            "Time and Chance",
+        ]
+
+    def test_streams_books_without_a_title(self, table_creation):
+        add_books_to_db(
+            DBNAME,
+            [
+                MEDITATIONS_INFO,
+                {**CIRCE_INFO, "id": "untitled1", "title": None},
+                CIRCE_INFO,
+                {**CIRCE_INFO, "id": "untitled2", "title": None},
+                TIME_AND_CHANCE_INFO,
+            ],
+        )
+        books = list(iter_books_in_db(DBNAME, batch_size=2))
+        assert [book["id"] for book in books[:2]] == ["untitled1", "untitled2"]
+        assert len(books) == 5
+
+    def test_filters_by_read_status_and_returns_requested_columns(self, table_creation):
+        add_book_to_db(DBNAME, MEDITATIONS_INFO, True)
+        add_book_to_db(DBNAME, CIRCE_INFO, False)
+        books = list(iter_books_in_db(DBNAME, read_status=False, columns=("isbn_13",)))
+        assert books == [
+            {"id": CIRCE_INFO["id"], "title": "Circe", "isbn_13": "9781408890042"}
+        ]
+
+    def test_releases_its_connection_when_closed_early(self, backend):
+        with open_test_repository(backend, max_size=1, timeout=1) as repository:
+            repository.create_books_table()
+            repository.add_books([MEDITATIONS_INFO, CIRCE_INFO])
+            books = repository.iter_books(batch_size=1)
+            assert next(books)["title"] == "Circe"
+            books.close()
+            assert repository.list_books() == ["Circe", "Meditations"]
+
+
 class TestCheckIfBookInDB:
     def test_returns_true_if_book_id_is_in_database(self, table_creation):
         add_book_to_db(DBNAME, MEDITATIONS_INFO, True)
@@ -240,6 +537,90 @@ class TestCheckIfBookInDB:
         assert not check_if_book_in_db(DBNAME, isbn=MEDITATIONS_INFO["isbn_10"])
 
 
+class TestSearchBooks:
+    @pytest.fixture(autouse=True)
+    def library(self, table_creation):
+        add_books_to_db(DBNAME, [MEDITATIONS_INFO, CIRCE_INFO, TIME_AND_CHANCE_INFO])
+
+    def test_finds_books_by_title(self):
+        results = search_books(DBNAME, "meditations")
+        assert [book["title"] for book in results] == ["Meditations"]
+
+    def test_finds_books_by_author(self):
+        results = search_books(DBNAME, "Madeline Miller")
+        assert [book["title"] for book in results] == ["Circe"]
+
+    def test_finds_books_by_category(self):
+        results = search_books(DBNAME, "thermodynamics quantum")
+        assert [book["title"] for book in results] == ["Time and Chance"]
+
+    def test_finds_books_by_description(self):
+        results = search_books(DBNAME, "witchcraft")
+        assert [book["title"] for book in results] == ["Circe"]
+
+    def test_ranks_title_matches_above_description_matches(self):
+        add_book_to_db(
+            DBNAME,
+            {**MEDITATIONS_INFO, "id": "witch", "title": "Witchcraft", "isbn_10": None},
+            False,
+        )
+        results = search_books(DBNAME, "witchcraft")
+        assert [book["title"] for book in results] == ["Witchcraft", "Circe"]
+        assert results[0]["rank"] > results[1]["rank"]
+
+    def test_supports_excluded_terms(self):
+        results = search_books(DBNAME, "translation -philosophy")
+        assert results == []
+
+    def test_pages_through_results(self):
+        first = search_books(DBNAME, "book", limit=1)
+        second = search_books(DBNAME, "book", limit=1, offset=1)
+        assert len(first) == len(second) == 1
+        assert first[0]["id"] != second[0]["id"]
+
+    def test_returns_nothing_for_a_blank_query(self):
+        assert search_books(DBNAME, "  ") == []
+
+
+class TestFindBooksInDB:
+    def test_returns_stored_ids(self, table_creation):
+        add_books_to_db(DBNAME, [MEDITATIONS_INFO, CIRCE_INFO])
+        response = find_books_in_db(
+            DBNAME, volume_ids=[CIRCE_INFO["id"], TIME_AND_CHANCE_INFO["id"]]
+        )
+        assert response == {CIRCE_INFO["id"]}
+
+    def test_returns_stored_isbns(self, table_creation):
+        add_books_to_db(DBNAME, [MEDITATIONS_INFO, CIRCE_INFO])
+        response = find_books_in_db(
+            DBNAME,
+            isbns=[
+                MEDITATIONS_INFO["isbn_10"],
+                CIRCE_INFO["isbn_13"],
+                TIME_AND_CHANCE_INFO["isbn_13"],
+            ],
+        )
+        assert response == {MEDITATIONS_INFO["isbn_10"], CIRCE_INFO["isbn_13"]}
+
+    def test_checks_ids_and_isbns_together(self, table_creation):
+        add_books_to_db(DBNAME, [MEDITATIONS_INFO, CIRCE_INFO])
+        response = find_books_in_db(
+            DBNAME,
+            volume_ids=[MEDITATIONS_INFO["id"]],
+            isbns=[CIRCE_INFO["isbn_10"], TIME_AND_CHANCE_INFO["isbn_10"]],
+        )
+        assert response == {MEDITATIONS_INFO["id"], CIRCE_INFO["isbn_10"]}
+
+    def test_accepts_any_iterable(self, table_creation):
+        add_book_to_db(DBNAME, CIRCE_INFO, True)
+        isbns = (book["isbn_13"] for book in [CIRCE_INFO, MEDITATIONS_INFO])
+        assert find_books_in_db(DBNAME, isbns=isbns) == {CIRCE_INFO["isbn_13"]}
+
+    def test_returns_nothing_when_nothing_passed(self, table_creation):
+        add_book_to_db(DBNAME, CIRCE_INFO, True)
+        assert find_books_in_db(DBNAME) == set()
+
+
 class TestDeleteBookFromDB:
     def test_deletes_title_from_database_if_present(self, table_creation):
         add_book_to_db(DBNAME, MEDITATIONS_INFO, True)
@@ -272,6 +653,12 @@ class TestDeleteBookFromDB:
         assert not response_1
         assert not response_2
 
+    def test_does_nothing_if_neither_title_nor_isbn_passed(self, table_creation):
+        add_book_to_db(DBNAME, CIRCE_INFO, True)
+        response = delete_book_from_db(DBNAME)
+        assert len(list_books_in_db(DBNAME)) == 1
+        assert not response
+
 
 class TestUpdateBookInDB:
     def test_changes_an_unread_book_to_read(self, table_creation):
@@ -298,6 +685,23 @@ class TestUpdateBookInDB:
         assert len(list_books_in_db(DBNAME, False)) == 0
         assert not response
 
+    def test_finds_a_book_without_writing_it_if_not_toggling(
+        self, table_creation, backend
+    ):
+        add_book_to_db(DBNAME, CIRCE_INFO, True)
+
+        def row_version():
+            if backend == "sqlite":
+                return get_repository(DBNAME).conn.total_changes
+            with psycopg.connect(f"dbname={DBNAME}") as conn:
+                return conn.execute("SELECT xmin::text FROM books;").fetchone()
+
+        before = row_version()
+        assert update_book_in_db(DBNAME, CIRCE_INFO["title"], False)
+        assert not update_book_in_db(DBNAME, MEDITATIONS_INFO["title"], False)
+        assert row_version() == before
+        assert list_books_in_db(DBNAME, True) == ["Circe"]
+
     @pytest.mark.skip(
         reason="current implementation toggles read status, rather than setting it to a specific value"
     )
@@ -308,3 +712,712 @@ class TestUpdateBookInDB:
         update_book_in_db(DBNAME, MEDITATIONS_INFO["title"], True)
         assert len(list_books_in_db(DBNAME, True)) == 1
         assert len(list_books_in_db(DBNAME, False)) == 0
+
+
+class TestFindSimilarTitles:
+    @pytest.fixture
+    def library(self, table_creation):
+        add_books_to_db(DBNAME, [MEDITATIONS_INFO, CIRCE_INFO, TIME_AND_CHANCE_INFO])
+
+    def test_finds_a_misspelt_title(self, library):
+        matches = find_similar_titles(DBNAME, "Meditatons")
+        assert [match.title for match in matches] == ["Meditations"]
+        assert 0.3 < matches[0].similarity < 1
+
+    def test_ignores_case_and_missing_words(self, library):
+        matches = find_similar_titles(DBNAME, "time chance")
+        assert [match.title for match in matches] == ["Time and Chance"]
+
+    def test_scores_an_exact_title_as_identical(self, library):
+        assert find_similar_titles(DBNAME, "Circe")[0].similarity == pytest.approx(1)
+
+    def test_orders_matches_by_similarity(self, library):
+        add_book_to_db(DBNAME, {**CIRCE_INFO, "id": "circe2", "title": "Circe 2"}, True)
+        matches = find_similar_titles(DBNAME, "Circe")
+        assert [match.title for match in matches] == ["Circe", "Circe 2"]
+        assert find_similar_titles(DBNAME, "Circe", limit=1)[0].title == "Circe"
+
+    def test_leaves_out_titles_below_the_threshold(self, library):
+        assert find_similar_titles(DBNAME, "Odyssey") == []
+        assert find_similar_titles(DBNAME, "Meditatons", threshold=0.9) == []
+
+    def test_returns_nothing_for_a_blank_title(self, library):
+        assert find_similar_titles(DBNAME, "  ") == []
+
+    def test_follows_title_changes(self, library):
+        delete_book_from_db(DBNAME, title="Circe")
+        assert find_similar_titles(DBNAME, "Circe") == []
+
+
+class TestGetLibraryStats:
+    def test_is_empty_for_an_empty_library(self, table_creation):
+        stats = get_library_stats(DBNAME)
+        assert stats.total_books == 0
+        assert stats.read_books == 0
+        assert stats.unread_books == 0
+        assert stats.pages_read == 0
+        assert stats.authors == {}
+        assert stats.years == {}
+
+    def test_counts_added_books(self, table_creation):
+        add_book_to_db(DBNAME, MEDITATIONS_INFO, True)
+        add_books_to_db(DBNAME, [CIRCE_INFO, TIME_AND_CHANCE_INFO], False)
+        stats = get_library_stats(DBNAME)
+        assert stats.total_books == 3
+        assert stats.read_books == 1
+        assert stats.unread_books == 2
+        assert stats.pages_read == MEDITATIONS_INFO["pageCount"]
+        assert stats.authors == {
+            "David Z. ALBERT": 1,
+            "Madeline Miller": 1,
+            "Marcus Aurelius": 1,
+        }
+        assert stats.languages == {"en": 3}
+        assert stats.years == {"2003": 1, "2004": 1, "2019": 1}
+        assert stats.categories["Fiction / General"] == 1
+
+    def test_pads_early_years_to_four_digits(self, table_creation):
+        add_books_to_db(DBNAME, [{**CIRCE_INFO, "publishedDate": "0999-01-01"}])
+        assert get_library_stats(DBNAME).years == {"0999": 1}
+
+    def test_orders_values_by_number_of_books_and_limits_them(self, table_creation):
+        add_books_to_db(
+            DBNAME,
+            [
+                MEDITATIONS_INFO,
+                {**CIRCE_INFO, "authors": ["Marcus Aurelius"]},
+                TIME_AND_CHANCE_INFO,
+            ],
+            False,
+        )
+        stats = get_library_stats(DBNAME, top=1)
+        assert stats.authors == {"Marcus Aurelius": 2}
+        assert len(stats.categories) == 1
+
+    def test_follows_read_status_updates(self, table_creation):
+        add_book_to_db(DBNAME, CIRCE_INFO, False)
+        update_book_in_db(DBNAME, CIRCE_INFO["title"], True)
+        stats = get_library_stats(DBNAME)
+        assert stats.read_books == 1
+        assert stats.unread_books == 0
+        assert stats.pages_read == CIRCE_INFO["pageCount"]
+
+    def test_drops_values_without_books_after_deletion(self, table_creation):
+        add_book_to_db(DBNAME, MEDITATIONS_INFO, True)
+        add_book_to_db(DBNAME, CIRCE_INFO, False)
+        delete_book_from_db(DBNAME, title=MEDITATIONS_INFO["title"])
+        stats = get_library_stats(DBNAME)
+        assert stats.total_books == 1
+        assert stats.pages_read == 0
+        assert stats.authors == {"Madeline Miller": 1}
+        assert stats.years == {"2019": 1}
+
+    def test_migration_counts_books_already_stored(self, backend, table_creation):
+        add_book_to_db(DBNAME, MEDITATIONS_INFO, True)
+        add_book_to_db(DBNAME, CIRCE_INFO, False)
+        repository = get_repository(DBNAME)
+        if backend == "postgres":
+            connection = repository.pool.connection()
+            migrations = MIGRATIONS
+        else:
+            connection = repository.transaction()
+            migrations = SQLITE_MIGRATIONS
+        # Rolls the schema back to before the stats migration, which later migrations are applied again after
+        stats_version = next(
+            version
+            for version, migration in enumerate(migrations, start=1)
+            if "CREATE TABLE IF NOT EXISTS book_stats" in str(migration)
+        )
+        with connection as conn:
+            conn.execute("DELETE FROM book_stats")
+            conn.execute(f"DELETE FROM schema_version WHERE version >= {stats_version}")
+        migrate_db(DBNAME)
+        stats = get_library_stats(DBNAME)
+        assert stats.total_books == 2
+        assert stats.read_books == 1
+        assert stats.authors == {"Madeline Miller": 1, "Marcus Aurelius": 1}
+
+
+class TestBookRepository:
+    @pytest.mark.backends("postgres")
+    def test_context_manager_opens_and_closes_the_pool(self):
+        with BookRepository(DBNAME, min_size=1, max_size=2) as repository:
+            assert not repository.pool.closed
+            repository.create_books_table()
+            assert repository.add_book(CIRCE_INFO, True)
+        assert repository.pool.closed
+
+    @pytest.mark.backends("postgres")
+    def test_pool_is_bounded_by_max_size(self):
+        with BookRepository(DBNAME, min_size=1, max_size=2) as repository:
+            repository.create_books_table()
+            repository.add_book(CIRCE_INFO, True)
+            repository.add_book(MEDITATIONS_INFO, False)
+            for _ in range(10):
+                repository.list_books()
+                repository.has_book(title=CIRCE_INFO["title"])
+            assert repository.pool.get_stats()["pool_max"] == 2
+            assert repository.pool.get_stats()["pool_size"] <= 2
+
+    def test_module_functions_share_one_repository(self, table_creation):
+        add_book_to_db(DBNAME, CIRCE_INFO, True)
+        assert get_repository(DBNAME) is get_repository(DBNAME)
+        assert get_repository(DBNAME).has_book(volume_id=CIRCE_INFO["id"])
+
+    @pytest.mark.backends("postgres")
+    def test_replaces_broken_connections(self, table_creation):
+        repository = get_repository(DBNAME)
+        with repository.pool.connection() as conn:
+            conn.close()
+        assert repository.list_books() == []
+
+    def test_has_book_returns_false_without_search_terms(self, table_creation):
+        add_book_to_db(DBNAME, CIRCE_INFO, True)
+        assert not check_if_book_in_db(DBNAME)
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestCatalogueCache:
+    # SQLite has no catalogue cache, so there these check that its repository reads the same as a cached one
+    @pytest.fixture
+    def cached_repository(self, backend):
+        with open_test_repository(backend, cache=True) as repository:
+            repository.create_books_table()
+            yield repository
+
+    def test_loads_books_stored_before_it_started(self, backend, table_creation):
+        add_books_to_db(DBNAME, [MEDITATIONS_INFO, CIRCE_INFO])
+        with open_test_repository(backend, cache=True) as repository:
+            assert repository.list_books() == ["Circe", "Meditations"]
+            assert repository.has_book(isbn=CIRCE_INFO["isbn_13"])
+
+    def test_sees_its_own_writes_immediately(self, cached_repository):
+        assert not cached_repository.has_book(volume_id=CIRCE_INFO["id"])
+        cached_repository.add_book(CIRCE_INFO, False)
+        assert cached_repository.has_book(volume_id=CIRCE_INFO["id"])
+        cached_repository.update_book("Circe", True)
+        assert cached_repository.list_books(True) == ["Circe"]
+        cached_repository.delete_book(title="Circe")
+        assert cached_repository.list_books() == []
+
+    def test_sees_other_processes_writes(self, backend, cached_repository):
+        cached_repository.list_books()
+        with open_test_repository(backend) as other:
+            other.add_books([MEDITATIONS_INFO, CIRCE_INFO], True)
+            assert wait_for(lambda: len(cached_repository.list_books(True)) == 2)
+            other.update_book("Circe", True)
+            assert wait_for(lambda: cached_repository.list_books(False) == ["Circe"])
+            other.delete_book(isbn=MEDITATIONS_INFO["isbn_10"])
+            assert wait_for(lambda: not cached_repository.has_book(title="Meditations"))
+
+    @pytest.mark.backends("postgres")
+    def test_serves_reads_without_querying_the_database(self, cached_repository):
+        cached_repository.add_book(CIRCE_INFO, True)
+        with patch.object(
+            cached_repository.pool, "connection", side_effect=AssertionError
+        ):
+            assert cached_repository.has_book(title="Circe", isbn=CIRCE_INFO["isbn_10"])
+            assert not cached_repository.has_book(
+                title="Circe", isbn=MEDITATIONS_INFO["isbn_10"]
+            )
+            assert cached_repository.find_books(
+                volume_ids=[CIRCE_INFO["id"]], isbns=[MEDITATIONS_INFO["isbn_13"]]
+            ) == {CIRCE_INFO["id"]}
+            assert cached_repository.list_books(True) == ["Circe"]
+            page = cached_repository.list_books_page(columns=("read",))
+            assert page.books == [
+                {"id": CIRCE_INFO["id"], "title": "Circe", "read": True}
+            ]
+
+    def test_serves_pages_in_the_database_order(self, backend, cached_repository):
+        with open_test_repository(backend) as uncached:
+            uncached.add_books(
+                [
+                    MEDITATIONS_INFO,
+                    CIRCE_INFO,
+                    {**CIRCE_INFO, "id": "lower", "title": "circe"},
+                    {**CIRCE_INFO, "id": "accented", "title": "Éloge"},
+                    {**CIRCE_INFO, "id": "untitled", "title": None},
+                ],
+                True,
+            )
+            assert cached_repository.list_books() == uncached.list_books()
+            cached_books, cursor = [], None
+            while True:
+                page = cached_repository.list_books_page(page_size=2, cursor=cursor)
+                cached_books.extend(page.books)
+                if (cursor := page.next_cursor) is None:
+                    break
+            assert cached_books == uncached.list_books_page(page_size=10).books
+
+    def test_reads_other_columns_from_the_database(self, cached_repository):
+        cached_repository.add_book(CIRCE_INFO, False)
+        page = cached_repository.list_books_page(columns=("authors",))
+        assert page.books[0]["authors"] == ["Madeline Miller"]
+
+    def test_places_changed_books_in_the_database_order(
+        self, backend, cached_repository
+    ):
+        cached_repository.list_books()
+        with open_test_repository(backend) as uncached:
+            for title in ["Éloge", "circe", None, "Circe", "eloge", "Zadig"]:
+                uncached.add_book(
+                    {**CIRCE_INFO, "id": f"id {title}", "title": title}, False
+                )
+            uncached.delete_book(title="circe")
+            uncached.update_book("Zadig", True)
+            assert wait_for(
+                lambda: cached_repository.list_books() == uncached.list_books()
+            )
+            first = cached_repository.list_books_page(page_size=2)
+            second = cached_repository.list_books_page(cursor=first.next_cursor)
+            assert first.books + second.books == uncached.list_books_page().books
+
+    @pytest.mark.backends("postgres")
+    def test_reads_from_the_database_once_stopped(self, cached_repository):
+        cached_repository.list_books()
+        cached_repository.catalogue.stop()
+        with BookRepository(DBNAME) as uncached:
+            uncached.add_book(CIRCE_INFO, True)
+        assert cached_repository.cached_catalogue() is None
+        assert cached_repository.list_books() == ["Circe"]
+        assert cached_repository.has_book(title="Circe")
+
+
+# SQLite has no server-side prepared statements to inspect
+@pytest.mark.backends("postgres")
+class TestPreparedStatements:
+    def prepared_statements(self, repository: BookRepository) -> list[str]:
+        with repository.pool.connection() as conn:
+            response = conn.execute(
+                "SELECT statement FROM pg_prepared_statements;"
+            ).fetchall()
+        return [statement[0] for statement in response]
+
+    def test_prepares_statements_once_per_connection(self):
+        with BookRepository(DBNAME, max_size=1) as repository:
+            repository.create_books_table()
+            for book_info in [MEDITATIONS_INFO, CIRCE_INFO, TIME_AND_CHANCE_INFO]:
+                repository.add_book(book_info, True)
+                repository.update_book(book_info["title"], True)
+            statements = self.prepared_statements(repository)
+        assert sum("INSERT INTO books" in statement for statement in statements) == 1
+        assert sum("UPDATE" in statement for statement in statements) == 1
+
+    def test_does_not_prepare_statements_when_disabled(self):
+        with BookRepository(DBNAME, max_size=1, prepare=False) as repository:
+            repository.create_books_table()
+            for _ in range(10):
+                repository.add_book(CIRCE_INFO, True)
+            statements = self.prepared_statements(repository)
+        assert not any("INSERT INTO books" in statement for statement in statements)
+
+
+class TestConcurrentMutations:
+    def test_only_one_concurrent_add_of_the_same_book_succeeds(self, backend):
+        with open_test_repository(backend, max_size=8) as repository:
+            repository.create_books_table()
+            with ThreadPoolExecutor(16) as executor:
+                responses = list(
+                    executor.map(
+                        lambda _: repository.add_book(CIRCE_INFO, True), range(64)
+                    )
+                )
+            assert responses.count(True) == 1
+            assert repository.list_books() == ["Circe"]
+
+    def test_only_one_concurrent_delete_of_the_same_book_succeeds(self, backend):
+        with open_test_repository(backend, max_size=8) as repository:
+            repository.create_books_table()
+            repository.add_book(CIRCE_INFO, True)
+            with ThreadPoolExecutor(16) as executor:
+                responses = list(
+                    executor.map(
+                        lambda _: repository.delete_book(isbn=CIRCE_INFO["isbn_13"]),
+                        range(64),
+                    )
+                )
+            assert responses.count(True) == 1
+            assert repository.list_books() == []
+
+    def test_concurrent_toggles_are_not_lost(self, backend):
+        with open_test_repository(backend, max_size=8) as repository:
+            repository.create_books_table()
+            repository.add_book(CIRCE_INFO, True)
+            with ThreadPoolExecutor(16) as executor:
+                responses = list(
+                    executor.map(
+                        lambda _: repository.update_book(CIRCE_INFO["title"], True),
+                        range(64),
+                    )
+                )
+            assert all(responses)
+            assert repository.list_books(True) == ["Circe"]
+
+    def test_concurrent_bulk_adds_with_shared_stats_keys_do_not_deadlock(self, backend):
+        def batch(prefix: str, names: list[str]) -> list[dict]:
+            return [
+                {
+                    **CIRCE_INFO,
+                    "id": f"{prefix}{number}",
+                    "title": f"{prefix} {number}",
+                    "isbn_10": None,
+                    "isbn_13": None,
+                    "authors": [name],
+                    "categories": [f"Category {name}"],
+                }
+                for number, name in enumerate(names)
+            ]
+
+        names = [f"Author {number:03}" for number in range(200)]
+        batches = [batch("forwards", names), batch("backwards", names[::-1])]
+        with open_test_repository(backend, max_size=2) as repository:
+            repository.create_books_table()
+            with ThreadPoolExecutor(2) as executor:
+                results = list(
+                    executor.map(
+                        lambda books: repository.add_books(books, True), batches
+                    )
+                )
+            assert [len(result.inserted) for result in results] == [200, 200]
+            stats = repository.get_stats(top=200)
+        assert stats.total_books == 400
+        assert set(stats.authors.values()) == {2}
+        assert set(stats.categories.values()) == {2}
+
+
+def make_book(number: int) -> dict:
+    return {
+        **MEDITATIONS_INFO,
+        "id": f"book{number:08}",
+        "title": f"Title {number:08}",
+        "isbn_10": f"{number:010}",
+        "isbn_13": f"978{number:010}",
+    }
+
+
+# SQLite plans from the statistics gathered by `ANALYZE`, so a smaller library shows the same plans
+LARGE_LIBRARY_SIZES = {"postgres": 100_000, "sqlite": 10_000}
+
+
+def build_large_library(backend: str):
+    size = LARGE_LIBRARY_SIZES[backend]
+    if backend == "postgres":
+        query_db(
+            backend,
+            """
+            DROP TABLE IF EXISTS books;
+            DROP TABLE IF EXISTS book_stats;
+            DROP TABLE IF EXISTS schema_version;
+            """,
+        )
+    # Only 1% of books are read, so listing read books is selective
+    with open_test_repository(backend) as repository:
+        repository.create_books_table()
+        repository.add_books((make_book(i) for i in range(size) if i % 100), False)
+        repository.add_books((make_book(i) for i in range(0, size, 100)), True)
+    query_db(backend, "ANALYZE books;")
+
+
+def explain(backend: str, query: str, params: tuple | None = None) -> str:
+    if backend == "postgres":
+        plan = query_db(backend, f"EXPLAIN {query}", params)
+        return "\n".join(row[0] for row in plan)
+    plan = query_db(backend, f"EXPLAIN QUERY PLAN {query.replace('%s', '?')}", params)
+    return "\n".join(row[3] for row in plan)
+
+
+def scans_every_row(backend: str, plan: str) -> bool:
+    if backend == "postgres":
+        return "Seq Scan" in plan
+    return "SCAN books" in plan.splitlines()
+
+
+def sorts(backend: str, plan: str) -> bool:
+    if backend == "postgres":
+        return "Sort" in plan
+    return "USE TEMP B-TREE FOR ORDER BY" in plan
+
+
+@pytest.fixture(scope="class")
+def library_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("large_library")
+
+
+@pytest.fixture(scope="class")
+def built_backends() -> set[str]:
+    # The backends whose large library has been built for the class
+    return set()
+
+
+class TestIndexUsage:
+    @pytest.fixture(autouse=True)
+    def clean_test_db(self, backend, monkeypatch, library_dir, built_backends):
+        # Overrides the module fixture, so each backend's library is only built once for the class
+        monkeypatch.setenv("TOME_TRACKER_SQLITE_DIR", str(library_dir))
+        if backend not in built_backends:
+            build_large_library(backend)
+            built_backends.add(backend)
+
+    def test_title_lookup_uses_an_index(self, backend):
+        plan = explain(
+            backend, "SELECT id FROM books WHERE title = %s", ("Title 00054321",)
+        )
+        assert "books_title_id_idx" in plan
+        assert not scans_every_row(backend, plan)
+
+    def test_isbn_lookup_uses_indexes(self, backend):
+        plan = explain(
+            backend,
+            "SELECT id FROM books WHERE isbn_10 = %s OR isbn_13 = %s",
+            ("0000054321", "0000054321"),
+        )
+        assert "books_isbn_10_idx" in plan
+        assert "books_isbn_13_idx" in plan
+        assert not scans_every_row(backend, plan)
+
+    def test_delete_by_isbn_uses_indexes(self, backend):
+        plan = explain(
+            backend,
+            "DELETE FROM books WHERE isbn_10 = %s OR isbn_13 = %s",
+            ("9780000054321", "9780000054321"),
+        )
+        assert not scans_every_row(backend, plan)
+
+    @pytest.mark.backends("postgres")
+    def test_similar_title_lookup_uses_the_trigram_index(self, backend):
+        plan = explain(
+            backend, "SELECT title FROM books WHERE title %% %s", ("Title 0005432l",)
+        )
+        assert "books_title_trgm_idx" in plan
+
+    @pytest.mark.backends("postgres")
+    def test_search_uses_the_full_text_index(self, backend):
+        plan = explain(
+            backend,
+            "SELECT id FROM books WHERE search_vector @@ websearch_to_tsquery('english', %s)",
+            ("00054321",),
+        )
+        assert "books_search_idx" in plan
+        assert not scans_every_row(backend, plan)
+
+    @pytest.mark.backends("postgres")
+    def test_batched_isbn_check_uses_indexes(self, backend):
+        isbns = [f"978{i:010}" for i in range(0, 100_000, 1000)]
+        plan = explain(
+            backend,
+            "SELECT id, isbn_10, isbn_13 FROM books WHERE id = ANY(%s::text[])"
+            " OR isbn_10 = ANY(%s::bpchar[]) OR isbn_13 = ANY(%s::bpchar[])",
+            ([], isbns, isbns),
+        )
+        assert "books_isbn_10_idx" in plan
+        assert "books_isbn_13_idx" in plan
+        assert not scans_every_row(backend, plan)
+
+    def test_later_pages_seek_with_an_index(self, backend):
+        query, params = page_query(
+            None,
+            50,
+            encode_cursor("Title 00009000", "book00009000"),
+            ("title",),
+            placeholder="%s" if backend == "postgres" else "?",
+        )
+        plan = explain(backend, query, tuple(params))
+        assert "books_title_key_idx" in plan
+        # The index is entered at the cursor, rather than read from its start
+        assert ("Index Cond" if backend == "postgres" else "SEARCH books") in plan
+        assert not sorts(backend, plan)
+
+    def test_listing_read_books_uses_the_partial_index(self, backend):
+        plan = explain(
+            backend,
+            "SELECT title FROM books WHERE read ORDER BY COALESCE(title, ''), id",
+        )
+        assert "books_read_title_key_idx" in plan
+        assert not scans_every_row(backend, plan)
+
+
+class BlockingRepository:
+    """Runs an `AsyncBookRepository`'s coroutines to completion, so tests can call either repository the same way."""
+
+    def __init__(self, repository: AsyncBookRepository, runner: asyncio.Runner):
+        self.repository = repository
+        self.runner = runner
+
+    def __getattr__(self, name):
+        method = getattr(self.repository, name)
+        if inspect.isasyncgenfunction(method):
+            return lambda *args, **kwargs: self.runner.run(
+                collect(method(*args, **kwargs))
+            )
+        return lambda *args, **kwargs: self.runner.run(method(*args, **kwargs))
+
+
+async def collect(books) -> list:
+    return [book async for book in books]
+
+
+@pytest.fixture(params=["sync", "async"])
+def repository(request, backend, tmp_path):
+    if backend == "sqlite":
+        if request.param == "async":
+            pytest.skip("there is no async SQLite repository")
+        with SqliteBookRepository(str(tmp_path / "books.sqlite3")) as repository:
+            repository.create_books_table()
+            yield repository
+    elif request.param == "sync":
+        with BookRepository(DBNAME) as repository:
+            repository.create_books_table()
+            yield repository
+    else:
+        with asyncio.Runner() as runner:
+            repository = BlockingRepository(AsyncBookRepository(DBNAME), runner)
+            repository.open()
+            repository.create_books_table()
+            yield repository
+            repository.close()
+
+
+class TestRepositories:
+    def test_adds_a_book_once(self, repository):
+        assert repository.add_book(CIRCE_INFO, True)
+        assert not repository.add_book(CIRCE_INFO, False)
+        assert list(repository.list_books(True)) == ["Circe"]
+
+    def test_adds_books_in_bulk(self, repository):
+        repository.add_book(CIRCE_INFO, True)
+        response = repository.add_books([MEDITATIONS_INFO, CIRCE_INFO])
+        assert response.inserted == [MEDITATIONS_INFO["id"]]
+        assert response.duplicates == [CIRCE_INFO["id"]]
+
+    def test_checks_for_books(self, repository):
+        repository.add_book(CIRCE_INFO, True)
+        assert repository.has_book(volume_id=CIRCE_INFO["id"])
+        assert repository.has_book(title="Circe")
+        assert repository.has_book(isbn=CIRCE_INFO["isbn_10"])
+        assert not repository.has_book(title="Meditations")
+        assert not repository.has_book()
+
+    def test_finds_stored_books_in_batches(self, repository):
+        repository.add_book(CIRCE_INFO, True)
+        response = repository.find_books(
+            volume_ids=[MEDITATIONS_INFO["id"]], isbns=[CIRCE_INFO["isbn_13"]]
+        )
+        assert response == {CIRCE_INFO["isbn_13"]}
+
+    def test_lists_books_by_read_status(self, repository):
+        repository.add_book(CIRCE_INFO, True)
+        repository.add_book(MEDITATIONS_INFO, False)
+        assert repository.list_books() == ["Circe", "Meditations"]
+        assert repository.list_books(True) == ["Circe"]
+        assert repository.list_books(False) == ["Meditations"]
+
+    def test_pages_and_streams_books(self, repository):
+        repository.add_books([MEDITATIONS_INFO, CIRCE_INFO, TIME_AND_CHANCE_INFO])
+        first = repository.list_books_page(page_size=2)
+        second = repository.list_books_page(page_size=2, cursor=first.next_cursor)
+        streamed = repository.iter_books(batch_size=2)
+        assert [book["title"] for book in first.books + second.books] == [
+            book["title"] for book in streamed
+        ]
+        assert second.next_cursor is None
+
+    def test_searches_books(self, repository):
+        repository.add_books([MEDITATIONS_INFO, CIRCE_INFO, TIME_AND_CHANCE_INFO])
+        results = repository.search_books("Madeline Miller")
+        assert [book["title"] for book in results] == ["Circe"]
+        assert repository.search_books("") == []
+
+    def test_deletes_books(self, repository):
+        repository.add_book(CIRCE_INFO, True)
+        assert not repository.delete_book()
+        assert not repository.delete_book(title="Meditations")
+        assert repository.delete_book(isbn=CIRCE_INFO["isbn_13"])
+        assert repository.list_books() == []
+
+    def test_updates_books(self, repository):
+        repository.add_book(CIRCE_INFO, True)
+        assert repository.update_book("Circe", True)
+        assert repository.list_books(False) == ["Circe"]
+        assert not repository.update_book("Meditations", True)
+
+
+@pytest.mark.backends("sqlite")
+class TestSqliteBookRepository:
+    def test_uses_write_ahead_logging(self, tmp_path):
+        with SqliteBookRepository(str(tmp_path / "books.sqlite3")) as repository:
+            (mode,) = repository.conn.execute("PRAGMA journal_mode").fetchone()
+        assert mode == "wal"
+
+    def test_applies_all_migrations_once(self, tmp_path):
+        with SqliteBookRepository(str(tmp_path / "books.sqlite3")) as repository:
+            assert repository.migrate() == len(SQLITE_MIGRATIONS)
+            assert repository.migrate() == len(SQLITE_MIGRATIONS)
+            (count,) = repository.conn.execute(
+                "SELECT COUNT(*) FROM schema_version"
+            ).fetchone()
+        assert count == len(SQLITE_MIGRATIONS)
+
+    def test_keeps_search_index_in_step_with_updates_and_deletes(self, tmp_path):
+        with SqliteBookRepository(str(tmp_path / "books.sqlite3")) as repository:
+            repository.create_books_table()
+            repository.add_books([CIRCE_INFO, MEDITATIONS_INFO])
+            repository.delete_book(title="Circe")
+            repository.update_book("Meditations", True)
+            assert repository.search_books("witchcraft") == []
+            assert [book["title"] for book in repository.search_books("aurelius")] == [
+                "Meditations"
+            ]
+
+    def test_lookups_use_indexes(self, tmp_path):
+        with SqliteBookRepository(str(tmp_path / "books.sqlite3")) as repository:
+            repository.create_books_table()
+            plan = repository.conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM books"
+                " WHERE isbn_10 = ? OR isbn_13 = ?",
+                ("0753820161", "0753820161"),
+            ).fetchall()
+        details = " ".join(row["detail"] for row in plan)
+        assert "books_isbn_10_idx" in details
+        assert "books_isbn_13_idx" in details
+
+
+@pytest.mark.backends("sqlite")
+class TestTitleSimilarity:
+    def test_matches_pg_trgm(self):
+        # SELECT similarity('word', 'two words') in PostgreSQL
+        assert title_similarity("word", "two words") == pytest.approx(4 / 11)
+        assert title_similarity("word", "words") == pytest.approx(4 / 7)
+
+    def test_is_zero_without_trigrams(self):
+        assert title_similarity("", "Circe") == 0
+
+
+@pytest.mark.backends("sqlite")
+class TestFts5Query:
+    def test_requires_all_words(self):
+        assert fts5_query("greek myth") == '"greek" AND "myth"'
+
+    def test_keeps_quoted_phrases(self):
+        assert fts5_query('"time and chance"') == '"time and chance"'
+
+    def test_excludes_negated_terms(self):
+        assert fts5_query("myth -odyssey") == '("myth") NOT "odyssey"'
+
+    def test_allows_alternatives(self):
+        assert fts5_query("circe or medea") == '("circe" OR "medea")'
+
+    def test_ignores_punctuation(self):
+        assert fts5_query('circe AND "NOT"*') == '"circe" AND "AND" AND "NOT"'
+
+    def test_returns_none_without_included_terms(self):
+        assert fts5_query("-odyssey") is None
+        assert fts5_query("  ") is None
@@ -0,0 +1,186 @@
+import csv
+import datetime
+import json
+
+import psycopg
+import pytest
+
+from src.tome_tracker.db_utils import (
+    add_book_to_db,
+    close_repositories,
+    create_books_table,
+)
+from src.tome_tracker.export_utils import export_books
+
+DBNAME = "test_tome_tracker"
+
+MEDITATIONS_INFO = {
+    "id": "pMyoPwAACAAJ",
+    "etag": "WmUhbbR1UHg",
+    "selfLink": "https://www.googleapis.com/books/v1/volumes/pMyoPwAACAAJ",
+    "title": "Meditations",
+    "authors": ["Marcus Aurelius"],
+    "publisher": "Phoenix",
+    "publishedDate": "2004-01-01",
+    "description": "A new translation of one of the most important texts of Western philosophy.",
+    "pageCount": 200,
+    "categories": None,
+    "language": "en",
+    "isbn_10": "0753820161",
+    "isbn_13": "9780753820162",
+    "thumbnail": None,
+}
+
+CIRCE_INFO = {
+    "id": "d6kyEAAAQBAJ",
+    "etag": "hsBy3rTbPTA",
+    "selfLink": "https://www.googleapis.com/books/v1/volumes/d6kyEAAAQBAJ",
+    "title": "Circe",
+    "authors": ["Madeline Miller"],
+    "publisher": "Bloomsbury Publishing",
+    "publishedDate": "2019-01-01",
+    "description": 'A bold and "subversive" retelling,\nof the goddess\'s story.',
+    "pageCount": 336,
+    "categories": ["Fiction / General", "Fiction / Fantasy / Epic"],
+    "language": "en",
+    "isbn_10": "1408890046",
+    "isbn_13": "9781408890042",
+    "thumbnail": None,
+}
+
+
+@pytest.fixture(autouse=True, params=["postgres", "sqlite"])
+def backend(request, monkeypatch, tmp_path):
+    monkeypatch.setenv("TOME_TRACKER_BACKEND", request.param)
+    monkeypatch.setenv("TOME_TRACKER_SQLITE_DIR", str(tmp_path))
+    if request.param == "postgres":
+        with psycopg.connect(f"dbname={DBNAME}") as conn:
+            conn.execute("""
+                DROP TABLE IF EXISTS books;
+                DROP TABLE IF EXISTS book_stats;
+                DROP TABLE IF EXISTS schema_version;
+            """)
+    create_books_table(DBNAME)
+    yield request.param
+    close_repositories()
+
+
+@pytest.fixture
+def library():
+    add_book_to_db(DBNAME, MEDITATIONS_INFO, True)
+    add_book_to_db(DBNAME, CIRCE_INFO, False)
+
+
+class TestExportBooks:
+    def test_writes_json_lines_ordered_by_title(self, tmp_path, library):
+        path = tmp_path / "books.jsonl"
+        assert export_books(DBNAME, str(path)) == 2
+        books = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [book["title"] for book in books] == ["Circe", "Meditations"]
+        assert books[0]["authors"] == ["Madeline Miller"]
+        assert books[0]["published_date"] == "2019-01-01"
+        assert books[0]["added"] == datetime.date.today().isoformat()
+        assert books[0]["read"] is False
+        assert books[1]["categories"] is None
+
+    def test_writes_csv_in_the_same_shape_for_every_backend(self, tmp_path, library):
+        path = tmp_path / "books.csv"
+        assert (
+            export_books(
+                DBNAME,
+                str(path),
+                columns=("authors", "categories", "published_date", "read"),
+            )
+            == 2
+        )
+        with open(path, newline="") as file:
+            rows = list(csv.reader(file))
+        assert rows == [
+            ["id", "title", "authors", "categories", "published_date", "read"],
+            [
+                CIRCE_INFO["id"],
+                "Circe",
+                '["Madeline Miller"]',
+                '["Fiction / General","Fiction / Fantasy / Epic"]',
+                "2019-01-01",
+                "false",
+            ],
+            [
+                MEDITATIONS_INFO["id"],
+                "Meditations",
+                '["Marcus Aurelius"]',
+                "",
+                "2004-01-01",
+                "true",
+            ],
+        ]
+
+    def test_quotes_csv_values_with_delimiters_and_newlines(self, tmp_path, library):
+        path = tmp_path / "books.csv"
+        export_books(DBNAME, str(path), columns=("description",))
+        with open(path, newline="") as file:
+            rows = list(csv.DictReader(file))
+        assert rows[0]["description"] == CIRCE_INFO["description"]
+
+    def test_writes_only_a_header_for_an_empty_library(self, tmp_path):
+        path = tmp_path / "books.csv"
+        assert export_books(DBNAME, str(path), columns=()) == 0
+        assert path.read_text() == "id,title\n"
+
+    def test_filters_by_read_status(self, tmp_path, library):
+        path = tmp_path / "books.jsonl"
+        assert export_books(DBNAME, str(path), read_status=True) == 1
+        (book,) = [json.loads(line) for line in path.read_text().splitlines()]
+        assert book["title"] == "Meditations"
+
+    def test_writes_parquet_in_chunks(self, tmp_path, library):
+        pq = pytest.importorskip("pyarrow.parquet")
+        path = tmp_path / "books.parquet"
+        assert export_books(DBNAME, str(path), batch_size=1) == 2
+        table = pq.read_table(path)
+        assert pq.ParquetFile(path).num_row_groups == 2
+        books = table.to_pylist()
+        assert [book["title"] for book in books] == ["Circe", "Meditations"]
+        assert books[0]["published_date"] == datetime.date(2019, 1, 1)
+        assert books[0]["page_count"] == 336
+        assert books[1]["read"] is True
+
+    @pytest.mark.parametrize("format", ["jsonl", "csv", "parquet"])
+    def test_exports_books_without_a_title(self, tmp_path, library, format):
+        if format == "parquet":
+            pq = pytest.importorskip("pyarrow.parquet")
+        for number in range(3):
+            add_book_to_db(
+                DBNAME, {**CIRCE_INFO, "id": f"untitled{number}", "title": None}, True
+            )
+        path = tmp_path / f"books.{format}"
+        assert export_books(DBNAME, str(path), batch_size=2) == 5
+        if format == "jsonl":
+            books = [json.loads(line) for line in path.read_text().splitlines()]
+        elif format == "csv":
+            with open(path, newline="") as file:
+                books = list(csv.DictReader(file))
+        else:
+            books = pq.read_table(path).to_pylist()
+        assert len(books) == 5
+        assert [book["id"] for book in books[:3]] == [
+            "untitled0",
+            "untitled1",
+            "untitled2",
+        ]
+
+    def test_accepts_an_explicit_format(self, tmp_path, library):
+        path = tmp_path / "books.txt"
+        assert export_books(DBNAME, str(path), format="jsonl") == 2
+
+    def test_rejects_unknown_formats(self, tmp_path, library):
+        path = tmp_path / "books.xml"
+        with pytest.raises(ValueError):
+            export_books(DBNAME, str(path))
+        assert list(tmp_path.glob("books.xml*")) == []
+
+    def test_rejects_unknown_columns(self, tmp_path, library):
+        path = tmp_path / "books.jsonl"
+        with pytest.raises(ValueError):
+            export_books(DBNAME, str(path), columns=("shelf",))
+        assert list(tmp_path.glob("books.jsonl*")) == []
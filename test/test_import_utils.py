@@ -0,0 +1,277 @@
+import csv
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+from requests.exceptions import ConnectionError
+
+from src.tome_tracker.api_utils import NoMatchingISBN
+from src.tome_tracker.db_utils import (
+    add_book_to_db,
+    close_repositories,
+    create_books_table,
+    list_books_in_db,
+    open_repository,
+)
+from src.tome_tracker.import_utils import (
+    ImportFailure,
+    ImportProgress,
+    ImportRow,
+    import_library,
+    read_library_export,
+)
+
+DBNAME = "test_tome_tracker"
+
+GOODREADS_HEADER = ["Book Id", "Title", "ISBN", "ISBN13", "Exclusive Shelf"]
+LIBRARYTHING_HEADER = ["Book Id", "Title", "ISBNs", "Date Read", "Collections"]
+
+
+def make_book(isbn: str, title: str) -> dict:
+    return {
+        "id": f"id{isbn}",
+        "etag": "etag",
+        "selfLink": f"https://www.googleapis.com/books/v1/volumes/id{isbn}",
+        "title": title,
+        "authors": ["An Author"],
+        "publisher": None,
+        "publishedDate": None,
+        "description": None,
+        "pageCount": None,
+        "categories": None,
+        "language": "en",
+        "isbn_10": None,
+        "isbn_13": isbn,
+        "thumbnail": None,
+    }
+
+
+BOOKS = {
+    "9780753820162": make_book("9780753820162", "Meditations"),
+    "9781408890042": make_book("9781408890042", "Circe"),
+    "9780674011328": make_book("9780674011328", "Time and Chance"),
+}
+
+
+class FakeClient:
+    pool_size = 3
+
+    def __init__(self, books: dict = BOOKS, error: Exception | None = None):
+        self.books = books
+        self.error = error
+        self.looked_up = []
+        self.lock = threading.Lock()
+
+    def get_book_by_isbn(self, isbn: str) -> dict:
+        with self.lock:
+            self.looked_up.append(isbn)
+        if self.error is not None:
+            raise self.error
+        if isbn not in self.books:
+            raise NoMatchingISBN
+        return self.books[isbn]
+
+
+@pytest.fixture(autouse=True)
+def sqlite_db(monkeypatch, tmp_path):
+    # The pipeline only uses the storage backend interface, so one backend is enough
+    monkeypatch.setenv("TOME_TRACKER_BACKEND", "sqlite")
+    monkeypatch.setenv("TOME_TRACKER_SQLITE_DIR", str(tmp_path))
+    create_books_table(DBNAME)
+    yield
+    close_repositories()
+
+
+def write_export(path, header: list[str], rows: list[list[str]]) -> str:
+    with open(path, "w", newline="") as export:
+        writer = csv.writer(export)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def goodreads_export(tmp_path):
+    return write_export(
+        tmp_path / "goodreads.csv",
+        GOODREADS_HEADER,
+        [
+            ["1", "Meditations", '="0753820161"', '="9780753820162"', "read"],
+            ["2", "Circe", '="1408890046"', '="9781408890042"', "to-read"],
+            ["3", "Unknown", '=""', '=""', "read"],
+            ["4", "Time and Chance", '="0674011325"', '="9780674011328"', "read"],
+            ["5", "Missing", '="0000000000"', '=""', "to-read"],
+        ],
+    )
+
+
+class TestReadLibraryExport:
+    def test_reads_goodreads_exports(self, goodreads_export):
+        rows = list(read_library_export(goodreads_export))
+        assert rows[:3] == [
+            ImportRow(1, "9780753820162", True),
+            ImportRow(2, "9781408890042", False),
+            ImportFailure(3, "", "No valid ISBN"),
+        ]
+
+    def test_reads_librarything_exports(self, tmp_path):
+        path = write_export(
+            tmp_path / "librarything.csv",
+            LIBRARYTHING_HEADER,
+            [
+                ["1", "Meditations", "[0753820161, 9780753820162]", "2024-01-05", ""],
+                ["2", "Circe", "[978-1-4088-9004-2]", "", "Your library, To read"],
+                ["3", "Time and Chance", "0674011325", "", "Read but unowned"],
+            ],
+        )
+        assert list(read_library_export(path)) == [
+            ImportRow(1, "0753820161", True),
+            ImportRow(2, "9781408890042", False),
+            ImportRow(3, "0674011325", True),
+        ]
+
+    def test_skips_rows_before_the_start_row(self, goodreads_export):
+        rows = list(read_library_export(goodreads_export, start_row=3))
+        assert [row.row for row in rows] == [4, 5]
+
+
+class TestImportLibrary:
+    def test_adds_found_books_with_their_read_status(self, goodreads_export):
+        totals = import_library(DBNAME, goodreads_export, client=FakeClient())
+        assert totals == ImportProgress(
+            processed=5, added=3, already_stored=0, failed=2
+        )
+        assert sorted(list_books_in_db(DBNAME, True)) == [
+            "Meditations",
+            "Time and Chance",
+        ]
+        assert list_books_in_db(DBNAME, False) == ["Circe"]
+
+    def test_skips_stored_books_without_looking_them_up(self, goodreads_export):
+        add_book_to_db(DBNAME, BOOKS["9781408890042"], False)
+        client = FakeClient()
+        totals = import_library(DBNAME, goodreads_export, client=client)
+        assert totals.already_stored == 1
+        assert "9781408890042" not in client.looked_up
+
+    def test_reports_failed_rows(self, tmp_path, goodreads_export):
+        failures_path = tmp_path / "failures.csv"
+        import_library(
+            DBNAME,
+            goodreads_export,
+            failures_path=str(failures_path),
+            client=FakeClient(),
+        )
+        with open(failures_path, newline="") as report:
+            rows = sorted(csv.DictReader(report), key=lambda row: row["row"])
+        assert rows == [
+            {"row": "3", "isbn": "", "reason": "No valid ISBN"},
+            {"row": "5", "isbn": "0000000000", "reason": "No matching book found"},
+        ]
+
+    def test_reports_lookup_errors_without_stopping(self, tmp_path, goodreads_export):
+        failures_path = tmp_path / "failures.csv"
+        client = FakeClient(error=ConnectionError("connection reset"))
+        totals = import_library(
+            DBNAME, goodreads_export, failures_path=str(failures_path), client=client
+        )
+        assert totals.failed == 5
+        assert "Lookup failed: connection reset" in failures_path.read_text()
+
+    def test_reports_progress(self, goodreads_export):
+        updates = []
+        import_library(
+            DBNAME, goodreads_export, progress=updates.append, client=FakeClient()
+        )
+        assert [update.processed for update in updates] == sorted(
+            update.processed for update in updates
+        )
+        assert updates[-1].processed == 5
+
+    def test_saves_a_checkpoint_until_the_import_completes(
+        self, tmp_path, goodreads_export
+    ):
+        checkpoint_path = tmp_path / "import.json"
+        checkpoints = []
+
+        def read_checkpoint(progress: ImportProgress):
+            if checkpoint_path.exists():
+                checkpoints.append(json.loads(checkpoint_path.read_text())["row"])
+
+        import_library(
+            DBNAME,
+            goodreads_export,
+            checkpoint_path=str(checkpoint_path),
+            progress=read_checkpoint,
+            client=FakeClient(),
+            batch_size=1,
+        )
+        assert checkpoints == sorted(checkpoints)
+        assert checkpoints[-1] == 5
+        assert not checkpoint_path.exists()
+
+    def test_resumes_from_a_checkpoint(self, tmp_path, goodreads_export):
+        checkpoint_path = tmp_path / "import.json"
+        checkpoint_path.write_text(json.dumps({"row": 2}))
+        client = FakeClient()
+        totals = import_library(
+            DBNAME,
+            goodreads_export,
+            checkpoint_path=str(checkpoint_path),
+            client=client,
+        )
+        assert totals.processed == 3
+        assert sorted(client.looked_up) == ["0000000000", "9780674011328"]
+        assert not checkpoint_path.exists()
+        assert list_books_in_db(DBNAME) == ["Time and Chance"]
+
+    def test_does_not_report_failures_twice_when_resuming(
+        self, tmp_path, goodreads_export
+    ):
+        checkpoint_path = tmp_path / "import.json"
+        failures_path = tmp_path / "failures.csv"
+        # The interrupted run reported row 5 before its checkpoint reached it
+        checkpoint_path.write_text(json.dumps({"row": 3}))
+        write_export(
+            failures_path,
+            ["row", "isbn", "reason"],
+            [
+                ["3", "", "No valid ISBN"],
+                ["5", "0000000000", "No matching book found"],
+            ],
+        )
+        import_library(
+            DBNAME,
+            goodreads_export,
+            checkpoint_path=str(checkpoint_path),
+            failures_path=str(failures_path),
+            client=FakeClient(),
+        )
+        with open(failures_path, newline="") as report:
+            rows = list(csv.DictReader(report))
+        assert [row["row"] for row in rows] == ["3", "5"]
+
+    def test_uses_the_passed_repository(self, goodreads_export):
+        repository = open_repository(DBNAME)
+        try:
+            with patch(
+                "src.tome_tracker.import_utils.get_repository",
+                side_effect=AssertionError,
+            ):
+                totals = import_library(
+                    DBNAME, goodreads_export, client=FakeClient(), repository=repository
+                )
+            assert totals.added == 3
+            assert len(repository.list_books()) == 3
+        finally:
+            repository.close()
+
+    def test_raises_errors_from_any_stage(self, goodreads_export):
+        client = FakeClient(error=RuntimeError("bug in a lookup"))
+        with pytest.raises(RuntimeError, match="bug in a lookup"):
+            import_library(DBNAME, goodreads_export, client=client, batch_size=1)
+
+    def test_raises_if_the_export_is_missing(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            import_library(DBNAME, str(tmp_path / "missing.csv"), client=FakeClient())
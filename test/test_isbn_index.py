@@ -0,0 +1,93 @@
+import pytest
+
+from src.tome_tracker.isbn_index import IsbnIndex, normalise_isbn, write_isbn_index
+
+MEDITATIONS_INFO = {
+    "id": "pMyoPwAACAAJ",
+    "title": "Meditations",
+    "isbn_10": "0753820161",
+    "isbn_13": "9780753820162",
+}
+
+CIRCE_INFO = {
+    "id": "d6kyEAAAQBAJ",
+    "title": "Circe",
+    "isbn_10": "1408890046",
+    "isbn_13": "9781408890042",
+}
+
+TIME_AND_CHANCE_INFO = {
+    "id": "lnlAnwEACAAJ",
+    "title": "Time and Chance",
+    "isbn_10": None,
+    "isbn_13": "9780674011328",
+}
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / "isbn.idx")
+
+
+class TestNormaliseISBN:
+    def test_pads_isbn_10_to_a_fixed_width(self):
+        assert normalise_isbn("0753820161") == b"0753820161   "
+
+    def test_ignores_dashes_and_spaces(self):
+        assert normalise_isbn("978-0-7538 2016-2") == b"9780753820162"
+
+    def test_accepts_isbn_10_check_digit_x(self):
+        assert normalise_isbn("080442957x") == b"080442957X   "
+
+    def test_returns_none_for_values_that_are_not_isbns(self):
+        assert normalise_isbn("1234") is None
+        assert normalise_isbn("97807538201XX") is None
+
+
+class TestIsbnIndex:
+    def test_looks_up_books_by_isbn_10_and_isbn_13(self, index_path):
+        count = write_isbn_index([MEDITATIONS_INFO, CIRCE_INFO], index_path)
+        with IsbnIndex(index_path) as index:
+            assert count == len(index) == 4
+            assert index.get("0753820161") == MEDITATIONS_INFO
+            assert index.get("9780753820162") == MEDITATIONS_INFO
+            assert index.get("978-1-4088-9004-2") == CIRCE_INFO
+
+    def test_returns_none_for_missing_isbns(self, index_path):
+        write_isbn_index([MEDITATIONS_INFO], index_path)
+        with IsbnIndex(index_path) as index:
+            assert index.get("9781408890042") is None
+            assert index.get("not an isbn") is None
+
+    def test_skips_records_without_an_isbn(self, index_path):
+        no_isbn = {"id": "abc", "isbn_10": None, "isbn_13": None}
+        assert write_isbn_index([no_isbn, TIME_AND_CHANCE_INFO], index_path) == 1
+
+    def test_keeps_the_first_record_for_a_duplicate_isbn(self, index_path):
+        duplicate = dict(CIRCE_INFO, id="duplicate")
+        write_isbn_index([CIRCE_INFO, duplicate], index_path, chunk_size=2)
+        with IsbnIndex(index_path) as index:
+            assert len(index) == 2
+            assert index.get("1408890046")["id"] == CIRCE_INFO["id"]
+
+    def test_merges_keys_sorted_in_separate_chunks(self, index_path):
+        records = [
+            {"id": str(n), "isbn_10": None, "isbn_13": f"978{n:010d}"}
+            for n in range(500, 0, -1)
+        ]
+        write_isbn_index(iter(records), index_path, chunk_size=7)
+        with IsbnIndex(index_path) as index:
+            assert len(index) == 500
+            for n in range(1, 501):
+                assert index.get(f"978{n:010d}")["id"] == str(n)
+
+    def test_handles_an_empty_index(self, index_path):
+        assert write_isbn_index([], index_path) == 0
+        with IsbnIndex(index_path) as index:
+            assert index.get("9780753820162") is None
+
+    def test_rejects_files_that_are_not_an_index(self, index_path):
+        with open(index_path, "wb") as file:
+            file.write(b"not an index at all")
+        with pytest.raises(ValueError):
+            IsbnIndex(index_path)